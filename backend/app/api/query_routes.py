@@ -1,16 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi import Query as QueryParam
+from fastapi.responses import StreamingResponse
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import observe_stage, QUERIES_TOTAL
 from app.db.database import get_db, DatabaseInspector
-from app.models.models import Query, DatabaseConnection, User
+from app.db.engine_registry import engine_registry
+from app.models.models import Query, DatabaseConnection, QueryTemplate, User
 from app.schemas.schemas import (
-    QueryRequest, QueryResponse, QueryStatus,
+    QueryRequest, QueryResponse, QueryStatus, QueryStreamRequest, ResultFormat,
+    QueryBatchRequest, QueryBatchItem, QueryBatchResult, SQLGenerationResponse,
     DatabaseConnectionCreate, DatabaseConnectionResponse,
+    QueryTemplateCreate, QueryTemplateResponse, ResultCacheInvalidation,
     SchemaInfo, InsightsResponse
 )
 from app.services.ai_service import ai_service
-from app.services.query_service import QueryExecutor, QueryValidator
+from app.services.columnar import result_rows
+from app.services.example_retrieval import example_retriever
+from app.services.llm_providers import ProviderTimeoutError
+from app.services.partial_json import SQLFieldExtractor
+from app.services.plan_gate import plan_gate
+from app.services.query_service import DuplicateQueryIdError, QueryExecutor, QueryValidator, running_queries
+from app.services.query_templates import template_engine, TemplateError, TemplateMatch
+from app.services.result_cache import result_cache
+from app.services.result_stream import (
+    encode_arrow, encode_ndjson, encode_sse, arrow_available,
+    ARROW_MEDIA_TYPE, NDJSON_MEDIA_TYPE, SSE_MEDIA_TYPE
+)
+from app.services.generation_cache import generation_cache
+from app.services.history_sink import history_sink
+from app.services.schema_cache import schema_cache, schema_fingerprint
+import asyncio
+import base64
+import contextlib
 import json
+import uuid
 from datetime import datetime
 
 router = APIRouter()
@@ -29,9 +55,439 @@ logger.setLevel(logging.INFO)
 
 # ... existing imports ...
 
+
+async def _cancel_on_disconnect(http_request: Optional[Request], coro, poll_interval: float = 0.5):
+    """Await coro, cancelling it if the HTTP client goes away first
+    
+    Cancelling the task aborts in-flight provider requests and target-database
+    statements instead of letting them run to completion for a response nobody
+    will read. Without a request (batch items) the coroutine is simply awaited.
+    """
+    if http_request is None:
+        return await coro
+    task = asyncio.ensure_future(coro)
+    
+    async def _watch():
+        while not task.done():
+            if await http_request.is_disconnected():
+                logger.info("Client disconnected, cancelling in-flight work")
+                task.cancel()
+                return
+            await asyncio.sleep(poll_interval)
+    
+    watcher = asyncio.create_task(_watch())
+    try:
+        return await task
+    finally:
+        watcher.cancel()
+
+
+def _conversation_history(db: Session, request: QueryRequest) -> Optional[List[Dict[str, str]]]:
+    """Recent questions of the request's conversation, oldest first"""
+    if not request.conversation_id:
+        return None
+    
+    # Queued records first: they are newer than anything already written
+    pending = history_sink.pending(request.database_id)
+    pending_ids = {_history_query_id(record["context"]) for record in pending}
+    
+    # Fetch recent queries from this conversation
+    recent_queries = db.query(Query).filter(
+        Query.database_id == request.database_id
+    ).order_by(Query.created_at.desc()).limit(5).all()
+    
+    questions = [record["natural_language_query"] for record in pending] + [
+        q.natural_language_query for q in recent_queries
+        if _history_query_id(q.context) not in pending_ids
+    ]
+    return [
+        {
+            "role": "user",
+            "content": question
+        }
+        for question in reversed(questions[:5])
+    ]
+
+
+def _history_context(request: QueryRequest, query_id: str) -> Dict[str, Any]:
+    """Context stored with a history record; query_id identifies it before it has a row id"""
+    context = {"query_id": query_id}
+    if request.conversation_id:
+        context["conversation_id"] = request.conversation_id
+    return context
+
+
+def _history_query_id(context: Optional[Dict[str, Any]]) -> Optional[str]:
+    return (context or {}).get("query_id")
+
+
+def _detach_connection(db: Session, db_conn: DatabaseConnection) -> DatabaseConnection:
+    """
+    Reload a connection record and detach it from the request session
+    
+    Streaming bodies run after FastAPI has closed the get_db session, and a
+    schema refresh commits it, which expires every attribute; a detached,
+    fully loaded record stays readable.
+    """
+    db.refresh(db_conn)
+    db.expunge(db_conn)
+    return db_conn
+
+
+async def _reusable_generation(
+    request: QueryRequest,
+    schema_info: Dict[str, Any],
+    schema_hash: str,
+    standalone: bool = True
+) -> Tuple[Optional[SQLGenerationResponse], str, List[Dict[str, Any]]]:
+    """
+    SQL that can be answered without the LLM, the provider label and few-shot examples
+    
+    Standalone questions are served from the generation cache, then from a
+    near-identical past question. Otherwise the most similar past questions
+    are returned as examples for the prompt.
+    """
+    loop = asyncio.get_event_loop()
+    if standalone:
+        # Redis calls block, so they run off the event loop
+        sql_result = await loop.run_in_executor(
+            None, generation_cache.get, request.database_id, schema_hash, request.natural_language_query
+        )
+        if sql_result is not None:
+            logger.info(f"DEBUG: Generation cache hit for: {request.natural_language_query}")
+            return sql_result, "cache", []
+    
+    if not settings.FEW_SHOT_ENABLED:
+        return None, ai_service.preferred_provider, []
+    
+    match, examples = await example_retriever.find(
+        request.database_id, request.natural_language_query, schema_info
+    )
+    if match is not None and standalone:
+        logger.info(f"DEBUG: Reusing SQL of past question: {match['question']}")
+        return example_retriever.as_generation(match, schema_info.get("database_type")), "example", []
+    return None, ai_service.preferred_provider, examples
+
+
+async def _match_template(
+    request: QueryRequest,
+    db_conn: DatabaseConnection,
+    schema_info: Dict[str, Any]
+) -> Optional[TemplateMatch]:
+    """The saved template answering the question, if any (SQL databases only)"""
+    if not settings.TEMPLATES_ENABLED or db_conn.db_type == "mongodb":
+        return None
+    template_match = await template_engine.match(request.natural_language_query, schema_info)
+    if template_match is not None:
+        logger.info(f"DEBUG: Question matched template '{template_match.name}'")
+    return template_match
+
+
+async def _execute_template(
+    request: QueryRequest,
+    executor: QueryExecutor,
+    template_match: TemplateMatch,
+    query_id: str,
+    http_request: Optional[Request] = None,
+    execution_slots: Optional[asyncio.Semaphore] = None
+) -> Dict[str, Any]:
+    """Execute a template's SQL with its values bound, skipping validation and the plan gate"""
+    execution_result = await _execute_prepared(
+        request, executor, template_match.sql, "template", query_id,
+        http_request=http_request,
+        execution_slots=execution_slots,
+        params=template_match.params
+    )
+    if execution_result["status"] == QueryStatus.SUCCESS:
+        template_engine.record_use(template_match.template_id)
+    return execution_result
+
+
+async def _remember_success(
+    request: QueryRequest,
+    schema_hash: str,
+    sql_result: SQLGenerationResponse,
+    safe_sql: str,
+    use_generation_cache: bool
+):
+    """Make SQL that ran successfully available to later questions"""
+    # Only SQL that actually ran successfully is worth serving again
+    if use_generation_cache:
+        await asyncio.get_event_loop().run_in_executor(
+            None, generation_cache.set,
+            request.database_id, schema_hash, request.natural_language_query, sql_result
+        )
+    example_retriever.add(request.database_id, request.natural_language_query, safe_sql)
+
+
+def _count_query(provider: str, database_id: int, outcome: str):
+    QUERIES_TOTAL.labels(provider=provider, database_id=str(database_id), status=outcome).inc()
+
+
+async def _run_enrichment_stages(
+    stages: Dict[str, Any],
+    timeout_seconds: float = None
+) -> Dict[str, Any]:
+    """Run independent enrichment coroutines concurrently
+    
+    Each stage gets its own timeout. A stage that fails or times out yields
+    None instead of failing the request, so the others still come back.
+    """
+    timeout_seconds = timeout_seconds or settings.ENRICHMENT_STAGE_TIMEOUT_SECONDS
+    
+    async def _run_stage(name: str, coro):
+        try:
+            return await asyncio.wait_for(coro, timeout=timeout_seconds)
+        except asyncio.TimeoutError:
+            logger.error(f"Enrichment stage '{name}' timed out after {timeout_seconds}s")
+        except Exception as e:
+            logger.error(f"Enrichment stage '{name}' failed: {e}")
+        return None
+    
+    names = list(stages)
+    results = await asyncio.gather(*(_run_stage(name, stages[name]) for name in names))
+    return dict(zip(names, results))
+
+
+async def _run_query_pipeline(
+    request: QueryRequest,
+    db_conn: DatabaseConnection,
+    schema_info: Dict[str, Any],
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    http_request: Optional[Request] = None,
+    execution_slots: Optional[asyncio.Semaphore] = None
+) -> QueryResponse:
+    """
+    Generate, validate, execute and enrich one question against a resolved connection
+    
+    Errors are raised as HTTPException. execution_slots bounds how many
+    statements run on the target database at once (used by /query/batch).
+    """
+    # Questions matching a saved template skip generation entirely
+    template_match = await _match_template(request, db_conn, schema_info)
+    if template_match is not None:
+        query_id = request.query_id or uuid.uuid4().hex
+        execution_result = await _execute_template(
+            request, QueryExecutor(db_conn.connection_string), template_match, query_id,
+            http_request=http_request,
+            execution_slots=execution_slots
+        )
+        return await _enrich_and_record(
+            request, schema_info, template_match.display_sql, query_id, execution_result,
+            http_request=http_request
+        )
+    
+    # Follow-up questions depend on the conversation, so only standalone ones are cached
+    schema_hash = schema_fingerprint(schema_info)
+    use_generation_cache = conversation_history is None
+    sql_result, provider, examples = await _reusable_generation(
+        request, schema_info, schema_hash, standalone=use_generation_cache
+    )
+    
+    # Generate SQL using AI
+    try:
+        if sql_result is None:
+            logger.info(f"DEBUG: Generating SQL for query: {request.natural_language_query}")
+            sql_result = await _cancel_on_disconnect(http_request, ai_service.generate_sql(
+                natural_language=request.natural_language_query,
+                schema_info=schema_info,
+                conversation_history=conversation_history,
+                examples=examples
+            ))
+            logger.info(f"DEBUG: Generated SQL: {sql_result.sql}")
+    except ProviderTimeoutError as e:
+        logger.error(f"DEBUG: SQL generation timed out: {str(e)}")
+        _count_query(provider, request.database_id, "generation_timeout")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Failed to generate SQL: {str(e)}"
+        )
+    except Exception as e:
+        logger.error(f"DEBUG: Failed to generate SQL: {str(e)}")
+        _count_query(provider, request.database_id, "generation_error")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to generate SQL: {str(e)}"
+        )
+    
+    
+    executor, safe_sql = await _prepare_sql(request, db_conn, sql_result.sql, provider)
+    query_id = request.query_id or uuid.uuid4().hex
+    execution_result = await _execute_prepared(
+        request, executor, safe_sql, provider, query_id,
+        http_request=http_request,
+        execution_slots=execution_slots
+    )
+    
+    if execution_result["status"] != QueryStatus.SUCCESS:
+        logger.error(f"DEBUG: Execution failed: {execution_result.get('error')}")
+    else:
+        await _remember_success(request, schema_hash, sql_result, safe_sql, use_generation_cache)
+    
+    return await _enrich_and_record(
+        request, schema_info, safe_sql, query_id, execution_result,
+        http_request=http_request
+    )
+
+
+async def _prepare_sql(
+    request: QueryRequest,
+    db_conn: DatabaseConnection,
+    sql: str,
+    provider: str,
+    limit_rows: bool = True
+) -> Tuple[QueryExecutor, str]:
+    """
+    Validate generated SQL, add safety limits and apply the plan gate; returns (executor, safe_sql)
+    
+    limit_rows=False skips the row limit (used by /query/stream, which reads
+    the full result from a cursor); the complexity check and plan gate still apply.
+    """
+    # Validate query complexity and add safety limits
+    with observe_stage("validation"):
+        validation = QueryValidator.validate_complexity(sql, dialect=db_conn.db_type)
+        safe_sql = QueryValidator.add_safety_limits(sql, dialect=db_conn.db_type) if limit_rows else sql
+    if not validation["is_valid"]:
+        logger.warning(f"DEBUG: Query too complex: {validation['issues']}")
+        _count_query(provider, request.database_id, "rejected")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Query too complex: {', '.join(validation['issues'])}"
+        )
+    
+    executor = QueryExecutor(db_conn.connection_string)
+    
+    # Optionally check the estimated plan before touching the data
+    if settings.PLAN_GATE_ENABLED:
+        with observe_stage("plan_gate"):
+            decision = await plan_gate.evaluate(executor, safe_sql, dialect=db_conn.db_type)
+        if decision["action"] == "reject":
+            _count_query(provider, request.database_id, "rejected")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Query too expensive: {decision['reason']}"
+            )
+        safe_sql = decision["sql"]
+    
+    return executor, safe_sql
+
+
+async def _execute_prepared(
+    request: QueryRequest,
+    executor: QueryExecutor,
+    safe_sql: str,
+    provider: str,
+    query_id: str,
+    http_request: Optional[Request] = None,
+    execution_slots: Optional[asyncio.Semaphore] = None,
+    params: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Execute prepared SQL under query_id and count the outcome"""
+    # Execute query; it can be cancelled by id with DELETE /queries/{query_id}
+    logger.info(f"DEBUG: Executing SQL: {safe_sql}")
+    async with execution_slots or contextlib.nullcontext():
+        with observe_stage("execution"):
+            try:
+                execution_result = await _cancel_on_disconnect(http_request, executor.execute_query(
+                    safe_sql,
+                    read_only=False,
+                    query_id=query_id,
+                    params=params
+                ))
+            except DuplicateQueryIdError as e:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    logger.info(f"DEBUG: Execution result status: {execution_result['status']}")
+    _count_query(provider, request.database_id, execution_result["status"].value)
+    
+    return execution_result
+
+
+async def _enrich_and_record(
+    request: QueryRequest,
+    schema_info: Dict[str, Any],
+    safe_sql: str,
+    query_id: str,
+    execution_result: Dict[str, Any],
+    http_request: Optional[Request] = None
+) -> QueryResponse:
+    """
+    Run the requested enrichment stages, queue the history record and build the response
+    
+    The record is persisted in batches off the request path, so the response
+    has no history id yet; the record carries query_id instead, and history
+    and conversation lookups include it while it is still queued.
+    """
+    # Insights, visualization suggestions and the SQL explanation only depend on
+    # the executed result and the SQL, so they run concurrently
+    enrichment_stages = {}
+    
+    if request.include_insights and execution_result["status"] == QueryStatus.SUCCESS:
+        logger.info("DEBUG: Generating insights")
+        enrichment_stages["insights"] = ai_service.generate_insights(
+            query_results=execution_result["results"],
+            original_question=request.natural_language_query
+        )
+        enrichment_stages["visualizations"] = ai_service.suggest_visualizations(
+            query_results=execution_result["results"],
+            original_question=request.natural_language_query
+        )
+    
+    if request.explain_sql:
+        logger.info("DEBUG: Explaining SQL")
+        enrichment_stages["explanation"] = ai_service.explain_sql(
+            sql=safe_sql,
+            schema_info=schema_info
+        )
+    
+    with observe_stage("insights"):
+        enrichment = await _cancel_on_disconnect(http_request, _run_enrichment_stages(enrichment_stages))
+    
+    insights = None
+    if enrichment.get("insights") is not None:
+        insight_list = enrichment["insights"]
+        insights = {
+            "insights": [insight.dict() for insight in insight_list],
+            "count": len(insight_list)
+        }
+    visualization_suggestions = enrichment.get("visualizations")
+    sql_explanation = enrichment.get("explanation")
+    
+    created_at = datetime.utcnow()
+    history_record = {
+        "user_id": 1,  # TODO: Get from authenticated user
+        "database_id": request.database_id,
+        "natural_language_query": request.natural_language_query,
+        "generated_sql": safe_sql,
+        "execution_time_ms": execution_result["execution_time_ms"],
+        "result_count": execution_result.get("result_count", 0),
+        "status": execution_result["status"].value,
+        "error_message": execution_result.get("error"),
+        "insights": insights,
+        "context": _history_context(request, query_id),
+        "created_at": created_at
+    }
+    await history_sink.submit(history_record)
+    
+    return QueryResponse(
+        id=None,
+        query_id=query_id,
+        natural_language_query=request.natural_language_query,
+        generated_sql=safe_sql,
+        execution_time_ms=execution_result["execution_time_ms"],
+        result_count=execution_result.get("result_count", 0),
+        status=execution_result["status"],
+        results=result_rows(execution_result["results"]) if execution_result["status"] == QueryStatus.SUCCESS else None,
+        insights=insights,
+        sql_explanation=sql_explanation,
+        visualization_suggestions=visualization_suggestions,
+        created_at=created_at
+    )
+
+
 @router.post("/query", response_model=QueryResponse)
 async def execute_natural_language_query(
     request: QueryRequest,
+    http_request: Request,
     db: Session = Depends(get_db)
 ):
     """
@@ -60,131 +516,339 @@ async def execute_natural_language_query(
     
     # Get schema information
     logger.info(f"DEBUG: Getting schema info for {db_conn.name}")
-    inspector = DatabaseInspector(db_conn.connection_string)
-    schema_info = inspector.get_schema_info()
+    with observe_stage("schema_fetch"):
+        schema_info = await schema_cache.get_schema(db, db_conn)
     
     # Get conversation context if provided
-    conversation_history = None
-    if request.conversation_id:
-        # Fetch recent queries from this conversation
-        recent_queries = db.query(Query).filter(
-            Query.database_id == request.database_id
-        ).order_by(Query.created_at.desc()).limit(5).all()
-        
-        conversation_history = [
-            {
-                "role": "user",
-                "content": q.natural_language_query
-            }
-            for q in reversed(recent_queries)
-        ]
+    conversation_history = _conversation_history(db, request)
     
-    # Generate SQL using AI
-    try:
-        logger.info(f"DEBUG: Generating SQL for query: {request.natural_language_query}")
-        sql_result = await ai_service.generate_sql(
-            natural_language=request.natural_language_query,
-            schema_info=schema_info,
-            conversation_history=conversation_history
+    query_response = await _run_query_pipeline(
+        request, db_conn, schema_info,
+        conversation_history=conversation_history,
+        http_request=http_request
+    )
+    
+    # Serialize here so the stage is measured; FastAPI passes a Response
+    # through without validating it a second time
+    with observe_stage("serialization"):
+        body = query_response.model_dump_json()
+    return Response(content=body, media_type="application/json")
+
+
+@router.post("/query/batch")
+async def execute_query_batch(
+    request: QueryBatchRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Answer several questions against one database, streaming each result as it completes
+
+    The connection and schema are resolved once for the whole batch. SQL is
+    generated concurrently (bounded by the provider's concurrency limit) and
+    executed over the pooled engine, at most BATCH_QUERY_MAX_CONCURRENT_EXECUTIONS
+    statements at a time. The response is NDJSON with one QueryBatchResult per
+    question in completion order; a failed question reports its error in its
+    own line without affecting the others.
+    """
+    if len(request.queries) > settings.BATCH_QUERY_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch can contain at most {settings.BATCH_QUERY_MAX_ITEMS} queries"
         )
-        logger.info(f"DEBUG: Generated SQL: {sql_result.sql}")
-    except Exception as e:
-        logger.error(f"DEBUG: Failed to generate SQL: {str(e)}")
+
+    db_conn = db.query(DatabaseConnection).filter(
+        DatabaseConnection.id == request.database_id,
+        DatabaseConnection.is_active == True
+    ).first()
+
+    if not db_conn:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to generate SQL: {str(e)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Database connection not found"
         )
-    
-    
-    # Validate query complexity
-    validation = QueryValidator.validate_complexity(sql_result.sql)
-    if not validation["is_valid"]:
-        logger.warning(f"DEBUG: Query too complex: {validation['issues']}")
+
+    with observe_stage("schema_fetch"):
+        schema_info = await schema_cache.get_schema(db, db_conn)
+    db_conn = _detach_connection(db, db_conn)
+
+    execution_slots = asyncio.Semaphore(settings.BATCH_QUERY_MAX_CONCURRENT_EXECUTIONS)
+
+    async def _answer(index: int, item: QueryBatchItem) -> QueryBatchResult:
+        item_request = QueryRequest(
+            natural_language_query=item.natural_language_query,
+            database_id=request.database_id,
+            include_insights=request.include_insights,
+            explain_sql=request.explain_sql,
+            query_id=item.query_id
+        )
+        try:
+            query_response = await _run_query_pipeline(
+                item_request, db_conn, schema_info,
+                execution_slots=execution_slots
+            )
+            return QueryBatchResult(index=index, status_code=status.HTTP_200_OK, result=query_response)
+        except HTTPException as e:
+            return QueryBatchResult(index=index, status_code=e.status_code, detail=e.detail)
+        except Exception as e:
+            logger.error(f"Batch query {index} failed: {e}")
+            return QueryBatchResult(
+                index=index,
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=str(e)
+            )
+
+    async def _stream():
+        tasks = [asyncio.ensure_future(_answer(index, item)) for index, item in enumerate(request.queries)]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                item_result = await next_result
+                yield item_result.model_dump_json() + "\n"
+        finally:
+            # Client went away: stop generating and executing the rest
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(_stream(), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.post("/query/events")
+async def execute_query_with_events(
+    request: QueryRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Execute a natural language query, reporting progress as Server-Sent Events
+
+    Events, in order: "schema" (connection and schema resolved), "token" (each
+    chunk of the model's response as it arrives), "sql" (validated SQL ready),
+    "executing", "rows" (execution result), "insights" (when insights or an
+    explanation were requested) and "done". Execution starts as soon as the
+    response's "sql" field is complete, while the model is still writing the
+    rest. Failures end the stream with an "error" event.
+    """
+    db_conn = db.query(DatabaseConnection).filter(
+        DatabaseConnection.id == request.database_id,
+        DatabaseConnection.is_active == True
+    ).first()
+
+    if not db_conn:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Query too complex: {', '.join(validation['issues'])}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Database connection not found"
         )
+
+    with observe_stage("schema_fetch"):
+        schema_info = await schema_cache.get_schema(db, db_conn)
+    conversation_history = _conversation_history(db, request)
+    db_conn = _detach_connection(db, db_conn)
+
+    events: asyncio.Queue = asyncio.Queue()
+
+    def emit(event: str, data: Any):
+        events.put_nowait(encode_sse(event, data))
+
+    async def _execute(sql: str, provider: str, template_match: Optional[TemplateMatch] = None):
+        if template_match is None:
+            executor, safe_sql = await _prepare_sql(request, db_conn, sql, provider)
+        else:
+            executor, safe_sql = QueryExecutor(db_conn.connection_string), template_match.display_sql
+        emit("sql", {"sql": safe_sql})
+        query_id = request.query_id or uuid.uuid4().hex
+        emit("executing", {"query_id": query_id})
+        if template_match is None:
+            execution_result = await _execute_prepared(request, executor, safe_sql, provider, query_id)
+        else:
+            execution_result = await _execute_template(request, executor, template_match, query_id)
+        succeeded = execution_result["status"] == QueryStatus.SUCCESS
+        emit("rows", {
+            "query_id": query_id,
+            "status": execution_result["status"].value,
+            "result_count": execution_result.get("result_count", 0),
+            "execution_time_ms": execution_result["execution_time_ms"],
+            "results": result_rows(execution_result["results"]) if succeeded else None,
+            "error": execution_result.get("error")
+        })
+        return safe_sql, query_id, execution_result
+
+    async def _run():
+        execution = None
+        try:
+            emit("schema", {"database_id": db_conn.id, "table_count": len(schema_info.get("tables", {}))})
+
+            schema_hash = schema_fingerprint(schema_info)
+            use_generation_cache = conversation_history is None
+            template_match = await _match_template(request, db_conn, schema_info)
+            if template_match is not None:
+                sql_result, provider, examples = None, "template", []
+                execution = asyncio.create_task(_execute(template_match.sql, provider, template_match))
+            else:
+                sql_result, provider, examples = await _reusable_generation(
+                    request, schema_info, schema_hash, standalone=use_generation_cache
+                )
+
+            if execution is None and sql_result is None:
+                extractor = SQLFieldExtractor()
+                chunks = []
+                try:
+                    with observe_stage("llm_generation"):
+                        async for chunk in ai_service.stream_sql(
+                            natural_language=request.natural_language_query,
+                            schema_info=schema_info,
+                            conversation_history=conversation_history,
+                            examples=examples
+                        ):
+                            chunks.append(chunk)
+                            emit("token", {"text": chunk})
+                            if execution is None and extractor.feed(chunk) is not None:
+                                execution = asyncio.create_task(_execute(extractor.sql, provider))
+                    sql_result = ai_service.parse_sql_response("".join(chunks))
+                except ProviderTimeoutError as e:
+                    _count_query(provider, request.database_id, "generation_timeout")
+                    raise HTTPException(
+                        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                        detail=f"Failed to generate SQL: {str(e)}"
+                    )
+                except Exception as e:
+                    _count_query(provider, request.database_id, "generation_error")
+                    raise HTTPException(
+                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=f"Failed to generate SQL: {str(e)}"
+                    )
+
+            if execution is None:
+                execution = asyncio.create_task(_execute(sql_result.sql, provider))
+            safe_sql, query_id, execution_result = await execution
+
+            if execution_result["status"] == QueryStatus.SUCCESS and template_match is None:
+                await _remember_success(request, schema_hash, sql_result, safe_sql, use_generation_cache)
+
+            query_response = await _enrich_and_record(request, schema_info, safe_sql, query_id, execution_result)
+            if request.include_insights or request.explain_sql:
+                emit("insights", {
+                    "insights": query_response.insights,
+                    "visualization_suggestions": query_response.visualization_suggestions,
+                    "sql_explanation": query_response.sql_explanation
+                })
+            emit("done", {"query_id": query_id, "status": query_response.status.value})
+        except HTTPException as e:
+            emit("error", {"status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            logger.error(f"Query event stream failed: {e}")
+            emit("error", {"status_code": status.HTTP_500_INTERNAL_SERVER_ERROR, "detail": str(e)})
+        finally:
+            if execution is not None:
+                execution.cancel()
+            events.put_nowait(None)
+
+    async def _stream():
+        runner = asyncio.create_task(_run())
+        try:
+            while (event := await events.get()) is not None:
+                yield event
+        finally:
+            # Client went away: stop generation and the running statement
+            runner.cancel()
+
+    return StreamingResponse(
+        _stream(),
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/query/stream")
+async def stream_query_results(
+    request: QueryStreamRequest,
+    http_request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Execute a natural language query and stream the full result set
     
-    # Add safety limits
-    safe_sql = QueryValidator.add_safety_limits(sql_result.sql)
+    Rows are read from a server-side cursor and sent as NDJSON or Arrow IPC
+    chunks as the client consumes them, without the row limit of /query.
+    Only read-only queries can be streamed. The stream runs under the query
+    timeout and can be cancelled with DELETE /queries/{query_id}; the id is
+    returned in the X-Query-Id header.
+    """
+    query_id = request.query_id or uuid.uuid4().hex
+    if running_queries.is_running(query_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"A query with id {query_id} is already running"
+        )
     
-    # Execute query
-    logger.info(f"DEBUG: Executing SQL: {safe_sql}")
-    executor = QueryExecutor(db_conn.connection_string)
-    execution_result = await executor.execute_query(safe_sql, read_only=False)
-    logger.info(f"DEBUG: Execution result status: {execution_result['status']}")
+    db_conn = db.query(DatabaseConnection).filter(
+        DatabaseConnection.id == request.database_id,
+        DatabaseConnection.is_active == True
+    ).first()
     
-    if execution_result["status"] == QueryStatus.ERROR:
-        logger.error(f"DEBUG: Execution failed: {execution_result.get('error')}")
+    if not db_conn:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Database connection not found"
+        )
     
-    # Generate insights if requested
-    insights = None
-    visualization_suggestions = None
+    use_arrow = request.format == ResultFormat.ARROW
+    if use_arrow and not arrow_available():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Arrow output requires pyarrow to be installed on the server"
+        )
     
-    if request.include_insights and execution_result["status"] == QueryStatus.SUCCESS:
-        try:
-            logger.info("DEBUG: Generating insights")
-            insight_list = await ai_service.generate_insights(
-                query_results=execution_result["results"],
-                original_question=request.natural_language_query
-            )
-            insights = {
-                "insights": [insight.dict() for insight in insight_list],
-                "count": len(insight_list)
-            }
-            
-            # Get visualization suggestions
-            visualization_suggestions = await ai_service.suggest_visualizations(
-                query_results=execution_result["results"],
-                original_question=request.natural_language_query
-            )
-        except Exception as e:
-            logger.error(f"Failed to generate insights: {e}")
+    with observe_stage("schema_fetch"):
+        schema_info = await schema_cache.get_schema(db, db_conn)
+    schema_hash = schema_fingerprint(schema_info)
     
-    # Get SQL explanation if requested
-    sql_explanation = None
-    if request.explain_sql:
+    sql_result = await asyncio.get_event_loop().run_in_executor(
+        None, generation_cache.get, request.database_id, schema_hash, request.natural_language_query
+    )
+    provider = "cache" if sql_result is not None else ai_service.preferred_provider
+    if sql_result is None:
         try:
-            logger.info("DEBUG: Explaining SQL")
-            sql_explanation = await ai_service.explain_sql(
-                sql=safe_sql,
+            sql_result = await _cancel_on_disconnect(http_request, ai_service.generate_sql(
+                natural_language=request.natural_language_query,
                 schema_info=schema_info
+            ))
+        except ProviderTimeoutError as e:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail=f"Failed to generate SQL: {str(e)}"
             )
         except Exception as e:
-            logger.error(f"Failed to explain SQL: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to generate SQL: {str(e)}"
+            )
     
-    # Save query to database
-    query_record = Query(
-        user_id=1,  # TODO: Get from authenticated user
-        database_id=request.database_id,
-        natural_language_query=request.natural_language_query,
-        generated_sql=safe_sql,
-        execution_time_ms=execution_result["execution_time_ms"],
-        result_count=execution_result.get("result_count", 0),
-        status=execution_result["status"].value,
-        error_message=execution_result.get("error"),
-        insights=insights,
-        context={"conversation_id": request.conversation_id} if request.conversation_id else None
-    )
+    executor = QueryExecutor(db_conn.connection_string)
+    if executor.is_mongodb and use_arrow:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Arrow output is only available for SQL databases"
+        )
+    is_safe = executor._is_safe_pipeline if executor.is_mongodb else executor._is_safe_query
+    if not is_safe(sql_result.sql):
+        _count_query(provider, request.database_id, "rejected")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only read-only queries can be streamed"
+        )
     
-    db.add(query_record)
-    db.commit()
-    db.refresh(query_record)
+    # Same complexity check and plan gate as /query, without the row limit
+    executor, safe_sql = await _prepare_sql(request, db_conn, sql_result.sql, provider, limit_rows=False)
     
-    # Build response
-    return QueryResponse(
-        id=query_record.id,
-        natural_language_query=request.natural_language_query,
-        generated_sql=safe_sql,
-        execution_time_ms=execution_result["execution_time_ms"],
-        result_count=execution_result.get("result_count", 0),
-        status=execution_result["status"],
-        results=execution_result["results"] if execution_result["status"] == QueryStatus.SUCCESS else None,
-        insights=insights,
-        sql_explanation=sql_explanation,
-        visualization_suggestions=visualization_suggestions,
-        created_at=query_record.created_at
-    )
+    logger.info(f"DEBUG: Streaming results for SQL: {safe_sql}")
+    batches = executor.stream_rows(safe_sql, query_id=query_id)
+    
+    # A sync generator is pulled from a worker thread one chunk at a time, so the
+    # cursor only advances as fast as the client reads (backpressure)
+    headers = {"X-Query-Id": query_id}
+    if use_arrow:
+        # SQLite values are typed per row, not per column, so its columns are sent as strings
+        arrow_stream = encode_arrow(batches, infer_types=db_conn.db_type != "sqlite")
+        return StreamingResponse(arrow_stream, media_type=ARROW_MEDIA_TYPE, headers=headers)
+    return StreamingResponse(encode_ndjson(batches), media_type=NDJSON_MEDIA_TYPE, headers=headers)
 
 
 @router.get("/databases/{database_id}/schema", response_model=Dict[str, Any])
@@ -204,14 +868,65 @@ async def get_database_schema(
             detail="Database connection not found"
         )
     
-    inspector = DatabaseInspector(db_conn.connection_string)
-    schema_info = inspector.get_schema_info()
-    relationships = inspector.get_table_relationships()
+    return await schema_cache.get_schema(db, db_conn)
+
+
+@router.post("/databases/{database_id}/schema/refresh", response_model=Dict[str, Any])
+async def refresh_database_schema(
+    database_id: int,
+    db: Session = Depends(get_db)
+):
+    """Re-introspect the database and replace its cached schema"""
     
-    return {
-        **schema_info,
-        "relationships": relationships
-    }
+    db_conn = db.query(DatabaseConnection).filter(
+        DatabaseConnection.id == database_id
+    ).first()
+    
+    if not db_conn:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Database connection not found"
+        )
+    
+    try:
+        return await schema_cache.get_schema(db, db_conn, force_refresh=True)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to sync schema: {str(e)}"
+        )
+
+
+@router.post("/databases/{database_id}/results/invalidate", response_model=Dict[str, Any])
+async def invalidate_cached_results(
+    database_id: int,
+    invalidation: ResultCacheInvalidation,
+    db: Session = Depends(get_db)
+):
+    """
+    Drop cached query results after the data changed outside this application
+    
+    Writes made through /query invalidate the tables they touch automatically;
+    this hook is for loads and ETL jobs that write to the database directly.
+    """
+    db_conn = db.query(DatabaseConnection).filter(
+        DatabaseConnection.id == database_id
+    ).first()
+    
+    if not db_conn:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Database connection not found"
+        )
+    
+    loop = asyncio.get_event_loop()
+    if invalidation.tables is None:
+        removed = await loop.run_in_executor(None, result_cache.invalidate, db_conn.connection_string)
+    else:
+        removed = await loop.run_in_executor(
+            None, result_cache.invalidate_tables, db_conn.connection_string, invalidation.tables
+        )
+    return {"database_id": database_id, "removed": removed}
 
 
 @router.get("/databases/{database_id}/tables/{table_name}/sample")
@@ -249,36 +964,113 @@ async def get_table_sample(
         )
 
 
+def _encode_history_cursor(created_at: datetime, query_id: int) -> str:
+    """Opaque continuation token pointing just past a history row"""
+    payload = json.dumps({"t": created_at.isoformat(), "id": query_id})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def _decode_history_cursor(cursor: str):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(payload["t"]), int(payload["id"])
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid history cursor"
+        )
+
+
+_HISTORY_COLUMNS = (
+    "natural_language_query", "generated_sql", "execution_time_ms", "result_count",
+    "status", "insights", "context", "created_at"
+)
+
+
 @router.get("/queries/history", response_model=List[QueryResponse])
 async def get_query_history(
+    response: Response,
     database_id: int = None,
-    limit: int = 20,
+    limit: int = QueryParam(20, ge=1, le=100),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """Get query history"""
+    """
+    Get query history, newest first
+    
+    Pages are keyset-paginated on (created_at, id). When more rows exist, the
+    X-Next-Cursor response header carries the token for the next page; pass it
+    back as ?cursor= to continue. The first page also lists queries whose
+    records are still queued for writing (id null); match them on query_id.
+    """
+    
+    # Read the queue before the table, so a record flushed in between is seen
+    # twice (and deduplicated by query_id) rather than missed
+    pending = [] if cursor else history_sink.pending(database_id)
+    pending_ids = {_history_query_id(record["context"]) for record in pending}
     
     query = db.query(Query)
     
     if database_id:
         query = query.filter(Query.database_id == database_id)
     
-    queries = query.order_by(Query.created_at.desc()).limit(limit).all()
+    if cursor:
+        created_at, last_id = _decode_history_cursor(cursor)
+        query = query.filter(tuple_(Query.created_at, Query.id) < tuple_(created_at, last_id))
+    
+    # Fetch one extra row to learn whether another page exists
+    queries = query.order_by(Query.created_at.desc(), Query.id.desc()).limit(limit + 1).all()
+    
+    # Queued records have no id yet; as a cursor they sort before every row
+    # written at the same time, so the next page starts with the table
+    rows = [(record, 0) for record in pending] + [
+        ({column: getattr(q, column) for column in _HISTORY_COLUMNS}, q.id)
+        for q in queries
+        if _history_query_id(q.context) not in pending_ids
+    ]
+    
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if rows:
+            last_record, last_id = rows[-1]
+            response.headers["X-Next-Cursor"] = _encode_history_cursor(last_record["created_at"], last_id)
     
     return [
         QueryResponse(
-            id=q.id,
-            natural_language_query=q.natural_language_query,
-            generated_sql=q.generated_sql,
-            execution_time_ms=q.execution_time_ms,
-            result_count=q.result_count,
-            status=QueryStatus(q.status),
-            insights=q.insights,
-            created_at=q.created_at
+            id=row_id or None,
+            query_id=_history_query_id(record["context"]),
+            natural_language_query=record["natural_language_query"],
+            generated_sql=record["generated_sql"],
+            execution_time_ms=record["execution_time_ms"],
+            result_count=record["result_count"],
+            status=QueryStatus(record["status"]),
+            insights=record["insights"],
+            created_at=record["created_at"]
         )
-        for q in queries
+        for record, row_id in rows
     ]
 
 
+@router.delete("/queries/{query_id}", status_code=status.HTTP_202_ACCEPTED)
+async def cancel_query(query_id: str):
+    """
+    Cancel an in-flight query by the query_id it was started with
+    
+    The statement is killed on the target database (PostgreSQL cancel request,
+    SQLite interrupt, MongoDB killOp) and /query returns status "cancelled".
+    Queries are tracked per worker process.
+    """
+    loop = asyncio.get_event_loop()
+    # Cancelling talks to the target database, so keep it off the event loop
+    cancelled = await loop.run_in_executor(None, running_queries.cancel, query_id)
+    if not cancelled:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No running query with this id"
+        )
+    return {"query_id": query_id, "status": "cancelling"}
+
+
 @router.post("/databases", response_model=DatabaseConnectionResponse)
 async def create_database_connection(
     connection: DatabaseConnectionCreate,
@@ -301,6 +1093,8 @@ async def create_database_connection(
         
         executor.close()
     except Exception as e:
+        # Don't keep a pool around for a connection string we are rejecting
+        engine_registry.dispose(connection.connection_string)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Invalid connection: {str(e)}"
@@ -321,12 +1115,7 @@ async def create_database_connection(
     
     # Cache schema
     try:
-        inspector = DatabaseInspector(connection.connection_string)
-        schema_info = inspector.get_schema_info()
-        
-        db_conn.schema_cache = schema_info
-        db_conn.last_sync = datetime.utcnow()
-        db.commit()
+        await schema_cache.refresh(db, db_conn)
     except Exception as e:
         # We still created the connection, but schema sync failed
         db_conn.last_sync = None
@@ -348,3 +1137,74 @@ async def list_databases(db: Session = Depends(get_db)):
     ).all()
     
     return databases
+
+
+@router.post("/templates", response_model=QueryTemplateResponse)
+async def create_query_template(
+    template: QueryTemplateCreate,
+    db: Session = Depends(get_db)
+):
+    """
+    Save a query template
+    
+    Placeholders such as {country} in natural_language_template are matched in
+    incoming questions and bound to the same placeholders in sql_template.
+    parameters maps a placeholder to its type ("integer", "number", "date" or
+    "string", the default), or to {"type": ..., "choices": [...]}. An unquoted
+    string value is a single word; multi-word values must be quoted or be one
+    of the choices.
+    """
+    query_template = QueryTemplate(
+        user_id=1,  # TODO: Get from authenticated user
+        name=template.name,
+        description=template.description,
+        natural_language_template=template.natural_language_template,
+        sql_template=template.sql_template,
+        parameters=template.parameters,
+        usage_count=0
+    )
+    try:
+        template_engine.compile(query_template)
+    except TemplateError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid template: {str(e)}"
+        )
+    
+    db.add(query_template)
+    db.commit()
+    db.refresh(query_template)
+    template_engine.invalidate()
+    
+    return query_template
+
+
+@router.get("/templates", response_model=List[QueryTemplateResponse])
+async def list_query_templates(db: Session = Depends(get_db)):
+    """List saved query templates, most used first"""
+    return db.query(QueryTemplate).order_by(QueryTemplate.usage_count.desc(), QueryTemplate.id).all()
+
+
+@router.delete("/templates/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_query_template(template_id: int, db: Session = Depends(get_db)):
+    """Delete a saved query template"""
+    query_template = db.query(QueryTemplate).filter(QueryTemplate.id == template_id).first()
+    if not query_template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Query template not found"
+        )
+    
+    db.delete(query_template)
+    db.commit()
+    template_engine.invalidate()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/cache/stats", response_model=Dict[str, Any])
+async def get_cache_stats():
+    """Hit/miss counters for the NL-to-SQL generation cache and the result cache"""
+    return {
+        "generation": generation_cache.stats(),
+        "results": result_cache.stats()
+    }
@@ -20,14 +20,30 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     MONGODB_URL: str = "mongodb://localhost:27017"
     REDIS_URL: str = "redis://localhost:6379"
+    DEPENDENCY_CONNECT_TIMEOUT_SECONDS: int = 3
     
     # AI Services
     ANTHROPIC_API_KEY: str
     OPENAI_API_KEY: str = ""
+    OPENAI_BASE_URL: str = ""
+    ANTHROPIC_BASE_URL: str = ""
+    LLM_TIMEOUT_SECONDS: int = 60
+    OPENAI_MAX_CONCURRENCY: int = 8
+    ANTHROPIC_MAX_CONCURRENCY: int = 8
+    ENRICHMENT_STAGE_TIMEOUT_SECONDS: int = 30
+    LLM_PROMPT_CACHING_ENABLED: bool = True  # mark the static prompt prefix cacheable (Anthropic)
     
     # Vector Database
     CHROMA_PERSIST_DIR: str = "./chroma_db"
     
+    # Schema Pruning
+    SCHEMA_PRUNING_ENABLED: bool = True
+    SCHEMA_PRUNING_TOP_K: int = 8
+    SCHEMA_CONTEXT_TOKEN_BUDGET: int = 4000
+    # Column-name-only schema kept in the cached system prompt when the schema is
+    # pruned (table names only beyond this budget), so the prefix stays cacheable
+    SCHEMA_CATALOG_TOKEN_BUDGET: int = 8000
+    
     # Security
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
@@ -42,11 +58,82 @@ class Settings(BaseSettings):
     
     # Monitoring
     ENABLE_METRICS: bool = True
+    READINESS_CACHE_SECONDS: float = 2.0
+    READINESS_CHECK_TIMEOUT_SECONDS: float = 2.0
     
     # SQL Generation
     MAX_QUERY_COMPLEXITY: int = 10
     QUERY_TIMEOUT_SECONDS: int = 30
+    SQL_ANALYSIS_CACHE_SIZE: int = 4096
     
+    # Plan Cost Gate (EXPLAIN before executing generated queries)
+    PLAN_GATE_ENABLED: bool = False
+    PLAN_GATE_ACTION: str = "rewrite"  # "rewrite" (tighten LIMIT, then re-check) or "reject"
+    PLAN_GATE_MAX_ESTIMATED_ROWS: int = 1_000_000
+    PLAN_GATE_MAX_COST: float = 1_000_000.0
+    PLAN_GATE_REWRITE_LIMIT: int = 100
+    PLAN_CACHE_TTL_SECONDS: int = 300
+    PLAN_CACHE_MAX_ENTRIES: int = 1024
+
+    # Result Streaming (POST /query/stream)
+    STREAM_BATCH_SIZE: int = 5000  # rows fetched from the server-side cursor per chunk
+
+    # Batch Queries (POST /query/batch)
+    BATCH_QUERY_MAX_ITEMS: int = 50
+    BATCH_QUERY_MAX_CONCURRENT_EXECUTIONS: int = 4
+
+    # Target Database Pools
+    TARGET_DB_POOL_SIZE: int = 5
+    TARGET_DB_MAX_OVERFLOW: int = 10
+    TARGET_DB_POOL_TIMEOUT_SECONDS: int = 30
+    TARGET_DB_POOL_RECYCLE_SECONDS: int = 1800
+    TARGET_DB_MAX_ENGINES: int = 32
+    TARGET_DB_IDLE_TIMEOUT_SECONDS: int = 900
+    QUERY_EXECUTOR_WORKERS: int = 16
+
+    # Schema Cache
+    SCHEMA_CACHE_TTL_SECONDS: int = 600
+    SCHEMA_CACHE_MAX_STALE_SECONDS: int = 86400
+
+    # Query History
+    HISTORY_BATCH_SIZE: int = 200
+    HISTORY_FLUSH_INTERVAL_SECONDS: float = 1.0
+    HISTORY_QUEUE_MAX_SIZE: int = 10000
+    HISTORY_MAX_RETRIES: int = 3  # per failed batch, before writing its rows one by one
+
+    # Generation Cache
+    GENERATION_CACHE_TTL_SECONDS: int = 86400
+    GENERATION_CACHE_MAX_LOCAL_ENTRIES: int = 1000
+
+    # Result Cache (read-only query results on the target databases)
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_TTL_SECONDS: int = 300
+    RESULT_CACHE_MAX_ENTRY_BYTES: int = 1_048_576  # compressed; larger results aren't cached
+    # Without Redis, results aren't cached: each worker's local cache would miss
+    # invalidations made by the others. Enable the local disk fallback only when
+    # the API runs as a single process.
+    RESULT_CACHE_LOCAL_FALLBACK: bool = False
+    RESULT_CACHE_MAX_DISK_BYTES: int = 268_435_456  # local fallback
+    RESULT_CACHE_DIR: str = ""  # local fallback; defaults to a directory under the system temp dir
+
+    # Few-shot Examples (retrieved from past successful queries)
+    FEW_SHOT_ENABLED: bool = True
+    FEW_SHOT_K: int = 3
+    FEW_SHOT_MIN_SCORE: float = 0.3
+    FEW_SHOT_DIRECT_MATCH_ENABLED: bool = True  # reuse SQL of the same question text (ignoring case and spacing)
+    FEW_SHOT_INDEX_MAX_EXAMPLES: int = 2000
+    FEW_SHOT_INDEX_TTL_SECONDS: int = 600
+
+    # Query Templates (matched questions run without the LLM)
+    TEMPLATES_ENABLED: bool = True
+    TEMPLATE_CACHE_TTL_SECONDS: int = 300
+    TEMPLATE_USAGE_FLUSH_INTERVAL_SECONDS: float = 30.0
+
+    # Insights (results are profiled locally; only the profile goes to the LLM)
+    INSIGHTS_LLM_ENABLED: bool = True
+    INSIGHTS_PROFILE_TOP_K: int = 5
+    VISUALIZATION_LLM_FALLBACK: bool = True  # ask the LLM only when the chart rules don't apply
+
     @property
     def cors_origins(self) -> List[str]:
         return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",")]
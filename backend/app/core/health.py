@@ -0,0 +1,117 @@
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy import text
+from app.core.config import settings
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ReadinessProbe:
+    """Dependency and pool health for /ready, cached for READINESS_CACHE_SECONDS
+
+    The metadata database is required. Redis and the global MongoDB are
+    optional and only reported. A worker is not ready while any target-database
+    pool has every connection checked out, so load balancers drain it until
+    the pool frees up. Concurrent probes within the cache interval share one
+    check, so health checks never become load themselves.
+    """
+
+    def __init__(self, cache_seconds: float = None, timeout_seconds: float = None):
+        self.cache_seconds = settings.READINESS_CACHE_SECONDS if cache_seconds is None else cache_seconds
+        self.timeout_seconds = timeout_seconds or settings.READINESS_CHECK_TIMEOUT_SECONDS
+        self._report: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def check(self) -> Dict[str, Any]:
+        """Return the cached report, re-running the checks once it has expired"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if self._report is None or time.monotonic() - self._checked_at > self.cache_seconds:
+                self._report = await self._run_checks()
+                self._checked_at = time.monotonic()
+            return self._report
+
+    async def _run_checks(self) -> Dict[str, Any]:
+        # Imported lazily so importing this module never touches the database layer
+        from app.db import database
+        from app.db.engine_registry import engine_registry
+
+        database_status, redis_status, mongodb_status = await asyncio.gather(
+            self._timed(self._check_database, database),
+            self._timed(self._check_redis, database),
+            self._timed(self._check_mongodb, database)
+        )
+        redis_status["required"] = False
+        mongodb_status["required"] = False
+
+        target_pools = engine_registry.pool_stats()
+        exhausted = [
+            pool["fingerprint"] for pool in target_pools
+            if pool.get("capacity") and pool["checked_out"] >= pool["capacity"]
+        ]
+
+        ready = database_status["status"] == "ok" and not exhausted
+        return {
+            "status": "ready" if ready else "not_ready",
+            "checked_at": datetime.utcnow().isoformat(),
+            "dependencies": {
+                "database": database_status,
+                "redis": redis_status,
+                "mongodb": mongodb_status
+            },
+            "target_pools": target_pools,
+            "exhausted_pools": exhausted,
+            "executor_queue_depth": engine_registry.executor_queue_depth()
+        }
+
+    async def _timed(self, check: Callable[[Any], Dict[str, Any]], database) -> Dict[str, Any]:
+        """Run a blocking check in a worker thread with a deadline"""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(
+                loop.run_in_executor(None, check, database),
+                timeout=self.timeout_seconds
+            )
+        except asyncio.TimeoutError:
+            result = {"status": "timeout"}
+        except Exception as e:
+            logger.warning(f"Readiness check {check.__name__} failed: {e}")
+            result = {"status": "error", "error": str(e)}
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    @staticmethod
+    def _check_database(database) -> Dict[str, Any]:
+        from app.db.engine_registry import pool_usage
+
+        engine = database.get_engine()
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return {"status": "ok", "dialect": engine.dialect.name, "pool": pool_usage(engine)}
+
+    @staticmethod
+    def _check_redis(database) -> Dict[str, Any]:
+        client = database.get_redis()
+        if client is None:
+            return {"status": "unavailable"}
+        client.ping()
+        return {"status": "ok"}
+
+    @staticmethod
+    def _check_mongodb(database) -> Dict[str, Any]:
+        client = database.get_mongo_client()
+        if client is None:
+            return {"status": "unavailable"}
+        client.admin.command("ping")
+        return {"status": "ok"}
+
+
+# Singleton instance
+readiness_probe = ReadinessProbe()
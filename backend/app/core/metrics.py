@@ -0,0 +1,138 @@
+from prometheus_client import Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from contextlib import contextmanager
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages observed by PIPELINE_STAGE_SECONDS
+STAGES = (
+    "schema_fetch",
+    "prompt_build",
+    "llm_generation",
+    "validation",
+    "plan_gate",
+    "execution",
+    "serialization",
+    "insights",
+    "history_persistence",
+)
+
+PIPELINE_STAGE_SECONDS = Histogram(
+    "querymind_pipeline_stage_seconds",
+    "Latency of each stage of the natural-language query pipeline",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+
+QUERIES_TOTAL = Counter(
+    "querymind_queries_total",
+    "Natural-language queries by SQL provider, database and outcome",
+    ["provider", "database_id", "status"]
+)
+
+LLM_REQUESTS_TOTAL = Counter(
+    "querymind_llm_requests_total",
+    "LLM provider calls by outcome",
+    ["provider", "status"]
+)
+
+# "input" counts every prompt token; "cached_input" is the part served from the
+# provider's prompt cache and "cache_write" the part written to it
+LLM_TOKENS_TOTAL = Counter(
+    "querymind_llm_tokens_total",
+    "LLM tokens by provider and kind (input, cached_input, cache_write, output)",
+    ["provider", "kind"]
+)
+
+
+@contextmanager
+def observe_stage(stage: str):
+    """Record the wall-clock duration of a pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PIPELINE_STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+class RuntimeStateCollector:
+    """Gauges sampled at scrape time: pool saturation, queue depths and cache hit ratios"""
+
+    def describe(self):
+        # Without describe() the registry calls collect() on registration, which
+        # would import the services while they are still importing this module
+        return []
+
+    def collect(self):
+        # Imported lazily: these modules import settings and the database layer
+        from app.db.engine_registry import engine_registry
+        from app.services.ai_service import ai_service
+        from app.services.generation_cache import generation_cache
+        from app.services.history_sink import history_sink
+        from app.services.schema_cache import schema_cache
+
+        checked_out = GaugeMetricFamily(
+            "querymind_target_pool_checked_out",
+            "Connections checked out of each target-database pool",
+            labels=["connection"]
+        )
+        idle = GaugeMetricFamily(
+            "querymind_target_pool_idle",
+            "Idle connections in each target-database pool",
+            labels=["connection"]
+        )
+        saturation = GaugeMetricFamily(
+            "querymind_target_pool_saturation",
+            "Checked-out connections as a fraction of pool capacity",
+            labels=["connection"]
+        )
+        for pool in engine_registry.pool_stats():
+            if "checked_out" not in pool:
+                continue
+            labels = [pool["fingerprint"]]
+            checked_out.add_metric(labels, pool["checked_out"])
+            idle.add_metric(labels, pool["idle"])
+            if pool["capacity"]:
+                saturation.add_metric(labels, pool["checked_out"] / pool["capacity"])
+        yield checked_out
+        yield idle
+        yield saturation
+
+        yield GaugeMetricFamily(
+            "querymind_executor_queue_depth",
+            "Blocking database calls waiting for a worker thread",
+            value=engine_registry.executor_queue_depth()
+        )
+        yield GaugeMetricFamily(
+            "querymind_history_queue_depth",
+            "Query history records waiting to be persisted",
+            value=history_sink.queue_depth
+        )
+
+        in_flight = GaugeMetricFamily(
+            "querymind_llm_in_flight",
+            "LLM requests holding a provider concurrency slot",
+            labels=["provider"]
+        )
+        for name, provider in ai_service.providers.items():
+            in_flight.add_metric([name], provider.in_flight)
+        yield in_flight
+
+        hit_ratio = GaugeMetricFamily(
+            "querymind_cache_hit_ratio",
+            "Fraction of cache lookups served from the cache",
+            labels=["cache"]
+        )
+        hit_ratio.add_metric(["generation"], generation_cache.stats()["hit_ratio"])
+        hit_ratio.add_metric(["schema"], schema_cache.hit_ratio)
+        yield hit_ratio
+
+
+REGISTRY.register(RuntimeStateCollector())
+
+
+def render_metrics():
+    """Serialize the default registry in the Prometheus text format"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -3,50 +3,141 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from typing import Generator, Dict, List, Any
 from app.core.config import settings
+from app.db.engine_registry import engine_registry, is_mongodb_url
+import asyncio
 import logging
 import os
+import threading
 
 logger = logging.getLogger(__name__)
 
-# SQLAlchemy setup - use SQLite fallback if PostgreSQL isn't available
-_db_url = settings.DATABASE_URL
-try:
-    _test_engine = create_engine(_db_url, pool_pre_ping=True)
-    with _test_engine.connect() as _c:
-        _c.execute(text("SELECT 1"))
-    engine = _test_engine
-    logger.info(f"Connected to primary database: {_db_url.split('@')[-1] if '@' in _db_url else _db_url}")
-except Exception as e:
-    # Fallback to SQLite
-    _sqlite_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "querymind.db")
-    _db_url = f"sqlite:///{_sqlite_path}"
-    engine = create_engine(_db_url, connect_args={"check_same_thread": False})
-    logger.warning(f"PostgreSQL unavailable ({e}). Using SQLite at: {_sqlite_path}")
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Connections to the metadata database, Redis and the global MongoDB are opened
+# lazily by the accessors below (or concurrently by init_connections at startup),
+# so importing this module never touches the network.
+_UNSET = object()
+# One lock per dependency so a slow probe never holds up the others
+_engine_lock = threading.Lock()
+_redis_lock = threading.Lock()
+_mongo_lock = threading.Lock()
+_engine = None
+_redis_client = _UNSET
+_mongo_client = _UNSET
+_status: Dict[str, str] = {"database": "pending", "redis": "pending", "mongodb": "pending"}
+
+
+class _LazySessionmaker(sessionmaker):
+    """sessionmaker that binds to the metadata engine on first use"""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _LazySessionmaker(autocommit=False, autoflush=False)
 Base = declarative_base()
 
-# Redis setup (optional)
-try:
-    import redis
-    redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
-    redis_client.ping()
-    logger.info("Connected to Redis")
-except Exception as e:
-    redis_client = None
-    logger.warning(f"Redis unavailable ({e}). Caching disabled.")
-
-# MongoDB global setup (optional - for app-level features, NOT user databases)
-try:
-    from pymongo import MongoClient
-    mongo_client = MongoClient(settings.MONGODB_URL, serverSelectionTimeoutMS=3000)
-    mongo_client.admin.command('ping')
-    mongo_db = mongo_client.get_database("querymind")
-    logger.info("Connected to global MongoDB")
-except Exception as e:
-    mongo_client = None
-    mongo_db = None
-    logger.warning(f"Global MongoDB unavailable ({e}). MongoDB features require per-connection setup.")
+
+def get_engine():
+    """Return the metadata engine, falling back to SQLite if DATABASE_URL is unreachable"""
+    global _engine
+    if _engine is not None:
+        return _engine
+
+    with _engine_lock:
+        if _engine is None:
+            db_url = settings.DATABASE_URL
+            try:
+                engine = create_engine(db_url, pool_pre_ping=True)
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                logger.info(f"Connected to primary database: {db_url.split('@')[-1] if '@' in db_url else db_url}")
+            except Exception as e:
+                # Fallback to SQLite
+                sqlite_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "querymind.db")
+                engine = create_engine(f"sqlite:///{sqlite_path}", connect_args={"check_same_thread": False})
+                logger.warning(f"PostgreSQL unavailable ({e}). Using SQLite at: {sqlite_path}")
+            _engine = engine
+            _status["database"] = engine.dialect.name
+    return _engine
+
+
+def get_redis():
+    """Return the Redis client, or None if Redis is unavailable (caching disabled)"""
+    global _redis_client
+    if _redis_client is not _UNSET:
+        return _redis_client
+
+    with _redis_lock:
+        if _redis_client is _UNSET:
+            try:
+                import redis
+                client = redis.from_url(
+                    settings.REDIS_URL,
+                    decode_responses=True,
+                    socket_connect_timeout=settings.DEPENDENCY_CONNECT_TIMEOUT_SECONDS
+                )
+                client.ping()
+                logger.info("Connected to Redis")
+                _status["redis"] = "connected"
+            except Exception as e:
+                client = None
+                logger.warning(f"Redis unavailable ({e}). Caching disabled.")
+                _status["redis"] = "unavailable"
+            _redis_client = client
+    return _redis_client
+
+
+def get_mongo_client():
+    """Return the global MongoDB client (app-level features, NOT user databases), or None"""
+    global _mongo_client
+    if _mongo_client is not _UNSET:
+        return _mongo_client
+
+    with _mongo_lock:
+        if _mongo_client is _UNSET:
+            try:
+                from pymongo import MongoClient
+                client = MongoClient(
+                    settings.MONGODB_URL,
+                    serverSelectionTimeoutMS=settings.DEPENDENCY_CONNECT_TIMEOUT_SECONDS * 1000
+                )
+                client.admin.command('ping')
+                logger.info("Connected to global MongoDB")
+                _status["mongodb"] = "connected"
+            except Exception as e:
+                client = None
+                logger.warning(f"Global MongoDB unavailable ({e}). MongoDB features require per-connection setup.")
+                _status["mongodb"] = "unavailable"
+            _mongo_client = client
+    return _mongo_client
+
+
+def get_mongo_db():
+    """Return the global "querymind" MongoDB database, or None"""
+    client = get_mongo_client()
+    return client.get_database("querymind") if client is not None else None
+
+
+async def init_connections() -> asyncio.Future:
+    """Connect to all dependencies concurrently without blocking the event loop
+
+    Waits for the metadata database (and creates its tables), which every
+    request needs. Redis and MongoDB are optional, so their probes keep running
+    in the background; the returned future resolves once they finish.
+    """
+    loop = asyncio.get_running_loop()
+    optional = asyncio.gather(
+        loop.run_in_executor(None, get_redis),
+        loop.run_in_executor(None, get_mongo_client)
+    )
+    await loop.run_in_executor(None, init_db)
+    return optional
+
+
+def connection_status() -> Dict[str, str]:
+    """State of each dependency: pending, connected (or the dialect name) or unavailable"""
+    return dict(_status)
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -63,12 +154,12 @@ class DatabaseInspector:
     
     def __init__(self, db_url: str = None):
         self.db_url = db_url or settings.DATABASE_URL
-        self.is_mongodb = self.db_url.startswith(("mongodb://", "mongodb+srv://"))
+        self.is_mongodb = is_mongodb_url(self.db_url)
+        self._schema_info = None
         
         if self.is_mongodb:
-            from pymongo import MongoClient
             try:
-                self.mongo_client = MongoClient(self.db_url, serverSelectionTimeoutMS=5000)
+                self.mongo_client = engine_registry.get_mongo_client(self.db_url, owner=self)
                 # Try to get database name from URL, otherwise use default
                 from urllib.parse import urlparse
                 parsed = urlparse(self.db_url)
@@ -82,7 +173,7 @@ class DatabaseInspector:
                 raise e
         else:
             try:
-                self.engine = create_engine(self.db_url)
+                self.engine = engine_registry.get_engine(self.db_url)
                 self.inspector = inspect(self.engine)
                 logger.info(f"Initialized Inspector for: {self.engine.dialect.name}")
             except Exception as e:
@@ -121,65 +212,171 @@ class DatabaseInspector:
                 "total_tables": len(tables)
             }
         
-        for table_name in self.inspector.get_table_names():
-            columns = []
-            for column in self.inspector.get_columns(table_name):
-                columns.append({
-                    "name": column["name"],
-                    "type": str(column["type"]),
-                    "nullable": column["nullable"],
-                    "default": column.get("default"),
-                    "primary_key": column.get("primary_key", False)
-                })
-            
-            # Get foreign keys
-            foreign_keys = []
-            for fk in self.inspector.get_foreign_keys(table_name):
-                foreign_keys.append({
-                    "constrained_columns": fk["constrained_columns"],
-                    "referred_table": fk["referred_table"],
-                    "referred_columns": fk["referred_columns"]
-                })
-            
-            # Get indexes
-            indexes = []
-            for idx in self.inspector.get_indexes(table_name):
-                indexes.append({
-                    "name": idx["name"],
-                    "columns": idx["column_names"],
-                    "unique": idx["unique"]
-                })
-            
-            tables[table_name] = {
-                "columns": columns,
-                "foreign_keys": foreign_keys,
-                "indexes": indexes,
-                "primary_key": self.inspector.get_pk_constraint(table_name)
-            }
+        if self.engine.dialect.name == "sqlite":
+            tables = self._reflect_sqlite_bulk()
+        else:
+            tables = self._reflect_multi()
         
-        return {
+        self._schema_info = {
             "tables": tables,
             "database_type": self.engine.dialect.name,
             "total_tables": len(tables)
         }
+        return self._schema_info
+    
+    def _reflect_multi(self) -> Dict[str, Any]:
+        """Reflect all tables with SQLAlchemy's bulk get_multi_* API
+        
+        On PostgreSQL each call is a single pg_catalog query covering every
+        table, so the whole schema costs a handful of round-trips instead of 4N.
+        Dialects without a bulk implementation fall back to per-table queries.
+        """
+        columns_by_table = self.inspector.get_multi_columns()
+        fks_by_table = self.inspector.get_multi_foreign_keys()
+        indexes_by_table = self.inspector.get_multi_indexes()
+        pks_by_table = self.inspector.get_multi_pk_constraint()
+        
+        tables = {}
+        for key in sorted(columns_by_table, key=lambda k: k[1]):
+            table_name = key[1]
+            primary_key = pks_by_table.get(key) or {"constrained_columns": [], "name": None}
+            pk_columns = set(primary_key.get("constrained_columns") or [])
+            
+            tables[table_name] = {
+                "columns": [
+                    {
+                        "name": column["name"],
+                        "type": str(column["type"]),
+                        "nullable": column["nullable"],
+                        "default": column.get("default"),
+                        "primary_key": column["name"] in pk_columns
+                    }
+                    for column in columns_by_table[key]
+                ],
+                "foreign_keys": [
+                    {
+                        "constrained_columns": fk["constrained_columns"],
+                        "referred_table": fk["referred_table"],
+                        "referred_columns": fk["referred_columns"]
+                    }
+                    for fk in fks_by_table.get(key, [])
+                ],
+                "indexes": [
+                    {
+                        "name": idx["name"],
+                        "columns": idx["column_names"],
+                        "unique": idx["unique"]
+                    }
+                    for idx in indexes_by_table.get(key, [])
+                ],
+                "primary_key": primary_key
+            }
+        
+        return tables
+    
+    def _reflect_sqlite_bulk(self) -> Dict[str, Any]:
+        """Reflect all SQLite tables in three queries
+        
+        Joins sqlite_master against the table-valued pragma functions so that
+        columns, foreign keys and indexes for every table each come back in a
+        single statement.
+        """
+        user_tables = "m.type = 'table' AND m.name NOT LIKE 'sqlite~_%' ESCAPE '~'"
+        
+        with self.engine.connect() as conn:
+            column_rows = conn.execute(text(
+                "SELECT m.name, p.name, p.type, p.\"notnull\", p.dflt_value, p.pk "
+                "FROM sqlite_master AS m JOIN pragma_table_info(m.name) AS p "
+                f"WHERE {user_tables} ORDER BY m.name, p.cid"
+            )).fetchall()
+            fk_rows = conn.execute(text(
+                "SELECT m.name, f.id, f.\"table\", f.\"from\", f.\"to\" "
+                "FROM sqlite_master AS m JOIN pragma_foreign_key_list(m.name) AS f "
+                f"WHERE {user_tables} ORDER BY m.name, f.id, f.seq"
+            )).fetchall()
+            index_rows = conn.execute(text(
+                "SELECT m.name, il.name, il.\"unique\", ii.name "
+                "FROM sqlite_master AS m JOIN pragma_index_list(m.name) AS il "
+                "JOIN pragma_index_info(il.name) AS ii "
+                f"WHERE {user_tables} AND il.name NOT LIKE 'sqlite~_autoindex%' ESCAPE '~' "
+                "ORDER BY m.name, il.name, ii.seqno"
+            )).fetchall()
+        
+        tables = {}
+        pk_positions: Dict[str, List] = {}
+        for table_name, name, col_type, notnull, default, pk in column_rows:
+            table = tables.setdefault(table_name, {
+                "columns": [],
+                "foreign_keys": [],
+                "indexes": [],
+                "primary_key": {"constrained_columns": [], "name": None}
+            })
+            table["columns"].append({
+                "name": name,
+                "type": col_type.upper() if col_type else "NULL",
+                "nullable": not notnull,
+                "default": default,
+                "primary_key": pk > 0
+            })
+            if pk:
+                pk_positions.setdefault(table_name, []).append((pk, name))
+        
+        for table_name, positions in pk_positions.items():
+            tables[table_name]["primary_key"]["constrained_columns"] = [name for _, name in sorted(positions)]
+        
+        foreign_keys: Dict[tuple, Dict[str, Any]] = {}
+        for table_name, fk_id, referred_table, from_col, to_col in fk_rows:
+            fk = foreign_keys.setdefault((table_name, fk_id), {
+                "constrained_columns": [],
+                "referred_table": referred_table,
+                "referred_columns": []
+            })
+            fk["constrained_columns"].append(from_col)
+            fk["referred_columns"].append(to_col)
+        
+        for (table_name, _), fk in foreign_keys.items():
+            if None in fk["referred_columns"]:
+                # "REFERENCES parent" without columns targets the parent's primary key
+                referred = tables.get(fk["referred_table"])
+                fk["referred_columns"] = referred["primary_key"]["constrained_columns"] if referred else []
+            if table_name in tables:
+                tables[table_name]["foreign_keys"].append(fk)
+        
+        indexes: Dict[tuple, Dict[str, Any]] = {}
+        for table_name, index_name, unique, column_name in index_rows:
+            idx = indexes.setdefault((table_name, index_name), {
+                "name": index_name,
+                "columns": [],
+                "unique": bool(unique)
+            })
+            idx["columns"].append(column_name)
+        
+        for (table_name, _), idx in indexes.items():
+            if table_name in tables:
+                tables[table_name]["indexes"].append(idx)
+        
+        return tables
     
     def get_table_relationships(self) -> List[Dict[str, Any]]:
-        """Get relationships between tables"""
+        """Get relationships between tables
+        
+        Derived from the foreign keys of get_schema_info(), so calling both
+        only reflects the schema once.
+        """
         if self.is_mongodb:
             return []
-            
-        relationships = []
-        
-        for table_name in self.inspector.get_table_names():
-            for fk in self.inspector.get_foreign_keys(table_name):
-                relationships.append({
-                    "from_table": table_name,
-                    "from_columns": fk["constrained_columns"],
-                    "to_table": fk["referred_table"],
-                    "to_columns": fk["referred_columns"]
-                })
-        
-        return relationships
+        
+        schema_info = self._schema_info or self.get_schema_info()
+        return [
+            {
+                "from_table": table_name,
+                "from_columns": fk["constrained_columns"],
+                "to_table": fk["referred_table"],
+                "to_columns": fk["referred_columns"]
+            }
+            for table_name, table in schema_info["tables"].items()
+            for fk in table["foreign_keys"]
+        ]
     
     def get_sample_data(self, table_name: str, limit: int = 5) -> List[Dict]:
         """Get sample data from a table"""
@@ -199,13 +396,22 @@ class DatabaseInspector:
 
 def init_db():
     """Initialize database tables"""
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_engine())
 
 
 def close_db_connections():
     """Close all database connections"""
-    engine.dispose()
-    if mongo_client:
+    global _engine, _redis_client, _mongo_client
+    engine_registry.dispose_all()
+    with _engine_lock, _redis_lock, _mongo_lock:
+        engine, _engine = _engine, None
+        redis_client, _redis_client = _redis_client, _UNSET
+        mongo_client, _mongo_client = _mongo_client, _UNSET
+        _status.update(database="pending", redis="pending", mongodb="pending")
+    SessionLocal.configure(bind=None)
+    if engine is not None:
+        engine.dispose()
+    if mongo_client not in (None, _UNSET):
         mongo_client.close()
-    if redis_client:
+    if redis_client not in (None, _UNSET):
         redis_client.close()
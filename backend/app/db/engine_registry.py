@@ -0,0 +1,286 @@
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+import hashlib
+import logging
+import threading
+import time
+import weakref
+
+logger = logging.getLogger(__name__)
+
+
+def is_mongodb_url(connection_string: str) -> bool:
+    """Return True if the connection string points to MongoDB"""
+    return connection_string.startswith(("mongodb://", "mongodb+srv://"))
+
+
+def connection_fingerprint(connection_string: str) -> str:
+    """Stable key for a connection string that never exposes credentials"""
+    return hashlib.sha256(connection_string.strip().encode("utf-8")).hexdigest()
+
+
+def pool_usage(engine: Engine) -> Dict[str, int]:
+    """Checked-out, idle and overflow connections of an engine's QueuePool
+
+    Returns an empty dict for pools that don't track usage (e.g. SQLite's
+    SingletonThreadPool). capacity is 0 when overflow is unbounded.
+    """
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return {}
+    size = pool.size() if hasattr(pool, "size") else 0
+    max_overflow = getattr(pool, "_max_overflow", 0)
+    return {
+        "size": size,
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin() if hasattr(pool, "checkedin") else 0,
+        "overflow": max(pool.overflow(), 0) if hasattr(pool, "overflow") else 0,
+        "capacity": size + max_overflow if max_overflow >= 0 else 0,
+    }
+
+
+class _RegistryEntry:
+    """A pooled engine or Mongo client plus its bookkeeping"""
+
+    def __init__(self, fingerprint: str, kind: str, resource: Any):
+        self.fingerprint = fingerprint
+        self.kind = kind  # "sql" or "mongodb"
+        self.resource = resource
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.leases = 0  # owners currently holding the Mongo client
+        self.retired = False  # removed from the registry, close once the last lease ends
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+    def dispose(self):
+        try:
+            if self.kind == "mongodb":
+                self.resource.close()
+            else:
+                self.resource.dispose()
+        except Exception as e:
+            logger.warning(f"Failed to dispose pooled {self.kind} connection {self.fingerprint[:12]}: {e}")
+
+
+class EngineRegistry:
+    """Process-wide registry of SQLAlchemy engines and Mongo clients keyed by connection fingerprint
+
+    Entries are kept in LRU order. Acquiring a connection sweeps out entries that
+    have been idle longer than TARGET_DB_IDLE_TIMEOUT_SECONDS, and the least
+    recently used entry is disposed when TARGET_DB_MAX_ENGINES is exceeded.
+    Disposing an engine only closes idle pooled connections; connections that are
+    checked out finish their work and are discarded when returned. A MongoClient
+    can't be closed under a running operation, so each one is leased to the object
+    that acquired it and an evicted client is only closed once its last lease ends.
+    """
+
+    def __init__(
+        self,
+        max_engines: int = None,
+        idle_timeout_seconds: int = None,
+        executor_workers: int = None
+    ):
+        self.max_engines = max_engines or settings.TARGET_DB_MAX_ENGINES
+        self.idle_timeout_seconds = idle_timeout_seconds or settings.TARGET_DB_IDLE_TIMEOUT_SECONDS
+        self._executor_workers = executor_workers or settings.QUERY_EXECUTOR_WORKERS
+        self._entries: "OrderedDict[str, _RegistryEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._leases: Dict[int, weakref.finalize] = {}
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Shared thread pool used to run blocking driver calls"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._executor_workers,
+                    thread_name_prefix="query-executor"
+                )
+            return self._executor
+
+    def get_engine(self, connection_string: str) -> Engine:
+        """Return the pooled engine for a SQL connection string, creating it on first use"""
+        return self._acquire(connection_string, "sql", self._create_engine)
+
+    def get_mongo_client(self, connection_string: str, owner: Any = None):
+        """Return the pooled MongoClient for a MongoDB connection string
+
+        The client is leased to owner until release(owner) is called or owner is
+        garbage collected; eviction won't close it while any lease is held.
+        """
+        return self._acquire(connection_string, "mongodb", self._create_mongo_client, owner)
+
+    def release(self, owner: Any):
+        """End the lease owner holds on a Mongo client, closing it if it was evicted"""
+        with self._lock:
+            finalizer = self._leases.get(id(owner))
+        if finalizer:
+            finalizer()
+
+    def _end_lease(self, owner_id: int, entry: _RegistryEntry):
+        with self._lock:
+            self._leases.pop(owner_id, None)
+            entry.leases -= 1
+            close = entry.retired and entry.leases == 0
+        if close:
+            logger.info(f"Closing evicted connection {entry.fingerprint[:12]} after its last lease")
+            entry.dispose()
+
+    def _retire(self, entries: List[_RegistryEntry]) -> List[_RegistryEntry]:
+        """Entries removed from the registry that can be disposed now (call under the lock)"""
+        disposable = []
+        for entry in entries:
+            entry.retired = True
+            if entry.leases == 0:
+                disposable.append(entry)
+        return disposable
+
+    def _acquire(self, connection_string: str, kind: str, factory, owner: Any = None) -> Any:
+        fingerprint = connection_fingerprint(connection_string)
+        expired = []
+
+        with self._lock:
+            expired.extend(self._pop_idle(exclude=fingerprint))
+
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                entry = _RegistryEntry(fingerprint, kind, factory(connection_string))
+                self._entries[fingerprint] = entry
+                logger.info(f"Created pooled {kind} connection {fingerprint[:12]} ({len(self._entries)} active)")
+
+                while len(self._entries) > self.max_engines:
+                    _, evicted = self._entries.popitem(last=False)
+                    expired.append(evicted)
+                    logger.info(f"Evicting least recently used connection {evicted.fingerprint[:12]}")
+            else:
+                self._entries.move_to_end(fingerprint)
+
+            entry.touch()
+            if owner is not None and id(owner) not in self._leases:
+                entry.leases += 1
+                self._leases[id(owner)] = weakref.finalize(owner, self._end_lease, id(owner), entry)
+            expired = self._retire(expired)
+
+        # Dispose outside the lock so slow network teardown never blocks other requests
+        for stale in expired:
+            stale.dispose()
+
+        return entry.resource
+
+    def _pop_idle(self, exclude: str = None):
+        now = time.monotonic()
+        idle = [
+            fp for fp, entry in self._entries.items()
+            if fp != exclude and entry.leases == 0 and now - entry.last_used > self.idle_timeout_seconds
+        ]
+        return [self._entries.pop(fp) for fp in idle]
+
+    def evict_idle(self) -> int:
+        """Dispose entries that have been idle longer than the idle timeout"""
+        with self._lock:
+            expired = self._retire(self._pop_idle())
+        for entry in expired:
+            entry.dispose()
+        return len(expired)
+
+    def dispose(self, connection_string: str) -> bool:
+        """Dispose a single pooled connection, e.g. after its credentials change
+
+        A leased Mongo client is closed once its last lease ends.
+        """
+        with self._lock:
+            entry = self._entries.pop(connection_fingerprint(connection_string), None)
+            disposable = self._retire([entry]) if entry else []
+        for stale in disposable:
+            stale.dispose()
+        return entry is not None
+
+    def dispose_all(self):
+        """Dispose every pooled engine and client and stop the shared thread pool"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            # Shutting down: close leased clients too, nothing is waited for
+            for finalizer in list(self._leases.values()):
+                finalizer.detach()
+            self._leases.clear()
+            executor, self._executor = self._executor, None
+
+        for entry in entries:
+            entry.dispose()
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+        logger.info(f"Disposed {len(entries)} pooled connections")
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of the registry for diagnostics"""
+        with self._lock:
+            return {
+                "active": len(self._entries),
+                "max_engines": self.max_engines,
+                "idle_timeout_seconds": self.idle_timeout_seconds,
+            }
+
+    def pool_stats(self) -> List[Dict[str, Any]]:
+        """Per-connection pool usage: checked-out and idle connections, overflow"""
+        with self._lock:
+            entries = list(self._entries.values())
+
+        stats = []
+        for entry in entries:
+            item = {
+                "fingerprint": entry.fingerprint[:12],
+                "kind": entry.kind,
+                "leases": entry.leases,
+                "idle_seconds": round(time.monotonic() - entry.last_used, 1),
+            }
+            if entry.kind == "sql":
+                item.update(pool_usage(entry.resource))
+            stats.append(item)
+        return stats
+
+    def executor_queue_depth(self) -> int:
+        """Tasks waiting for a free worker thread in the shared executor"""
+        executor = self._executor
+        return executor._work_queue.qsize() if executor else 0
+
+    @staticmethod
+    def _create_engine(connection_string: str) -> Engine:
+        if connection_string.startswith("sqlite"):
+            # sqlite3 has no connect_timeout and SQLite files don't benefit from large pools
+            return create_engine(
+                connection_string,
+                pool_pre_ping=True,
+                connect_args={"check_same_thread": False, "timeout": settings.QUERY_TIMEOUT_SECONDS}
+            )
+
+        return create_engine(
+            connection_string,
+            pool_pre_ping=True,
+            pool_size=settings.TARGET_DB_POOL_SIZE,
+            max_overflow=settings.TARGET_DB_MAX_OVERFLOW,
+            pool_timeout=settings.TARGET_DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.TARGET_DB_POOL_RECYCLE_SECONDS,
+            connect_args={"connect_timeout": settings.QUERY_TIMEOUT_SECONDS}
+        )
+
+    @staticmethod
+    def _create_mongo_client(connection_string: str):
+        from pymongo import MongoClient
+        return MongoClient(
+            connection_string,
+            serverSelectionTimeoutMS=settings.QUERY_TIMEOUT_SECONDS * 1000,
+            maxPoolSize=settings.TARGET_DB_POOL_SIZE + settings.TARGET_DB_MAX_OVERFLOW,
+            maxIdleTimeMS=settings.TARGET_DB_IDLE_TIMEOUT_SECONDS * 1000
+        )
+
+
+# Singleton instance
+engine_registry = EngineRegistry()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.database import Base
@@ -61,6 +61,11 @@ class Query(Base):
     # Relationships
     user = relationship("User", back_populates="queries")
     database = relationship("DatabaseConnection", back_populates="queries")
+    
+    # Matches the keyset pagination order of the history endpoint
+    __table_args__ = (
+        Index("ix_queries_database_created_id", "database_id", "created_at", "id"),
+    )
 
 
 class Conversation(Base):
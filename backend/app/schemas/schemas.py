@@ -15,6 +15,7 @@ class QueryStatus(str, Enum):
     SUCCESS = "success"
     ERROR = "error"
     TIMEOUT = "timeout"
+    CANCELLED = "cancelled"
     PROCESSING = "processing"
 
 
@@ -63,10 +64,16 @@ class QueryRequest(BaseModel):
     conversation_id: Optional[int] = Field(None, description="Conversation context ID")
     include_insights: bool = Field(True, description="Generate AI insights")
     explain_sql: bool = Field(False, description="Include SQL explanation")
+    query_id: Optional[str] = Field(
+        None,
+        max_length=64,
+        description="Client-chosen ID for cancelling the query with DELETE /queries/{query_id}"
+    )
 
 
 class QueryResponse(BaseModel):
-    id: int
+    id: Optional[int] = Field(None, description="History record ID; not yet assigned while the record is queued for writing")
+    query_id: Optional[str] = Field(None, description="ID the query was executed (and can be cancelled) under; identifies its history record")
     natural_language_query: str
     generated_sql: str
     execution_time_ms: Optional[int]
@@ -82,6 +89,53 @@ class QueryResponse(BaseModel):
         from_attributes = True
 
 
+class ResultFormat(str, Enum):
+    NDJSON = "ndjson"
+    ARROW = "arrow"
+
+
+class QueryStreamRequest(BaseModel):
+    natural_language_query: str = Field(..., description="User's question in natural language")
+    database_id: int = Field(..., description="Target database ID")
+    format: ResultFormat = Field(ResultFormat.NDJSON, description="Streaming output format")
+    query_id: Optional[str] = Field(
+        None,
+        max_length=64,
+        description="Client-chosen ID for cancelling the stream with DELETE /queries/{query_id}"
+    )
+
+
+class QueryBatchItem(BaseModel):
+    natural_language_query: str = Field(..., description="User's question in natural language")
+    query_id: Optional[str] = Field(
+        None,
+        max_length=64,
+        description="Client-chosen ID for cancelling the query with DELETE /queries/{query_id}"
+    )
+
+
+class QueryBatchRequest(BaseModel):
+    database_id: int = Field(..., description="Target database ID shared by all questions")
+    queries: List[QueryBatchItem] = Field(..., min_length=1, description="Questions to answer")
+    include_insights: bool = Field(False, description="Generate AI insights for every result")
+    explain_sql: bool = Field(False, description="Include SQL explanations")
+
+
+class QueryBatchResult(BaseModel):
+    """One NDJSON line of a /query/batch response"""
+    index: int = Field(..., description="Position of the question in the request")
+    status_code: int = Field(..., description="HTTP status the question would have had on /query")
+    result: Optional[QueryResponse] = None
+    detail: Optional[str] = Field(None, description="Error detail when status_code is not 200")
+
+
+class ResultCacheInvalidation(BaseModel):
+    tables: Optional[List[str]] = Field(
+        None,
+        description="Tables whose cached results are dropped; all of the database's results when omitted"
+    )
+
+
 # Schema Information
 class ColumnInfo(BaseModel):
     name: str
@@ -1,11 +1,18 @@
-from anthropic import Anthropic
-from openai import OpenAI
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional, Sequence, Tuple
+import asyncio
 import json
+import logging
 from app.core.config import settings
+from app.core.metrics import observe_stage
 from app.schemas.schemas import SQLGenerationResponse, DataInsight
+from app.services.chart_recommender import CHART_TYPES, column_kinds, recommend_charts
+from app.services.llm_providers import LLMProvider, OpenAIProvider, AnthropicProvider
+from app.services.result_profiler import profile_results, local_insights
+from app.services.schema_retrieval import schema_retriever, format_table, estimate_tokens
 import re
 
+logger = logging.getLogger(__name__)
+
 
 class AIService:
     """AI service for natural language processing and SQL generation"""
@@ -13,49 +20,100 @@ class AIService:
     def __init__(self):
         self.use_openai = bool(settings.OPENAI_API_KEY and settings.OPENAI_API_KEY != "your_openai_api_key_here")
         self.use_anthropic = bool(settings.ANTHROPIC_API_KEY and settings.ANTHROPIC_API_KEY != "your_anthropic_api_key_here")
+        self.providers: Dict[str, LLMProvider] = {}
         
         if self.use_openai:
-            self.openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
-            self.openai_model = "gpt-4o"
+            self.providers["openai"] = OpenAIProvider(
+                api_key=settings.OPENAI_API_KEY,
+                model="gpt-4o",
+                base_url=settings.OPENAI_BASE_URL
+            )
         
         if self.use_anthropic:
-            self.anthropic_client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
-            self.anthropic_model = "claude-3-5-sonnet-20240620"
+            self.providers["anthropic"] = AnthropicProvider(
+                api_key=settings.ANTHROPIC_API_KEY,
+                model="claude-3-5-sonnet-20240620",
+                base_url=settings.ANTHROPIC_BASE_URL
+            )
         
         # Default to OpenAI if available, else Anthropic
         self.preferred_provider = "openai" if self.use_openai else "anthropic"
     
-    async def _call_ai(self, prompt: str, max_tokens: int = 2000) -> str:
-        """Helper to call the preferred AI provider"""
-        if self.preferred_provider == "openai":
-            response = self.openai_client.chat.completions.create(
-                model=self.openai_model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=max_tokens,
-                response_format={"type": "json_object"} if "JSON" in prompt.upper() else None
-            )
-            return response.choices[0].message.content
-        else:
-            response = self.anthropic_client.messages.create(
-                model=self.anthropic_model,
-                max_tokens=max_tokens,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            return response.content[0].text
+    async def _call_ai(self, prompt: str, max_tokens: int = 2000, system: Optional[str] = None) -> str:
+        """Helper to call the preferred AI provider without blocking the event loop
+        
+        system is the static prompt prefix that providers can cache across calls.
+        """
+        provider = self.providers.get(self.preferred_provider)
+        if provider is None:
+            raise RuntimeError("No AI provider is configured. Set OPENAI_API_KEY or ANTHROPIC_API_KEY.")
+        
+        return await provider.complete(
+            prompt,
+            max_tokens=max_tokens,
+            json_mode="JSON" in f"{system or ''}{prompt}".upper(),
+            system=system
+        )
 
     async def generate_sql(
         self,
         natural_language: str,
         schema_info: Dict[str, Any],
-        conversation_history: Optional[List[Dict[str, str]]] = None
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        examples: Optional[List[Dict[str, Any]]] = None
     ) -> SQLGenerationResponse:
         """Generate SQL or MongoDB query from natural language query"""
         
+        system, prompt = self._sql_prompt(natural_language, schema_info, conversation_history, examples)
+        
+        with observe_stage("llm_generation"):
+            content = await self._call_ai(prompt, max_tokens=2000, system=system)
+        
+        return self.parse_sql_response(content)
+    
+    async def stream_sql(
+        self,
+        natural_language: str,
+        schema_info: Dict[str, Any],
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        examples: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[str]:
+        """Stream the raw generate_sql response text as the provider produces it
+        
+        Parse the joined text with parse_sql_response(); the "sql" field comes
+        first, so it can be picked out (SQLFieldExtractor) before the end.
+        """
+        system, prompt = self._sql_prompt(natural_language, schema_info, conversation_history, examples)
+        
+        provider = self.providers.get(self.preferred_provider)
+        if provider is None:
+            raise RuntimeError("No AI provider is configured. Set OPENAI_API_KEY or ANTHROPIC_API_KEY.")
+        
+        async for chunk in provider.stream(prompt, max_tokens=2000, json_mode=True, system=system):
+            yield chunk
+    
+    def _sql_prompt(
+        self,
+        natural_language: str,
+        schema_info: Dict[str, Any],
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        examples: Optional[List[Dict[str, Any]]] = None
+    ) -> Tuple[str, str]:
+        """(system, prompt) for SQL generation: static prefix and per-question part"""
+        
         db_type = schema_info.get("database_type", "postgresql").lower()
         is_mongodb = db_type == "mongodb"
         
-        # Build context from schema
-        schema_context = self._build_schema_context(schema_info)
+        # Build context from schema, pruned to the relevant tables on large schemas
+        with observe_stage("prompt_build"):
+            schema_context, pruned = self._schema_context(schema_info, focus=natural_language)
+        
+        # Similar questions answered successfully before on this database
+        examples_context = ""
+        if examples:
+            examples_context = "\nSimilar questions answered before on this database:\n"
+            for example in examples:
+                examples_context += f"Question: {example['question']}\nQuery: {example['sql']}\n\n"
         
         # Build conversation context
         conversation_context = ""
@@ -85,16 +143,22 @@ class AIService:
 5. Return ONLY valid SQL.
 """
 
-        prompt = f"""You are an expert database administrator and query generator. 
+        # Everything that only depends on the database goes into the system prompt,
+        # a prefix that stays identical across questions and is served from the
+        # provider's prompt cache. A pruned schema depends on the question, so the
+        # prefix keeps a compact catalogue of every table instead and the relevant
+        # tables, with their column types, go to the variable part.
+        if pruned:
+            schema_section = f"Database Schema (tables and column names):\n{schema_retriever.build_catalog(schema_info)}\n"
+            relevant_section = f"Relevant tables for this question:\n{schema_context}\n"
+        else:
+            schema_section = f"Database Schema:\n{schema_context}\n"
+            relevant_section = ""
+        system = f"""You are an expert database administrator and query generator. 
 Convert the natural language command/question into a {query_type}.
 
 Database Type: {db_type}
-Database Schema:
-{schema_context}
-{conversation_context}
-
-User Input: {natural_language}
-
+{schema_section}
 Rules:
 {syntax_rules}
 6. Return ONLY valid response, no explanations in the query itself.
@@ -109,7 +173,15 @@ Respond in JSON format:
 }}
 """
         
-        content = await self._call_ai(prompt, max_tokens=2000)
+        prompt = f"""{relevant_section}{examples_context}{conversation_context}
+User Input: {natural_language}
+"""
+        
+        return system, prompt
+    
+    @staticmethod
+    def parse_sql_response(content: str) -> SQLGenerationResponse:
+        """Parse a generate_sql response, falling back to treating it as bare SQL"""
         
         # Extract JSON from response
         json_match = re.search(r'\{.*\}', content, re.DOTALL)
@@ -129,7 +201,7 @@ Respond in JSON format:
     
     async def generate_insights(
         self,
-        query_results: List[Dict[str, Any]],
+        query_results: Sequence[Dict[str, Any]],
         original_question: str
     ) -> List[DataInsight]:
         """Generate AI-powered insights and plain-language summaries from query results"""
@@ -142,19 +214,19 @@ Respond in JSON format:
                 confidence=1.0
             )]
         
-        # Prepare data summary
-        data_summary = {
-            "row_count": len(query_results),
-            "columns": list(query_results[0].keys()) if query_results else [],
-            "sample_data": query_results[:10] # Give more samples
-        }
+        # Profile the full result locally; only the compact profile goes to the LLM
+        loop = asyncio.get_running_loop()
+        profile = await loop.run_in_executor(None, profile_results, query_results)
+        insights = local_insights(profile)
+        if not settings.INSIGHTS_LLM_ENABLED:
+            return insights
         
         prompt = f"""Analyze the following dataset and explain what it means in plain, non-technical English.
 
 User's Original Goal: {original_question}
 
-Data Summary:
-{json.dumps(data_summary, indent=2, default=str)}
+Data Profile (computed over all {profile["row_count"]} rows):
+{json.dumps(profile, indent=2, default=str)}
 
 Provide insights in JSON format as an array. 
 The first item MUST be a 'summary' type that provides a high-level plain language explanation of the results.
@@ -172,17 +244,30 @@ Focus on:
 - Interpreting the numbers (e.g., "The average sales are higher than last month")
 - Identifying key takeaways
 - Explaining unusual findings
+Column ranges, trends and outliers are already reported separately, so don't just restate them.
 """
         
-        content = await self._call_ai(prompt, max_tokens=1500)
+        try:
+            content = await self._call_ai(prompt, max_tokens=1500)
+        except Exception as e:
+            logger.warning(f"LLM insights failed, returning local insights only: {e}")
+            return insights
         
         # Extract JSON array
         json_match = re.search(r'\[.*\]', content, re.DOTALL)
         if json_match:
-            insights_data = json.loads(json_match.group())
-            return [DataInsight(**insight) for insight in insights_data]
+            try:
+                llm_insights = [DataInsight(**insight) for insight in json.loads(json_match.group())]
+            except (ValueError, TypeError) as e:
+                # Malformed JSON or insights that don't fit the schema
+                logger.warning(f"Could not parse LLM insights, returning local insights only: {e}")
+                return insights
+            if llm_insights and llm_insights[0].type == "summary":
+                # The LLM summary replaces the local row-count summary
+                return llm_insights[:1] + insights[1:] + llm_insights[1:]
+            return insights + llm_insights
         
-        return []
+        return insights
     
     async def explain_sql(self, sql: str, schema_info: Dict[str, Any]) -> str:
         """Explain SQL query in plain language"""
@@ -193,7 +278,7 @@ SQL Query:
 {sql}
 
 Database Schema:
-{self._build_schema_context(schema_info)}
+{self._build_schema_context(schema_info, focus=sql)}
 
 Provide a clear explanation that a non-technical person can understand.
 Focus on:
@@ -208,7 +293,7 @@ Focus on:
     
     async def suggest_visualizations(
         self,
-        query_results: List[Dict[str, Any]],
+        query_results: Sequence[Dict[str, Any]],
         original_question: str
     ) -> List[str]:
         """Suggest appropriate visualization types for the data"""
@@ -216,8 +301,16 @@ Focus on:
         if not query_results:
             return []
         
-        columns = list(query_results[0].keys()) if query_results else []
-        
+        suggestions = recommend_charts(query_results)
+        if suggestions is not None or not settings.VISUALIZATION_LLM_FALLBACK:
+            return suggestions or ["table"]
+
+        # Ambiguous shape: let the LLM choose, given the detected column types
+        columns = [
+            f"{name} ({kind}, ~{distinct} distinct)"
+            for name, (kind, distinct) in column_kinds(query_results).items()
+        ]
+
         prompt = f"""Based on the following data, suggest appropriate visualization types:
 
 Original Question: {original_question}
@@ -240,23 +333,36 @@ Return as JSON array: ["type1", "type2", "type3"]
         content = await self._call_ai(prompt, max_tokens=300)
         json_match = re.search(r'\[.*\]', content, re.DOTALL)
         if json_match:
-            return json.loads(json_match.group())
+            return [chart for chart in json.loads(json_match.group()) if chart in CHART_TYPES] or ["table"]
         
         return ["table"]
     
-    def _build_schema_context(self, schema_info: Dict[str, Any]) -> str:
-        """Build a readable schema context for the AI"""
+    def _build_schema_context(self, schema_info: Dict[str, Any], focus: Optional[str] = None) -> str:
+        """Build a readable schema context for the AI
+        
+        When the full schema would exceed SCHEMA_CONTEXT_TOKEN_BUDGET and a focus
+        text (the question or SQL) is given, only the tables relevant to it are
+        included.
+        """
+        return self._schema_context(schema_info, focus)[0]
+    
+    def _schema_context(self, schema_info: Dict[str, Any], focus: Optional[str] = None):
+        """Schema context plus whether it was pruned to the focus text"""
         context = []
         
         tables = schema_info.get("tables", {})
         for table_name, table_data in tables.items():
-            columns_str = ", ".join([
-                f"{col['name']} ({col['type']})"
-                for col in table_data.get("columns", [])
-            ])
-            context.append(f"Table: {table_name}\nColumns: {columns_str}\n")
+            context.append(format_table(table_name, table_data.get("columns", [])))
+        
+        full_context = "\n".join(context)
+        if (
+            focus
+            and settings.SCHEMA_PRUNING_ENABLED
+            and estimate_tokens(full_context) > settings.SCHEMA_CONTEXT_TOKEN_BUDGET
+        ):
+            return schema_retriever.build_context(schema_info, focus), True
         
-        return "\n".join(context)
+        return full_context, False
     
     async def optimize_query(self, sql: str, schema_info: Dict[str, Any]) -> str:
         """Suggest query optimizations"""
@@ -266,7 +372,7 @@ Return as JSON array: ["type1", "type2", "type3"]
 {sql}
 
 Schema:
-{self._build_schema_context(schema_info)}
+{self._build_schema_context(schema_info, focus=sql)}
 
 Provide optimization suggestions for:
 - Index usage
@@ -0,0 +1,108 @@
+from datetime import date, datetime
+from numbers import Number
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from app.services.columnar import ColumnarResult
+
+CHART_TYPES = (
+    "bar_chart", "line_chart", "pie_chart", "scatter_plot",
+    "3d_scatter", "heatmap", "table", "area_chart",
+)
+
+# Column types and cardinality are judged from the first rows only
+SAMPLE_SIZE = 500
+KIND_SAMPLE_SIZE = 50
+PIE_MAX_CATEGORIES = 6
+BAR_MAX_CATEGORIES = 50
+
+
+def _is_temporal(value: Any) -> bool:
+    if isinstance(value, (date, datetime)):
+        return True
+    if isinstance(value, str) and 8 <= len(value) <= 32 and value[:4].isdigit() and value[4:5] == "-":
+        try:
+            datetime.fromisoformat(value.replace("Z", "+00:00"))
+            return True
+        except ValueError:
+            return False
+    return False
+
+
+def _kind(name: str, values: List[Any]) -> str:
+    present = [v for v in values if v is not None][:KIND_SAMPLE_SIZE]
+    if not present:
+        return "empty"
+    lowered = name.lower()
+    if all(isinstance(v, Number) and not isinstance(v, bool) for v in present):
+        # Surrogate keys are labels, not measures
+        return "categorical" if lowered == "id" or lowered.endswith("_id") else "numeric"
+    if all(_is_temporal(v) for v in present):
+        return "temporal"
+    return "categorical"
+
+
+def _cardinality(values: List[Any]) -> int:
+    try:
+        return len(set(values))
+    except TypeError:
+        return len({str(v) for v in values})
+
+
+def column_kinds(results: Sequence[Dict[str, Any]]) -> Dict[str, Tuple[str, int]]:
+    """(kind, sampled distinct count) per column; kind is numeric, temporal, categorical or empty"""
+    kinds = {}
+    if isinstance(results, ColumnarResult):
+        for name, column in zip(results.columns, results.data):
+            values = column[:SAMPLE_SIZE].tolist()
+            # Typed int/float arrays are numeric throughout; one value settles the kind
+            kind = _kind(name, values[:1] if column.dtype.kind in "iuf" else values)
+            kinds[name] = (kind, _cardinality(values))
+        return kinds
+
+    rows = results[:SAMPLE_SIZE]
+    for name in rows[0].keys() if rows else []:
+        values = [row.get(name) for row in rows]
+        kinds[name] = (_kind(name, values), _cardinality(values))
+    return kinds
+
+
+def recommend_charts(results: Sequence[Dict[str, Any]]) -> Optional[List[str]]:
+    """Pick 2-3 chart types from column types and cardinality
+
+    Returns None when no rule clearly applies, so the caller can fall back
+    to another strategy.
+    """
+    if len(results) <= 1:
+        return ["table"]
+
+    kinds = column_kinds(results)
+    numeric = [name for name, (kind, _) in kinds.items() if kind == "numeric"]
+    temporal = [name for name, (kind, _) in kinds.items() if kind == "temporal"]
+    categorical = [name for name, (kind, _) in kinds.items() if kind == "categorical"]
+
+    if temporal and numeric:
+        return ["line_chart", "area_chart", "table"]
+
+    if len(categorical) == 1 and numeric:
+        categories = kinds[categorical[0]][1]
+        if len(numeric) == 1 and categories <= PIE_MAX_CATEGORIES:
+            return ["bar_chart", "pie_chart", "table"]
+        if categories <= BAR_MAX_CATEGORIES:
+            return ["bar_chart", "table"]
+        return ["table", "bar_chart"]
+
+    if len(categorical) == 2 and len(numeric) == 1:
+        if all(kinds[name][1] <= BAR_MAX_CATEGORIES for name in categorical):
+            return ["heatmap", "bar_chart", "table"]
+        return None
+
+    if not categorical and not temporal:
+        if len(numeric) >= 3:
+            return ["3d_scatter", "scatter_plot", "table"]
+        if len(numeric) == 2:
+            return ["scatter_plot", "table"]
+        if len(numeric) == 1:
+            return ["bar_chart", "table"]
+
+    if numeric:
+        return None
+    return ["table"]
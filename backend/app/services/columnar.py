@@ -0,0 +1,108 @@
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Union
+import numpy as np
+
+
+def _to_array(values: List[Any]) -> np.ndarray:
+    """Pack a column into a typed array when every value is a plain number or bool"""
+    kinds = {type(v) for v in values}
+    try:
+        if kinds == {bool}:
+            return np.array(values, dtype=np.bool_)
+        if kinds == {int}:
+            return np.array(values, dtype=np.int64)
+        if kinds and kinds <= {int, float}:
+            return np.array(values, dtype=np.float64)
+    except OverflowError:
+        pass  # integers beyond int64 stay Python objects
+
+    # NULLs, strings, dates, Decimals...: keep the driver's objects, without per-row
+    # dicts. Drivers return a new str per row, so repeated values are shared.
+    if str in kinds:
+        canonical = {}
+        values = [canonical.setdefault(v, v) if type(v) is str else v for v in values]
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+class ColumnarResult(Sequence):
+    """Tabular query result stored column-wise
+
+    Column names are kept once and each column is a NumPy array (typed for
+    numeric and boolean columns, object otherwise), instead of one dict per row.
+    It still behaves like a read-only list of row dicts (len, indexing, slicing,
+    iteration), building dicts only for the rows that are actually accessed;
+    use to_rows() at the API boundary and to_dataframe() for analysis.
+    """
+
+    def __init__(self, columns: List[str], data: List[np.ndarray]):
+        self.columns = list(columns)
+        self.data = data
+        self._length = len(data[0]) if data else 0
+
+    @classmethod
+    def from_rows(cls, columns: Iterable[str], rows: Sequence[Sequence[Any]]) -> "ColumnarResult":
+        """Build from row tuples, e.g. a SQLAlchemy fetchmany() result"""
+        columns = list(columns)
+        if not rows:
+            return cls(columns, [np.empty(0, dtype=object) for _ in columns])
+        return cls(columns, [_to_array(list(values)) for values in zip(*rows)])
+
+    @classmethod
+    def from_columns(cls, columns: Iterable[str], values: Sequence[List[Any]]) -> "ColumnarResult":
+        """Build from one list of values per column"""
+        return cls(list(columns), [_to_array(list(column)) for column in values])
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        if isinstance(index, slice):
+            return self._rows(index)
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("result row index out of range")
+        return self._rows(slice(index, index + 1))[0]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.to_rows())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ColumnarResult):
+            return self.columns == other.columns and self.to_rows() == other.to_rows()
+        if isinstance(other, list):
+            return self.to_rows() == other
+        return NotImplemented
+
+    def keys(self) -> List[str]:
+        return list(self.columns)
+
+    def column(self, name: str) -> np.ndarray:
+        return self.data[self.columns.index(name)]
+
+    def _rows(self, index: slice) -> List[Dict[str, Any]]:
+        # tolist() turns NumPy scalars back into plain Python values for JSON
+        sliced = [column[index].tolist() for column in self.data]
+        return [dict(zip(self.columns, values)) for values in zip(*sliced)]
+
+    def to_rows(self) -> List[Dict[str, Any]]:
+        """Row dicts for JSON responses"""
+        return self._rows(slice(None))
+
+    def to_dataframe(self):
+        """pandas DataFrame over the same column arrays (numeric columns aren't copied)"""
+        import pandas as pd
+        return pd.DataFrame(dict(zip(self.columns, self.data)), copy=False)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the column buffers (object columns count their pointers only)"""
+        return sum(column.nbytes for column in self.data)
+
+
+def result_rows(results: Any) -> List[Dict[str, Any]]:
+    """Row dicts from either a ColumnarResult or an already row-shaped list (MongoDB)"""
+    if isinstance(results, ColumnarResult):
+        return results.to_rows()
+    return results
@@ -0,0 +1,192 @@
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.models import Query
+from app.schemas.schemas import SQLGenerationResponse
+from app.services.generation_cache import normalize_question
+from app.services.schema_retrieval import tokenize
+from app.services.sql_analysis import analyze_sql
+import asyncio
+import heapq
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _ExampleIndex:
+    """Inverted TF-IDF index over one database's successful (question, SQL) pairs"""
+
+    def __init__(self, pairs: Sequence[Tuple[str, str]]):
+        self.examples: List[Tuple[str, str]] = []
+        self._positions: Dict[str, int] = {}
+        documents = []
+        for question, sql in pairs:  # newest first, so the latest SQL wins
+            key = normalize_question(question)
+            if key in self._positions:
+                continue
+            self._positions[key] = len(self.examples)
+            self.examples.append((question, sql))
+            documents.append(Counter(tokenize(question)))
+
+        self._document_count = len(documents)
+        document_frequency = Counter(term for terms in documents for term in terms)
+        self._idf = {
+            term: math.log((1 + self._document_count) / (1 + df)) + 1
+            for term, df in document_frequency.items()
+        }
+        self._postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for position, terms in enumerate(documents):
+            self._post(position, terms)
+
+    def idf(self, term: str) -> float:
+        # Terms first seen after the index was built count as rare
+        return self._idf.get(term) or math.log(1 + self._document_count) + 1
+
+    def _vector(self, terms: Counter) -> Dict[str, float]:
+        vector = {term: count * self.idf(term) for term, count in terms.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        return {term: weight / norm for term, weight in vector.items()}
+
+    def _post(self, position: int, terms: Counter):
+        for term, weight in self._vector(terms).items():
+            self._postings[term].append((position, weight))
+
+    def add(self, question: str, sql: str):
+        key = normalize_question(question)
+        if key in self._positions:
+            return
+        self._positions[key] = len(self.examples)
+        self.examples.append((question, sql))
+        self._post(len(self.examples) - 1, Counter(tokenize(question)))
+
+    def exact(self, question: str) -> Optional[int]:
+        """Position of a past question with the same text (case, spacing and trailing punctuation aside)"""
+        return self._positions.get(normalize_question(question))
+
+    def search(self, question: str, k: int) -> List[Tuple[float, int]]:
+        """Top-k (cosine similarity, position) pairs"""
+        scores: Dict[int, float] = defaultdict(float)
+        for term, weight in self._vector(Counter(tokenize(question))).items():
+            for position, example_weight in self._postings.get(term, ()):
+                scores[position] += weight * example_weight
+        return heapq.nlargest(k, ((score, position) for position, score in scores.items()))
+
+
+class ExampleRetriever:
+    """Few-shot examples from the database's own successful query history
+
+    Past (question, SQL) pairs with status "success" are indexed per database
+    by TF-IDF over the question terms; the index is loaded from the queries
+    table and kept for FEW_SHOT_INDEX_TTL_SECONDS, and successful queries are
+    added to it as they happen. The top matches become few-shot examples in
+    the generation prompt. TF-IDF ignores word order and symbols ("total > 100"
+    scores the same as "total < 100"), so it only picks examples; a question
+    is answered with past SQL directly only when its text is the same as the
+    past question's (normalized like the generation cache key, so operators,
+    signs and word order all count), and that SQL is read-only and only uses
+    tables that still exist.
+    """
+
+    def __init__(
+        self,
+        k: int = None,
+        min_score: float = None,
+        direct_match: bool = None,
+        max_examples: int = None,
+        ttl_seconds: int = None
+    ):
+        self.k = k or settings.FEW_SHOT_K
+        self.min_score = min_score or settings.FEW_SHOT_MIN_SCORE
+        self.direct_match = settings.FEW_SHOT_DIRECT_MATCH_ENABLED if direct_match is None else direct_match
+        self.max_examples = max_examples or settings.FEW_SHOT_INDEX_MAX_EXAMPLES
+        self.ttl_seconds = ttl_seconds or settings.FEW_SHOT_INDEX_TTL_SECONDS
+        self._indexes: Dict[int, Tuple[float, _ExampleIndex]] = {}
+        self._lock = threading.Lock()
+
+    async def find(
+        self,
+        database_id: int,
+        question: str,
+        schema_info: Dict[str, Any]
+    ) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """(direct match or None, few-shot examples) for a question"""
+        try:
+            index = await self._index(database_id)
+        except Exception as e:
+            logger.warning(f"Could not load query examples for database {database_id}: {e}")
+            return None, []
+
+        examples = [
+            {"question": index.examples[position][0], "sql": index.examples[position][1], "score": score}
+            for score, position in index.search(question, self.k)
+            if score >= self.min_score
+        ]
+
+        position = index.exact(question) if self.direct_match else None
+        if position is not None:
+            match = {"question": index.examples[position][0], "sql": index.examples[position][1], "score": 1.0}
+            if self._servable(match, schema_info):
+                return match, examples
+        return None, examples
+
+    @staticmethod
+    def _servable(example: Dict[str, Any], schema_info: Dict[str, Any]) -> bool:
+        analysis = analyze_sql(example["sql"], schema_info.get("database_type"))
+        if not analysis.is_read_only:
+            return False
+        known_tables = {name.lower().split(".")[-1] for name in schema_info.get("tables", {})}
+        return all(table.lower() in known_tables for table in analysis.tables)
+
+    @staticmethod
+    def as_generation(example: Dict[str, Any], dialect: Optional[str] = None) -> SQLGenerationResponse:
+        """Present a direct match the way the LLM's answer would be"""
+        analysis = analyze_sql(example["sql"], dialect)
+        return SQLGenerationResponse(
+            sql=example["sql"],
+            explanation=f"Same query as the earlier question \"{example['question']}\"",
+            confidence=round(min(example["score"], 1.0), 2),
+            tables_used=analysis.tables,
+            complexity_score=analysis.complexity_score
+        )
+
+    def add(self, database_id: int, question: str, sql: str):
+        """Make a just-succeeded query searchable without waiting for a reload"""
+        with self._lock:
+            cached = self._indexes.get(database_id)
+            if cached is not None:
+                cached[1].add(question, sql)
+
+    def invalidate(self, database_id: int):
+        with self._lock:
+            self._indexes.pop(database_id, None)
+
+    async def _index(self, database_id: int) -> _ExampleIndex:
+        with self._lock:
+            cached = self._indexes.get(database_id)
+            if cached and time.monotonic() - cached[0] <= self.ttl_seconds:
+                return cached[1]
+
+        loop = asyncio.get_running_loop()
+        index = await loop.run_in_executor(None, self._load, database_id)
+        with self._lock:
+            self._indexes[database_id] = (time.monotonic(), index)
+        return index
+
+    def _load(self, database_id: int) -> _ExampleIndex:
+        db = SessionLocal()
+        try:
+            rows = db.query(Query.natural_language_query, Query.generated_sql).filter(
+                Query.database_id == database_id,
+                Query.status == "success"
+            ).order_by(Query.created_at.desc()).limit(self.max_examples).all()
+        finally:
+            db.close()
+        return _ExampleIndex([(row[0], row[1]) for row in rows])
+
+
+# Singleton instance
+example_retriever = ExampleRetriever()
@@ -0,0 +1,165 @@
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from app.core.config import settings
+from app.db.database import get_redis
+from app.schemas.schemas import SQLGenerationResponse
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?.!;]+$")
+
+
+def normalize_question(question: str) -> str:
+    """Canonical form of a question used for exact-match lookups"""
+    normalized = _WHITESPACE.sub(" ", question.strip().lower())
+    return _TRAILING_PUNCTUATION.sub("", normalized)
+
+
+class GenerationCache:
+    """Cache generated SQL keyed by database, schema version and normalized question
+
+    Entries live in Redis when it is reachable and in a bounded in-process LRU
+    otherwise. Because the schema hash is part of the key, a changed schema can
+    never serve SQL generated against the old one; invalidate() additionally
+    drops a database's entries eagerly when its schema is re-synced, using a
+    per-database set of its Redis keys rather than a keyspace SCAN.
+
+    The methods make blocking Redis calls; call them from a worker thread
+    (run_in_executor), not on the event loop.
+    """
+
+    KEY_PREFIX = "nl2sql"
+
+    def __init__(self, ttl_seconds: int = None, max_local_entries: int = None):
+        self.ttl_seconds = ttl_seconds or settings.GENERATION_CACHE_TTL_SECONDS
+        self.max_local_entries = max_local_entries or settings.GENERATION_CACHE_MAX_LOCAL_ENTRIES
+        self._local: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, database_id: int, schema_hash: str, question: str) -> str:
+        question_hash = hashlib.sha256(normalize_question(question).encode("utf-8")).hexdigest()
+        return f"{self.KEY_PREFIX}:{database_id}:{schema_hash}:{question_hash}"
+
+    def _database_keys(self, database_id: int) -> str:
+        return f"{self.KEY_PREFIX}:keys:{database_id}"
+
+    @staticmethod
+    def _redis():
+        return get_redis()
+
+    def get(self, database_id: int, schema_hash: str, question: str) -> Optional[SQLGenerationResponse]:
+        """Return a cached generation for this question, or None"""
+        key = self._key(database_id, schema_hash, question)
+        payload = self._redis_get(key)
+        if payload is None:
+            payload = self._local_get(key)
+
+        if payload is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return SQLGenerationResponse(**json.loads(payload))
+
+    def set(self, database_id: int, schema_hash: str, question: str, result: SQLGenerationResponse):
+        """Store a successful generation"""
+        key = self._key(database_id, schema_hash, question)
+        payload = json.dumps(result.dict())
+
+        if not self._redis_set(key, payload, self._database_keys(database_id)):
+            self._local_set(key, payload)
+
+    def invalidate(self, database_id: int) -> int:
+        """Drop every cached generation for a database"""
+        prefix = f"{self.KEY_PREFIX}:{database_id}:"
+        removed = 0
+
+        redis_client = self._redis()
+        if redis_client is not None:
+            try:
+                keys = redis_client.smembers(self._database_keys(database_id))
+                if keys:
+                    removed += redis_client.delete(*keys)
+                redis_client.delete(self._database_keys(database_id))
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Failed to invalidate generation cache in Redis: {e}")
+
+        with self._lock:
+            for key in [k for k in self._local if k.startswith(prefix)]:
+                del self._local[key]
+                removed += 1
+
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis" if self._redis() is not None else "local",
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "local_entries": len(self._local)
+        }
+
+    def _redis_get(self, key: str) -> Optional[str]:
+        redis_client = self._redis()
+        if redis_client is None:
+            return None
+        try:
+            return redis_client.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Generation cache read from Redis failed: {e}")
+            return None
+
+    def _redis_set(self, key: str, payload: str, database_keys: str) -> bool:
+        redis_client = self._redis()
+        if redis_client is None:
+            return False
+        try:
+            pipe = redis_client.pipeline()
+            pipe.setex(key, self.ttl_seconds, payload)
+            pipe.sadd(database_keys, key)
+            pipe.expire(database_keys, self.ttl_seconds)
+            pipe.execute()
+            return True
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Generation cache write to Redis failed, using local cache: {e}")
+            return False
+
+    def _local_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return payload
+
+    def _local_set(self, key: str, payload: str):
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.ttl_seconds, payload)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_local_entries:
+                self._local.popitem(last=False)
+
+
+# Singleton instance
+generation_cache = GenerationCache()
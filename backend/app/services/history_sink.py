@@ -0,0 +1,172 @@
+from sqlalchemy import insert
+from typing import Dict, Any, List, Optional
+from app.core.config import settings
+from app.core.metrics import observe_stage
+from app.db.database import SessionLocal
+from app.models.models import Query
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class QueryHistorySink:
+    """Write-behind sink for Query history records
+
+    Requests enqueue plain column dicts and return immediately. A background
+    task flushes them with multi-row INSERTs once HISTORY_BATCH_SIZE records
+    are queued or HISTORY_FLUSH_INTERVAL_SECONDS have passed. The queue is
+    bounded, so producers wait (backpressure) instead of growing memory when the
+    metadata database falls behind. A batch that fails is retried up to
+    HISTORY_MAX_RETRIES times with backoff, then written row by row so one bad
+    record doesn't lose the others. stop() drains and flushes everything left.
+
+    Records stay visible through pending() until their flush finishes, so
+    history and conversation lookups can include queries that were answered
+    but not yet written.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = None,
+        flush_interval_seconds: float = None,
+        max_queue_size: int = None,
+        max_retries: int = None
+    ):
+        self.batch_size = batch_size or settings.HISTORY_BATCH_SIZE
+        self.flush_interval_seconds = flush_interval_seconds or settings.HISTORY_FLUSH_INTERVAL_SECONDS
+        self.max_queue_size = max_queue_size or settings.HISTORY_QUEUE_MAX_SIZE
+        self.max_retries = settings.HISTORY_MAX_RETRIES if max_retries is None else max_retries
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Queued or being written, oldest first; keyed by object identity
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self.written = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def start(self):
+        """Start the background flush loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Query history sink started (batch={self.batch_size}, interval={self.flush_interval_seconds}s)")
+
+    async def stop(self):
+        """Flush every queued record and stop the flush loop"""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        logger.info(f"Query history sink stopped ({self.written} written, {self.failed} failed)")
+
+    def pending(self, database_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Records not written yet, newest first, optionally for one database"""
+        return [
+            record for record in reversed(list(self._pending.values()))
+            if database_id is None or record["database_id"] == database_id
+        ]
+
+    async def submit(self, record: Dict[str, Any]):
+        """Queue a Query row (as column values) for persistence
+
+        Waits while the queue is full. Without a running flush loop (e.g. in
+        scripts) the record is written straight away.
+        """
+        if not self.running:
+            await asyncio.get_event_loop().run_in_executor(None, self._write_batch, [record])
+            return
+        self._pending[id(record)] = record
+        await self._queue.put(record)
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.flush_interval_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                await self._flush(batch)
+            finally:
+                for record in batch:
+                    self._pending.pop(id(record), None)
+
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        """Write a batch, retrying with backoff before falling back to single rows"""
+        loop = asyncio.get_event_loop()
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(min(self.flush_interval_seconds * 2 ** attempt, 30.0))
+            try:
+                await loop.run_in_executor(None, self._insert, batch)
+                self.written += len(batch)
+                return
+            except Exception as e:
+                logger.warning(
+                    f"Failed to persist {len(batch)} query history records "
+                    f"(attempt {attempt + 1}/{self.max_retries + 1}): {e}"
+                )
+        await loop.run_in_executor(None, self._write_rows, batch)
+
+    def _write_batch(self, records: List[Dict[str, Any]]):
+        try:
+            self._insert(records)
+            self.written += len(records)
+        except Exception as e:
+            logger.warning(f"Failed to persist {len(records)} query history records: {e}")
+            self._write_rows(records)
+
+    def _write_rows(self, records: List[Dict[str, Any]]):
+        for record in records:
+            try:
+                self._insert([record])
+                self.written += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Dropping query history record that can't be persisted: {e}")
+
+    @staticmethod
+    def _insert(records: List[Dict[str, Any]]):
+        db = SessionLocal()
+        try:
+            with observe_stage("history_persistence"):
+                db.execute(insert(Query), records)
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+# Singleton instance
+history_sink = QueryHistorySink()
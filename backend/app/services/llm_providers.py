@@ -0,0 +1,269 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+from app.core.config import settings
+from app.core.metrics import LLM_REQUESTS_TOTAL, LLM_TOKENS_TOTAL
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderTimeoutError(Exception):
+    """Raised when an LLM provider does not answer within its timeout"""
+
+
+class LLMProvider:
+    """Base class for async LLM providers
+
+    Each provider bounds its own in-flight requests with a semaphore and
+    enforces a per-call timeout. Calls are plain coroutines on the event loop,
+    so cancelling the awaiting task (e.g. on client disconnect) aborts the
+    underlying HTTP request.
+
+    A call may pass a system prompt: the stable prefix (instructions, schema)
+    that repeats across requests. It is sent ahead of the variable prompt so
+    the provider's prompt cache can reuse it; token usage, including cached
+    tokens, is counted in LLM_TOKENS_TOTAL.
+    """
+
+    name = "base"
+
+    def __init__(self, model: str, max_concurrency: int, timeout_seconds: float):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Number of requests currently holding a concurrency slot"""
+        return self._in_flight
+
+    async def complete(
+        self,
+        prompt: str,
+        max_tokens: int = 2000,
+        json_mode: bool = False,
+        system: Optional[str] = None
+    ) -> str:
+        """Return the completion text for a single-turn prompt"""
+        return await self._guarded(lambda: self._complete(prompt, max_tokens, json_mode, system))
+
+    async def stream(
+        self,
+        prompt: str,
+        max_tokens: int = 2000,
+        json_mode: bool = False,
+        system: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Yield the completion text in chunks as the provider produces them
+
+        The provider call runs in its own task under the same concurrency slot
+        and timeout as complete(), so the consumer can do other work between
+        chunks without that time counting against the call.
+        """
+        chunks: asyncio.Queue = asyncio.Queue()
+        done = object()
+        producer = asyncio.ensure_future(
+            self._guarded(lambda: self._stream(chunks.put_nowait, prompt, max_tokens, json_mode, system))
+        )
+        producer.add_done_callback(lambda _: chunks.put_nowait(done))
+        try:
+            while (chunk := await chunks.get()) is not done:
+                yield chunk
+            producer.result()  # re-raise timeouts and provider errors
+        finally:
+            producer.cancel()
+
+    async def _guarded(self, make_call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run a provider call under the concurrency slot, timeout and request counter"""
+        async with self._semaphore:
+            self._in_flight += 1
+            try:
+                result = await asyncio.wait_for(make_call(), timeout=self.timeout_seconds)
+                LLM_REQUESTS_TOTAL.labels(provider=self.name, status="success").inc()
+                return result
+            except asyncio.TimeoutError:
+                LLM_REQUESTS_TOTAL.labels(provider=self.name, status="timeout").inc()
+                logger.warning(f"{self.name} completion timed out after {self.timeout_seconds}s")
+                raise ProviderTimeoutError(
+                    f"{self.name} did not respond within {self.timeout_seconds} seconds"
+                )
+            except asyncio.CancelledError:
+                LLM_REQUESTS_TOTAL.labels(provider=self.name, status="cancelled").inc()
+                raise
+            except Exception:
+                LLM_REQUESTS_TOTAL.labels(provider=self.name, status="error").inc()
+                raise
+            finally:
+                self._in_flight -= 1
+
+    async def _complete(self, prompt: str, max_tokens: int, json_mode: bool, system: Optional[str]) -> str:
+        raise NotImplementedError
+
+    async def _stream(
+        self,
+        emit: Callable[[str], None],
+        prompt: str,
+        max_tokens: int,
+        json_mode: bool,
+        system: Optional[str]
+    ):
+        raise NotImplementedError
+
+    def _record_usage(self, input_tokens: int, output_tokens: int, cached_tokens: int = 0, cache_write_tokens: int = 0):
+        """Count one response's token usage; input_tokens includes cached tokens"""
+        for kind, count in (
+            ("input", input_tokens),
+            ("cached_input", cached_tokens),
+            ("cache_write", cache_write_tokens),
+            ("output", output_tokens),
+        ):
+            if count:
+                LLM_TOKENS_TOTAL.labels(provider=self.name, kind=kind).inc(count)
+        logger.debug(
+            f"{self.name} usage: {input_tokens} input ({cached_tokens} cached, "
+            f"{cache_write_tokens} written to cache), {output_tokens} output"
+        )
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI chat completions through the async SDK client"""
+
+    name = "openai"
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4o",
+        base_url: Optional[str] = None,
+        max_concurrency: int = None,
+        timeout_seconds: float = None
+    ):
+        super().__init__(
+            model,
+            max_concurrency or settings.OPENAI_MAX_CONCURRENCY,
+            timeout_seconds or settings.LLM_TIMEOUT_SECONDS
+        )
+        self._api_key = api_key
+        self._base_url = base_url or None
+        self._client = None
+
+    @property
+    def client(self):
+        # The SDK is imported on first use; it dominates the app's import time
+        if self._client is None:
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(api_key=self._api_key, base_url=self._base_url)
+        return self._client
+
+    async def _complete(self, prompt: str, max_tokens: int, json_mode: bool, system: Optional[str]) -> str:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(prompt, system),
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"} if json_mode else None
+        )
+        self._record_openai_usage(response.usage)
+        return response.choices[0].message.content
+
+    async def _stream(self, emit, prompt: str, max_tokens: int, json_mode: bool, system: Optional[str]):
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(prompt, system),
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"} if json_mode else None,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                emit(chunk.choices[0].delta.content)
+            if getattr(chunk, "usage", None) is not None:
+                self._record_openai_usage(chunk.usage)
+
+    @staticmethod
+    def _messages(prompt: str, system: Optional[str]):
+        # OpenAI caches long prompt prefixes automatically, so the static part goes first
+        messages = [{"role": "user", "content": prompt}]
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+        return messages
+
+    def _record_openai_usage(self, usage):
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        self._record_usage(
+            input_tokens=usage.prompt_tokens,
+            output_tokens=usage.completion_tokens,
+            cached_tokens=getattr(details, "cached_tokens", 0) or 0
+        )
+
+
+class AnthropicProvider(LLMProvider):
+    """Anthropic messages through the async SDK client"""
+
+    name = "anthropic"
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "claude-3-5-sonnet-20240620",
+        base_url: Optional[str] = None,
+        max_concurrency: int = None,
+        timeout_seconds: float = None
+    ):
+        super().__init__(
+            model,
+            max_concurrency or settings.ANTHROPIC_MAX_CONCURRENCY,
+            timeout_seconds or settings.LLM_TIMEOUT_SECONDS
+        )
+        self._api_key = api_key
+        self._base_url = base_url or None
+        self._client = None
+
+    @property
+    def client(self):
+        # The SDK is imported on first use; it dominates the app's import time
+        if self._client is None:
+            from anthropic import AsyncAnthropic
+            self._client = AsyncAnthropic(api_key=self._api_key, base_url=self._base_url)
+        return self._client
+
+    async def _complete(self, prompt: str, max_tokens: int, json_mode: bool, system: Optional[str]) -> str:
+        response = await self.client.messages.create(**self._request(prompt, max_tokens, system))
+        self._record_anthropic_usage(response.usage)
+        return response.content[0].text
+
+    async def _stream(self, emit, prompt: str, max_tokens: int, json_mode: bool, system: Optional[str]):
+        async with self.client.messages.stream(**self._request(prompt, max_tokens, system)) as stream:
+            async for text in stream.text_stream:
+                emit(text)
+            message = await stream.get_final_message()
+        self._record_anthropic_usage(message.usage)
+
+    def _request(self, prompt: str, max_tokens: int, system: Optional[str]):
+        request = {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+        if system:
+            block = {"type": "text", "text": system}
+            if settings.LLM_PROMPT_CACHING_ENABLED:
+                # Cache breakpoint after the static prefix; prefixes under the model's
+                # minimum cacheable length are simply sent uncached
+                block["cache_control"] = {"type": "ephemeral"}
+            request["system"] = [block]
+        return request
+
+    def _record_anthropic_usage(self, usage):
+        cached_tokens = getattr(usage, "cache_read_input_tokens", 0) or 0
+        cache_write_tokens = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        self._record_usage(
+            input_tokens=usage.input_tokens + cached_tokens + cache_write_tokens,
+            output_tokens=usage.output_tokens,
+            cached_tokens=cached_tokens,
+            cache_write_tokens=cache_write_tokens
+        )
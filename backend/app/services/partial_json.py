@@ -0,0 +1,68 @@
+from typing import Optional
+import json
+import re
+
+_FIELD_START = re.compile(r'"sql"\s*:\s*')
+
+
+class SQLFieldExtractor:
+    """Pick the "sql" field out of a JSON response while it is still streaming
+
+    Feed the text chunks as they arrive; feed() returns the field's value once
+    it is complete (the closing quote, or the closing bracket for a MongoDB
+    operation object), long before the rest of the response (explanation,
+    confidence...) has been generated. String values are unescaped; object
+    and array values are returned as their JSON text.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._value_start: Optional[int] = None
+        self._scan_from = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.sql: Optional[str] = None
+
+    def feed(self, chunk: str) -> Optional[str]:
+        if self.sql is not None:
+            return self.sql
+        self._buffer += chunk
+
+        if self._value_start is None:
+            match = _FIELD_START.search(self._buffer)
+            if not match or match.end() >= len(self._buffer):
+                return None
+            self._value_start = match.end()
+            self._scan_from = match.end()
+
+        end = self._scan()
+        if end is not None:
+            raw = self._buffer[self._value_start:end]
+            self.sql = json.loads(raw) if raw.startswith('"') else raw
+        return self.sql
+
+    def _scan(self) -> Optional[int]:
+        """Advance over the buffered value; index just past its end once it is complete"""
+        opener = self._buffer[self._value_start]
+        if opener not in '"{[':
+            return None  # not a string or object; left to the full parse
+
+        for i in range(self._scan_from, len(self._buffer)):
+            char = self._buffer[i]
+            if self._escaped:
+                self._escaped = False
+            elif char == "\\" and self._in_string:
+                self._escaped = True
+            elif char == '"':
+                self._in_string = not self._in_string
+                if not self._in_string and self._depth == 0:
+                    return i + 1
+            elif not self._in_string and char in "{[":
+                self._depth += 1
+            elif not self._in_string and char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    return i + 1
+        self._scan_from = len(self._buffer)
+        return None
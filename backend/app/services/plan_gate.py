@@ -0,0 +1,111 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from app.core.config import settings
+from app.db.engine_registry import connection_fingerprint
+from app.services.sql_analysis import analyze_sql
+import hashlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PlanCostGate:
+    """Pre-execution check of a query's estimated plan against cost thresholds
+
+    Queries whose plan is estimated to read more than PLAN_GATE_MAX_ESTIMATED_ROWS
+    rows or cost more than PLAN_GATE_MAX_COST (PostgreSQL cost units) are
+    rejected. In "rewrite" mode the outer LIMIT is first tightened to
+    PLAN_GATE_REWRITE_LIMIT and the rewritten query is checked again. Plans are
+    cached per (connection, SQL hash) for PLAN_CACHE_TTL_SECONDS. Only
+    read-only SQL and MongoDB aggregations are gated; other statements pass.
+    """
+
+    def __init__(
+        self,
+        max_estimated_rows: int = None,
+        max_cost: float = None,
+        action: str = None,
+        rewrite_limit: int = None,
+        cache_ttl_seconds: int = None,
+        max_cache_entries: int = None
+    ):
+        self.max_estimated_rows = max_estimated_rows or settings.PLAN_GATE_MAX_ESTIMATED_ROWS
+        self.max_cost = max_cost or settings.PLAN_GATE_MAX_COST
+        self.action = action or settings.PLAN_GATE_ACTION
+        self.rewrite_limit = rewrite_limit or settings.PLAN_GATE_REWRITE_LIMIT
+        self.cache_ttl_seconds = cache_ttl_seconds or settings.PLAN_CACHE_TTL_SECONDS
+        self.max_cache_entries = max_cache_entries or settings.PLAN_CACHE_MAX_ENTRIES
+        self._plans: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def evaluate(self, executor, sql: str, dialect: Optional[str] = None) -> Dict[str, Any]:
+        """Decide whether to run a query
+
+        Returns {"action": "allow" | "rewrite" | "reject", "sql", "plan", "reason"},
+        where "sql" is the statement to execute.
+        """
+        if not executor.is_mongodb and not analyze_sql(sql, dialect).is_read_only:
+            return {"action": "allow", "sql": sql, "plan": None, "reason": None}
+
+        try:
+            plan = await self._plan(executor, sql)
+        except Exception as e:
+            # A query the planner can't handle will fail (and be reported) at execution
+            logger.warning(f"EXPLAIN failed, skipping plan gate: {e}")
+            return {"action": "allow", "sql": sql, "plan": None, "reason": None}
+
+        reason = self._over_threshold(plan)
+        if reason is None:
+            return {"action": "allow", "sql": sql, "plan": plan, "reason": None}
+
+        if self.action == "rewrite" and not executor.is_mongodb:
+            rewritten = analyze_sql(sql, dialect).with_limit(self.rewrite_limit, tighten=True)
+            if rewritten != sql:
+                rewritten_plan = await self._plan(executor, rewritten)
+                if self._over_threshold(rewritten_plan) is None:
+                    logger.info(f"Plan gate tightened LIMIT to {self.rewrite_limit}: {reason}")
+                    return {
+                        "action": "rewrite",
+                        "sql": rewritten,
+                        "plan": rewritten_plan,
+                        "reason": f"{reason}; LIMIT lowered to {self.rewrite_limit}"
+                    }
+
+        logger.warning(f"Plan gate rejected query: {reason}")
+        return {"action": "reject", "sql": sql, "plan": plan, "reason": reason}
+
+    def _over_threshold(self, plan: Dict[str, Any]) -> Optional[str]:
+        rows = plan.get("estimated_rows")
+        cost = plan.get("estimated_cost")
+        scans = f" (full scan of {', '.join(plan['full_scans'])})" if plan.get("full_scans") else ""
+        if rows is not None and rows > self.max_estimated_rows:
+            return f"Estimated {rows:,} rows exceeds the limit of {self.max_estimated_rows:,}{scans}"
+        if cost is not None and cost > self.max_cost:
+            return f"Estimated cost {cost:,.0f} exceeds the limit of {self.max_cost:,.0f}{scans}"
+        return None
+
+    async def _plan(self, executor, sql: str) -> Dict[str, Any]:
+        key = hashlib.sha256(
+            f"{connection_fingerprint(executor.connection_string)}:{sql}".encode("utf-8")
+        ).hexdigest()
+
+        with self._lock:
+            cached = self._plans.get(key)
+            if cached and time.monotonic() - cached[0] <= self.cache_ttl_seconds:
+                self._plans.move_to_end(key)
+                return cached[1]
+
+        plan = await executor.explain_plan(sql)
+
+        with self._lock:
+            self._plans[key] = (time.monotonic(), plan)
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.max_cache_entries:
+                self._plans.popitem(last=False)
+        return plan
+
+
+# Singleton instance
+plan_gate = PlanCostGate()
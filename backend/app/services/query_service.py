@@ -1,28 +1,142 @@
-from sqlalchemy import create_engine, text
-from typing import List, Dict, Any, Optional
+from sqlalchemy import text
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
 import time
 import json
 from app.core.config import settings
+from app.db.engine_registry import engine_registry, is_mongodb_url
 from app.schemas.schemas import QueryStatus
+from app.services.columnar import ColumnarResult
+from app.services.result_cache import result_cache
+from app.services.sql_analysis import analyze_sql
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import functools
+import logging
 import re
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+# SQLite VM instructions between deadline checks
+SQLITE_PROGRESS_INTERVAL = 1000
+
+# Extra time the client-side deadline allows for the server-side timeout to fire
+CLIENT_DEADLINE_GRACE_SECONDS = 1.0
+
+
+def _discard_result(future: asyncio.Future):
+    # Nobody awaits an abandoned statement; retrieve its error so it isn't logged as unhandled
+    if not future.cancelled():
+        future.exception()
+
+
+class QueryTimeoutError(Exception):
+    """Raised when a statement runs past its execution deadline"""
+
+
+class QueryCancelledError(Exception):
+    """Raised when a statement is cancelled through running_queries"""
+
+
+class DuplicateQueryIdError(Exception):
+    """Raised when a query id is already in use by a running statement"""
+
+
+class StatementHandle:
+    """Deadline and cancel hook of one in-flight statement"""
+
+    def __init__(self, query_id: str, timeout_seconds: float):
+        self.query_id = query_id
+        self.timeout_seconds = timeout_seconds
+        self.deadline = time.monotonic() + timeout_seconds
+        self.cancelled = False
+        self._canceller: Optional[Callable[[], None]] = None
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+    def timeout_message(self) -> str:
+        return f"Query exceeded the {self.timeout_seconds:g}s execution timeout"
+
+    def set_canceller(self, canceller: Optional[Callable[[], None]]):
+        """Install the driver-level cancel hook; runs it at once if already cancelled"""
+        with self._lock:
+            self._canceller = canceller
+            run_now = canceller is not None and self.cancelled
+        if run_now:
+            self._invoke(canceller)
+
+    def cancel(self):
+        """Mark the statement cancelled and interrupt it on the server"""
+        with self._lock:
+            self.cancelled = True
+            canceller = self._canceller
+        if canceller is not None:
+            self._invoke(canceller)
+
+    def _invoke(self, canceller: Callable[[], None]):
+        try:
+            canceller()
+        except Exception as e:
+            logger.warning(f"Failed to cancel query {self.query_id}: {e}")
+
+
+class RunningQueries:
+    """In-flight statements of this worker process, keyed by query id"""
+
+    def __init__(self):
+        self._handles: Dict[str, StatementHandle] = {}
+        self._lock = threading.Lock()
+
+    def register(self, query_id: str, timeout_seconds: float) -> StatementHandle:
+        """Track a new statement; raises DuplicateQueryIdError if the id is taken"""
+        handle = StatementHandle(query_id, timeout_seconds)
+        with self._lock:
+            if query_id in self._handles:
+                raise DuplicateQueryIdError(f"A query with id {query_id} is already running")
+            self._handles[query_id] = handle
+        return handle
+
+    def is_running(self, query_id: str) -> bool:
+        return query_id in self._handles
+
+    def unregister(self, handle: StatementHandle):
+        with self._lock:
+            if self._handles.get(handle.query_id) is handle:
+                del self._handles[handle.query_id]
+
+    def cancel(self, query_id: str) -> bool:
+        """Cancel an in-flight statement; False if no such query is running"""
+        with self._lock:
+            handle = self._handles.get(query_id)
+        if handle is None:
+            return False
+        handle.cancel()
+        return True
+
+    def __len__(self) -> int:
+        return len(self._handles)
 
 
 class QueryExecutor:
-    """Execute SQL queries safely with timeout and validation"""
-    
+    """Execute SQL queries safely with timeout and validation
+
+    Engines, Mongo clients and the worker thread pool are shared process-wide
+    through the engine registry, so constructing an executor per request is cheap.
+    """
+
     def __init__(self, connection_string: str):
         self.connection_string = connection_string
-        self.is_mongodb = connection_string.startswith(("mongodb://", "mongodb+srv://"))
-        
+        self.is_mongodb = is_mongodb_url(connection_string)
+
         if self.is_mongodb:
-            from pymongo import MongoClient
             from urllib.parse import urlparse
-            self.mongo_client = MongoClient(
-                connection_string, 
-                serverSelectionTimeoutMS=settings.QUERY_TIMEOUT_SECONDS * 1000
-            )
+            self.mongo_client = engine_registry.get_mongo_client(connection_string, owner=self)
             # Correctly handle database name from path
             self.mongo_db_name = settings.MONGODB_URL.split('/')[-1].split('?')[0] if '?' in settings.MONGODB_URL else settings.MONGODB_URL.split('/')[-1]
             if not self.mongo_db_name or self.mongo_db_name == "atlas-sql-6989f8b63bb4d1f488aac3ca":
@@ -34,22 +148,38 @@ class QueryExecutor:
             self.is_atlas_sql = ".a.query.mongodb.net" in connection_string
             self.engine = None
         else:
-            self.engine = create_engine(
-                connection_string,
-                pool_pre_ping=True,
-                connect_args={"connect_timeout": settings.QUERY_TIMEOUT_SECONDS}
-            )
-        self.executor = ThreadPoolExecutor(max_workers=5)
+            self.engine = engine_registry.get_engine(connection_string)
+        self.executor = engine_registry.executor
     
     async def execute_query(
         self,
         sql: str,
         max_rows: int = 1000,
-        read_only: bool = True
+        read_only: bool = True,
+        query_id: Optional[str] = None,
+        timeout_seconds: Optional[float] = None,
+        params: Optional[Dict[str, Any]] = None,
+        use_result_cache: bool = True
     ) -> Dict[str, Any]:
-        """Execute SQL query and return results"""
+        """Execute SQL query and return results
+        
+        params are bound to the statement's :name placeholders by the driver.
+        Results of read-only SQL are served from and stored in the result
+        cache; a successful write drops the cached results of its tables.
+        
+        The statement is given a server-side deadline of timeout_seconds
+        (QUERY_TIMEOUT_SECONDS by default) and is registered under query_id so
+        running_queries.cancel() can kill it. Cancelling the awaiting task
+        (e.g. on client disconnect) cancels the statement as well.
+        
+        SQL results are a ColumnarResult; MongoDB results are a list of documents.
+        """
         
         start_time = time.time()
+        handle = running_queries.register(
+            query_id or uuid.uuid4().hex,
+            timeout_seconds or settings.QUERY_TIMEOUT_SECONDS
+        )
         
         try:
             if self.is_mongodb:
@@ -84,73 +214,9 @@ class QueryExecutor:
                     # Since we are using pymongo, we MUST use pipelines.
                     # AI service should have been instructed to return pipelines for MongoDB.
                 
-                try:
-                    # Try to parse as JSON pipeline
-                    pipeline_data = json.loads(sql_stripped)
-                    
-                    # Handle different MongoDB operation types if they are wrapped
-                    if isinstance(pipeline_data, dict) and "collection" in pipeline_data:
-                        coll_name = pipeline_data["collection"]
-                        
-                        # Handle Aggregation
-                        if "pipeline" in pipeline_data:
-                            actual_pipeline = pipeline_data["pipeline"]
-                            results = list(self.mongo_db[coll_name].aggregate(actual_pipeline))
-                        
-                        # Handle Insert
-                        elif "insert" in pipeline_data:
-                            doc = pipeline_data["insert"]
-                            res = self.mongo_db[coll_name].insert_one(doc)
-                            results = [{"inserted_id": str(res.inserted_id), "success": True}]
-                        
-                        # Handle Update
-                        elif "update" in pipeline_data:
-                            filter_query = pipeline_data.get("filter", {})
-                            update_query = pipeline_data["update"]
-                            res = self.mongo_db[coll_name].update_many(filter_query, update_query)
-                            results = [{"matched_count": res.matched_count, "modified_count": res.modified_count, "success": True}]
-                        
-                        # Handle Delete
-                        elif "delete" in pipeline_data:
-                            filter_query = pipeline_data.get("filter", {})
-                            res = self.mongo_db[coll_name].delete_many(filter_query)
-                            results = [{"deleted_count": res.deleted_count, "success": True}]
-                        
-                        else:
-                            return {
-                                "status": QueryStatus.ERROR,
-                                "error": "Unknown MongoDB operation. Supporting 'pipeline', 'insert', 'update', 'delete'.",
-                                "results": [],
-                                "execution_time_ms": 0
-                            }
-                    else:
-                        # Fallback: AI generated just the array, we need to find which collection.
-                        # As a temporary heuristic, we'll return an error asking for collection if not found.
-                        return {
-                            "status": QueryStatus.ERROR,
-                            "error": "MongoDB query format mismatch. Expected JSON with 'collection' and operation details.",
-                            "results": [],
-                            "execution_time_ms": 0
-                        }
-
-                    # Serialize ObjectIds for any remaining docs
-                    for doc in results:
-                        if isinstance(doc, dict) and "_id" in doc:
-                            doc["_id"] = str(doc["_id"])
-                    
-                    return {
-                        "status": QueryStatus.SUCCESS,
-                        "results": results,
-                        "execution_time_ms": int((time.time() - start_time) * 1000),
-                        "result_count": len(results)
-                    }
-                except Exception as mongo_err:
-                    return {
-                        "status": QueryStatus.ERROR,
-                        "error": f"MongoDB Error: {str(mongo_err)}",
-                        "results": [],
-                        "execution_time_ms": 0
-                    }
+                return await self._run_with_deadline(
+                    handle, self._execute_mongo_sync, sql_stripped, start_time, handle
+                )
 
             # Validate query
             if read_only and not self._is_safe_query(sql):
@@ -161,17 +227,39 @@ class QueryExecutor:
                     "execution_time_ms": 0
                 }
             
-            # Execute in thread pool to avoid blocking
             loop = asyncio.get_event_loop()
-            results = await loop.run_in_executor(
-                self.executor,
-                self._execute_sync,
-                sql,
-                max_rows
-            )
+            use_result_cache = use_result_cache and settings.RESULT_CACHE_ENABLED
+            analysis = analyze_sql(sql, self.engine.dialect.name)
+            # Results of NOW(), RANDOM()... differ on every run, so they aren't cached
+            cacheable = use_result_cache and analysis.is_read_only and analysis.is_deterministic
+            if cacheable:
+                results = await loop.run_in_executor(
+                    None, result_cache.get, self.connection_string, sql, params, max_rows
+                )
+                if results is not None:
+                    return {
+                        "status": QueryStatus.SUCCESS,
+                        "results": results,
+                        "execution_time_ms": int((time.time() - start_time) * 1000),
+                        "result_count": len(results),
+                        "cached": True
+                    }
+            
+            # Execute in thread pool to avoid blocking
+            results = await self._run_with_deadline(handle, self._execute_sync, sql, max_rows, handle, params)
             
             execution_time = int((time.time() - start_time) * 1000)
             
+            if cacheable:
+                await loop.run_in_executor(
+                    None, functools.partial(
+                        result_cache.set, self.connection_string, sql, results, analysis.tables,
+                        params=params, max_rows=max_rows
+                    )
+                )
+            elif use_result_cache and not analysis.is_read_only:
+                await loop.run_in_executor(None, self._invalidate_written_tables, sql)
+            
             return {
                 "status": QueryStatus.SUCCESS,
                 "results": results,
@@ -179,6 +267,14 @@ class QueryExecutor:
                 "result_count": len(results)
             }
             
+        except (QueryTimeoutError, QueryCancelledError) as e:
+            return {
+                "status": QueryStatus.TIMEOUT if isinstance(e, QueryTimeoutError) else QueryStatus.CANCELLED,
+                "error": str(e),
+                "results": [],
+                "execution_time_ms": int((time.time() - start_time) * 1000),
+                "result_count": 0
+            }
         except Exception as e:
             execution_time = int((time.time() - start_time) * 1000)
             return {
@@ -188,8 +284,127 @@ class QueryExecutor:
                 "execution_time_ms": execution_time,
                 "result_count": 0
             }
+        finally:
+            running_queries.unregister(handle)
+    
+    async def _run_with_deadline(self, handle: "StatementHandle", func, *args):
+        """Run a blocking call in the executor and cancel its statement if we stop waiting
+        
+        The server-side timeout normally fires first; the client-side deadline
+        (plus a grace period) covers drivers that have none.
+        """
+        loop = asyncio.get_event_loop()
+        future = loop.run_in_executor(self.executor, func, *args)
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(future),
+                timeout=handle.remaining() + CLIENT_DEADLINE_GRACE_SECONDS
+            )
+        except asyncio.TimeoutError:
+            future.add_done_callback(_discard_result)
+            await loop.run_in_executor(None, handle.cancel)
+            raise QueryTimeoutError(handle.timeout_message())
+        except asyncio.CancelledError:
+            future.add_done_callback(_discard_result)
+            await asyncio.shield(loop.run_in_executor(None, handle.cancel))
+            raise
+    
+    def _execute_mongo_sync(self, sql_stripped: str, start_time: float, handle: "StatementHandle") -> Dict[str, Any]:
+        """Run a MongoDB operation; aggregations get maxTimeMS and are tagged for killOp"""
+        try:
+            # Try to parse as JSON pipeline
+            pipeline_data = json.loads(sql_stripped)
+            
+            # Handle different MongoDB operation types if they are wrapped
+            if isinstance(pipeline_data, dict) and "collection" in pipeline_data:
+                coll_name = pipeline_data["collection"]
+                collection = self.mongo_db[coll_name]
+                handle.set_canceller(lambda: self._kill_mongo_operation(handle.query_id))
+                
+                # Handle Aggregation
+                if "pipeline" in pipeline_data:
+                    actual_pipeline = pipeline_data["pipeline"]
+                    results = list(collection.aggregate(
+                        actual_pipeline,
+                        maxTimeMS=max(int(handle.remaining() * 1000), 1),
+                        comment=handle.query_id
+                    ))
+                
+                # Handle Insert
+                elif "insert" in pipeline_data:
+                    doc = pipeline_data["insert"]
+                    res = collection.insert_one(doc, comment=handle.query_id)
+                    results = [{"inserted_id": str(res.inserted_id), "success": True}]
+                
+                # Handle Update
+                elif "update" in pipeline_data:
+                    filter_query = pipeline_data.get("filter", {})
+                    update_query = pipeline_data["update"]
+                    res = collection.update_many(filter_query, update_query, comment=handle.query_id)
+                    results = [{"matched_count": res.matched_count, "modified_count": res.modified_count, "success": True}]
+                
+                # Handle Delete
+                elif "delete" in pipeline_data:
+                    filter_query = pipeline_data.get("filter", {})
+                    res = collection.delete_many(filter_query, comment=handle.query_id)
+                    results = [{"deleted_count": res.deleted_count, "success": True}]
+                
+                else:
+                    return {
+                        "status": QueryStatus.ERROR,
+                        "error": "Unknown MongoDB operation. Supporting 'pipeline', 'insert', 'update', 'delete'.",
+                        "results": [],
+                        "execution_time_ms": 0
+                    }
+            else:
+                # Fallback: AI generated just the array, we need to find which collection.
+                # As a temporary heuristic, we'll return an error asking for collection if not found.
+                return {
+                    "status": QueryStatus.ERROR,
+                    "error": "MongoDB query format mismatch. Expected JSON with 'collection' and operation details.",
+                    "results": [],
+                    "execution_time_ms": 0
+                }
+
+            # Serialize ObjectIds for any remaining docs
+            for doc in results:
+                if isinstance(doc, dict) and "_id" in doc:
+                    doc["_id"] = str(doc["_id"])
+            
+            return {
+                "status": QueryStatus.SUCCESS,
+                "results": results,
+                "execution_time_ms": int((time.time() - start_time) * 1000),
+                "result_count": len(results)
+            }
+        except Exception as mongo_err:
+            from pymongo.errors import ExecutionTimeout
+            if handle.cancelled:
+                raise QueryCancelledError(f"Query {handle.query_id} was cancelled") from mongo_err
+            if isinstance(mongo_err, ExecutionTimeout):
+                raise QueryTimeoutError(handle.timeout_message()) from mongo_err
+            return {
+                "status": QueryStatus.ERROR,
+                "error": f"MongoDB Error: {str(mongo_err)}",
+                "results": [],
+                "execution_time_ms": 0
+            }
+        finally:
+            handle.set_canceller(None)
+    
+    def _kill_mongo_operation(self, query_id: str):
+        """killOp every server operation tagged with this query's comment"""
+        admin = self.mongo_client.admin
+        for op in admin.aggregate([{"$currentOp": {}}, {"$match": {"command.comment": query_id}}]):
+            admin.command("killOp", op=op["opid"])
     
-    def _execute_sync(self, sql: str, max_rows: int) -> List[Dict[str, Any]]:
+    def _execute_sync(
+        self,
+        sql: str,
+        max_rows: int,
+        handle: "StatementHandle" = None,
+        params: Optional[Dict[str, Any]] = None
+    ) -> ColumnarResult:
         """Synchronous query execution"""
         if self.is_mongodb:
             return [] # Should be handled in execute_query
@@ -198,47 +413,284 @@ class QueryExecutor:
             # Transaction for non-SELECT queries
             trans = conn.begin()
             try:
-                result = conn.execute(text(sql))
+                if handle:
+                    self._arm_statement_deadline(conn, handle)
+                result = conn.execute(text(sql), params or {})
                 
-                # Fetch results if it returns rows
-                rows = []
+                # Fetch results if it returns rows, stored column-wise
                 if result.returns_rows:
-                    for i, row in enumerate(result):
-                        if i >= max_rows:
-                            break
-                        rows.append(dict(row._mapping))
+                    rows = ColumnarResult.from_rows(result.keys(), result.fetchmany(max_rows))
                 else:
                     # For DML, return affected row count
-                    rows = [{"rowcount": result.rowcount, "success": True}]
+                    rows = ColumnarResult.from_rows(["rowcount", "success"], [(result.rowcount, True)])
                 
                 trans.commit()
                 return rows
             except Exception as e:
                 trans.rollback()
+                if handle and handle.cancelled:
+                    raise QueryCancelledError(f"Query {handle.query_id} was cancelled") from e
+                if handle and handle.expired():
+                    raise QueryTimeoutError(handle.timeout_message()) from e
                 raise e
+            finally:
+                if handle:
+                    self._disarm_statement_deadline(conn, handle)
+    
+    def _arm_statement_deadline(self, conn, handle: "StatementHandle"):
+        """Enforce the handle's deadline on the server and make the statement cancellable
+        
+        PostgreSQL: SET LOCAL statement_timeout, cancelled through the driver's
+        cancel request. SQLite: a progress handler that aborts the statement
+        once the deadline passes or the handle is cancelled.
+        """
+        dialect = self.engine.dialect.name
+        dbapi_conn = conn.connection.dbapi_connection
+        
+        if dialect == "postgresql":
+            timeout_ms = max(int(handle.remaining() * 1000), 1)
+            conn.execute(text(f"SET LOCAL statement_timeout = {timeout_ms}"))
+            if hasattr(dbapi_conn, "cancel"):
+                handle.set_canceller(dbapi_conn.cancel)
+        elif dialect == "sqlite":
+            dbapi_conn.set_progress_handler(
+                lambda: 1 if handle.cancelled or handle.expired() else 0,
+                SQLITE_PROGRESS_INTERVAL
+            )
+    
+    def _disarm_statement_deadline(self, conn, handle: "StatementHandle"):
+        handle.set_canceller(None)
+        if self.engine.dialect.name == "sqlite":
+            # The connection goes back to the pool; don't leave the handler on it
+            conn.connection.dbapi_connection.set_progress_handler(None, 0)
+    
+    async def explain_plan(self, sql: str) -> Dict[str, Any]:
+        """Estimate the work a query would do without running it
+        
+        Returns {"engine", "estimated_rows", "estimated_cost", "full_scans"}.
+        estimated_rows is the largest row count the plan reads or produces;
+        estimated_cost is only reported by PostgreSQL. Values a database
+        can't estimate are None.
+        """
+        loop = asyncio.get_event_loop()
+        if self.is_mongodb:
+            return await loop.run_in_executor(self.executor, self._explain_mongo_sync, sql)
+        return await loop.run_in_executor(self.executor, self._explain_sql_sync, sql)
+    
+    def _explain_sql_sync(self, sql: str) -> Dict[str, Any]:
+        dialect = self.engine.dialect.name
+        plan = {"engine": dialect, "estimated_rows": None, "estimated_cost": None, "full_scans": []}
+        
+        with self.engine.connect() as conn:
+            if dialect == "postgresql":
+                # Plain EXPLAIN only plans the statement; nothing is executed
+                root = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()[0]["Plan"]
+                plan["estimated_cost"] = float(root.get("Total Cost", 0))
+                # Nodes under a Limit stop once it is satisfied, so their estimates
+                # (e.g. a whole-table Seq Scan) don't count; a Sort or aggregate
+                # that has to read everything first still shows in the cost
+                rows = 0
+                nodes = [(root, False)]
+                while nodes:
+                    node, limited = nodes.pop()
+                    if not limited:
+                        rows = max(rows, int(node.get("Plan Rows", 0)))
+                    if node.get("Node Type") == "Seq Scan" and node.get("Relation Name"):
+                        plan["full_scans"].append(node["Relation Name"])
+                    limited = limited or node.get("Node Type") == "Limit"
+                    nodes.extend((child, limited) for child in node.get("Plans", []))
+                plan["estimated_rows"] = rows
+            
+            elif dialect == "sqlite":
+                # EXPLAIN QUERY PLAN has no row estimates: size the tables it scans
+                analysis = analyze_sql(sql, dialect)
+                details = [row[3] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+                for detail in details:
+                    match = re.match(r"SCAN (\S+)", detail)
+                    if match and match.group(1) in analysis.table_aliases:
+                        plan["full_scans"].append(analysis.table_aliases[match.group(1)])
+                
+                if plan["full_scans"]:
+                    rows = max(self._sqlite_row_estimate(conn, table) for table in plan["full_scans"])
+                    # Without sorting, grouping or filtering the scan stops at the LIMIT
+                    streams_to_limit = (
+                        analysis.outer_limit is not None
+                        and not analysis.has_aggregate
+                        and not analysis.has_group_by
+                        and not analysis.has_distinct
+                        and not analysis.has_where
+                        and not any("TEMP B-TREE" in detail for detail in details)
+                    )
+                    plan["estimated_rows"] = min(rows, analysis.outer_limit) if streams_to_limit else rows
+        
+        return plan
+    
+    @staticmethod
+    def _sqlite_row_estimate(conn, table: str) -> int:
+        """Row count from sqlite_stat1 if ANALYZE has run, else MAX(rowid) (an index lookup)"""
+        try:
+            stat = conn.execute(
+                text("SELECT stat FROM sqlite_stat1 WHERE tbl = :table LIMIT 1"),
+                {"table": table}
+            ).scalar()
+            if stat:
+                return int(stat.split()[0])
+        except Exception:
+            pass  # sqlite_stat1 only exists after ANALYZE
+        try:
+            quoted = table.replace('"', '""')
+            return int(conn.execute(text(f'SELECT MAX(rowid) FROM "{quoted}"')).scalar() or 0)
+        except Exception:
+            return 0  # WITHOUT ROWID table
+    
+    def _explain_mongo_sync(self, sql: str) -> Dict[str, Any]:
+        plan = {"engine": "mongodb", "estimated_rows": None, "estimated_cost": None, "full_scans": []}
+        pipeline_data = json.loads(sql.strip())
+        if not isinstance(pipeline_data, dict) or "pipeline" not in pipeline_data:
+            return plan
+        
+        coll_name = pipeline_data["collection"]
+        explained = self.mongo_db.command(
+            "explain",
+            {"aggregate": coll_name, "pipeline": pipeline_data["pipeline"], "cursor": {}},
+            verbosity="queryPlanner"
+        )
+        if '"COLLSCAN"' in json.dumps(explained, default=str):
+            plan["full_scans"].append(coll_name)
+            plan["estimated_rows"] = self.mongo_db[coll_name].estimated_document_count()
+        return plan
+    
+    def stream_rows(
+        self,
+        sql: str,
+        batch_size: int = None,
+        query_id: Optional[str] = None,
+        timeout_seconds: Optional[float] = None
+    ) -> Iterator[Tuple[List[str], List[Any]]]:
+        """Yield (columns, rows) batches from a server-side cursor
+        
+        Only read-only statements are accepted. SQL rows are tuples in column
+        order; MongoDB aggregation batches are documents and columns is None.
+        Only one batch is held in memory at a time, so memory stays flat
+        regardless of the result size.
+        
+        Like execute_query, the statement runs under a server-side deadline of
+        timeout_seconds and is registered under query_id, so it can be
+        cancelled with running_queries.cancel() while it streams.
+        """
+        batch_size = batch_size or settings.STREAM_BATCH_SIZE
+        handle = running_queries.register(
+            query_id or uuid.uuid4().hex,
+            timeout_seconds or settings.QUERY_TIMEOUT_SECONDS
+        )
+        try:
+            yield from self._stream_rows(sql, batch_size, handle)
+        except Exception as e:
+            if handle.cancelled:
+                raise QueryCancelledError(f"Query {handle.query_id} was cancelled") from e
+            if handle.expired():
+                raise QueryTimeoutError(handle.timeout_message()) from e
+            raise
+        finally:
+            running_queries.unregister(handle)
+    
+    def _stream_rows(self, sql: str, batch_size: int, handle: "StatementHandle") -> Iterator[Tuple[List[str], List[Any]]]:
+        if self.is_mongodb:
+            if not self._is_safe_pipeline(sql):
+                raise ValueError("Only read-only aggregation pipelines can be streamed from MongoDB.")
+            pipeline_data = json.loads(sql.strip())
+            
+            handle.set_canceller(lambda: self._kill_mongo_operation(handle.query_id))
+            cursor = self.mongo_db[pipeline_data["collection"]].aggregate(
+                pipeline_data["pipeline"],
+                batchSize=batch_size,
+                maxTimeMS=max(int(handle.remaining() * 1000), 1),
+                comment=handle.query_id
+            )
+            try:
+                batch = []
+                for doc in cursor:
+                    if "_id" in doc:
+                        doc["_id"] = str(doc["_id"])
+                    batch.append(doc)
+                    if len(batch) >= batch_size:
+                        yield None, batch
+                        batch = []
+                if batch:
+                    yield None, batch
+            finally:
+                cursor.close()
+                handle.set_canceller(None)
+            return
+        
+        if not self._is_safe_query(sql):
+            raise ValueError("Only SELECT statements can be streamed.")
+        
+        with self.engine.connect() as conn, conn.begin():
+            self._arm_statement_deadline(conn, handle)
+            try:
+                result = conn.execution_options(
+                    stream_results=True,
+                    yield_per=batch_size
+                ).execute(text(sql))
+                columns = list(result.keys())
+                empty = True
+                for partition in result.partitions(batch_size):
+                    empty = False
+                    yield columns, [tuple(row) for row in partition]
+                if empty:
+                    # Still report the columns, so encoders can describe an empty result
+                    yield columns, []
+            finally:
+                self._disarm_statement_deadline(conn, handle)
+    
+    def _invalidate_written_tables(self, sql: str):
+        """Drop cached results a successful write may have changed"""
+        analysis = analyze_sql(sql, self.engine.dialect.name)
+        if analysis.parse_error is None:
+            if analysis.tables:
+                result_cache.invalidate_tables(self.connection_string, analysis.tables)
+            return
+        # Unparseable, e.g. a template's "LIMIT :n": reads are left alone, anything
+        # else may have written to any table
+        leading_keyword = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+        if leading_keyword not in ("SELECT", "WITH"):
+            result_cache.invalidate(self.connection_string)
     
     def _is_safe_query(self, sql: str) -> bool:
-        """Validate that query is safe (read-only)"""
-        sql_upper = sql.upper().strip()
+        """Validate that query is safe (read-only)
         
-        # Forbidden keywords for read-only mode
-        forbidden = [
-            "INSERT", "UPDATE", "DELETE", "DROP", "CREATE",
-            "ALTER", "TRUNCATE", "GRANT", "REVOKE", "EXEC",
-            "REPLACE", "MERGE"
-        ]
+        A single SELECT/set operation with no writes, SELECT INTO or row
+        locks anywhere in it (including CTEs). Unparseable SQL is unsafe.
+        """
+        dialect = self.engine.dialect.name if self.engine is not None else None
+        return analyze_sql(sql, dialect).is_read_only
+    
+    @staticmethod
+    def _is_safe_pipeline(sql: str) -> bool:
+        """Validate that a MongoDB operation is a read-only aggregation
         
-        # Check if query starts with SELECT or WITH (for CTEs)
-        if not (sql_upper.startswith("SELECT") or sql_upper.startswith("WITH")):
+        A {"collection", "pipeline"} document whose stages don't write
+        ($out, $merge), including stages nested in $facet/$lookup/$unionWith.
+        """
+        try:
+            pipeline_data = json.loads(sql.strip())
+        except ValueError:
+            return False
+        if not isinstance(pipeline_data, dict) or not isinstance(pipeline_data.get("collection"), str):
+            return False
+        pipeline = pipeline_data.get("pipeline")
+        if not isinstance(pipeline, list):
             return False
         
-        # Check for forbidden keywords
-        for keyword in forbidden:
-            # Use regex for better matching if needed, but simple string check for now
-            if re.search(rf"\b{keyword}\b", sql_upper):
-                return False
+        def _writes(value: Any) -> bool:
+            if isinstance(value, dict):
+                return any(key in ("$out", "$merge") or _writes(item) for key, item in value.items())
+            if isinstance(value, list):
+                return any(_writes(item) for item in value)
+            return False
         
-        return True
+        return not _writes(pipeline)
 
     
     async def test_connection(self) -> bool:
@@ -256,86 +708,75 @@ class QueryExecutor:
         return True
     
     def close(self):
-        """Close database connection"""
+        """Release this executor
+
+        Pooled engines and clients are owned by the engine registry and stay open
+        for the next request; use engine_registry.dispose() to drop one explicitly.
+        The lease on a Mongo client also ends when the executor is garbage collected.
+        """
         if self.is_mongodb:
-            self.mongo_client.close()
-        elif self.engine:
-            self.engine.dispose()
+            engine_registry.release(self)
+        self.engine = None
+        self.mongo_client = None
 
 
 class QueryValidator:
-    """Validate and sanitize SQL queries"""
+    """Validate and sanitize SQL queries
+    
+    All checks read from a single memoized parse (see sql_analysis.analyze_sql).
+    Pass the target database type as dialect so dialect-specific syntax parses
+    and limits are rendered correctly (LIMIT, TOP, FETCH FIRST).
+    """
     
     @staticmethod
-    def validate_complexity(sql: str) -> Dict[str, Any]:
+    def validate_complexity(sql: str, dialect: Optional[str] = None) -> Dict[str, Any]:
         """Analyze query complexity"""
-        sql_upper = sql.upper()
-        
-        complexity_score = 0
+        analysis = analyze_sql(sql, dialect)
+        complexity_score = analysis.complexity_score
         issues = []
         
-        # Count JOINs
-        join_count = sql_upper.count("JOIN")
-        complexity_score += join_count * 2
-        
-        # Count subqueries
-        subquery_count = sql_upper.count("SELECT") - 1
-        complexity_score += subquery_count * 3
-        
-        # Check for complex operations
-        if "GROUP BY" in sql_upper:
-            complexity_score += 1
-        if "HAVING" in sql_upper:
-            complexity_score += 1
-        if "UNION" in sql_upper:
-            complexity_score += 2
-        if "DISTINCT" in sql_upper:
-            complexity_score += 1
-        
         # Check complexity threshold
         if complexity_score > settings.MAX_QUERY_COMPLEXITY:
             issues.append(f"Query complexity ({complexity_score}) exceeds maximum ({settings.MAX_QUERY_COMPLEXITY})")
         
         # Check for missing LIMIT
-        if "LIMIT" not in sql_upper and "TOP" not in sql_upper:
+        if analysis.is_read_only and not analysis.has_limit:
             issues.append("Consider adding LIMIT clause to prevent large result sets")
         
         return {
             "complexity_score": complexity_score,
             "is_valid": len(issues) == 0 or complexity_score <= settings.MAX_QUERY_COMPLEXITY,
             "issues": issues,
-            "suggestions": QueryValidator._get_optimization_suggestions(sql)
+            "suggestions": QueryValidator._get_optimization_suggestions(sql, dialect),
+            "tables_used": analysis.tables,
+            "is_read_only": analysis.is_read_only
         }
     
     @staticmethod
-    def _get_optimization_suggestions(sql: str) -> List[str]:
+    def _get_optimization_suggestions(sql: str, dialect: Optional[str] = None) -> List[str]:
         """Get optimization suggestions for query"""
+        analysis = analyze_sql(sql, dialect)
         suggestions = []
-        sql_upper = sql.upper()
         
-        if "SELECT *" in sql_upper:
+        if analysis.selects_star:
             suggestions.append("Specify exact columns instead of SELECT * for better performance")
         
-        if sql_upper.count("JOIN") > 3:
+        if analysis.join_count > 3:
             suggestions.append("Multiple JOINs detected - ensure proper indexes exist")
         
-        if "OR" in sql_upper:
+        if analysis.has_or:
             suggestions.append("OR conditions may prevent index usage - consider using UNION instead")
         
-        if "LIKE '%'" in sql_upper:
+        if analysis.leading_wildcard_like:
             suggestions.append("Leading wildcards in LIKE prevent index usage")
         
         return suggestions
     
     @staticmethod
-    def add_safety_limits(sql: str, max_rows: int = 1000) -> str:
-        """Add safety limits to query"""
-        sql_upper = sql.upper().strip()
-        
-        # Only add LIMIT to SELECT queries that don't already have it
-        if (sql_upper.startswith("SELECT") or sql_upper.startswith("WITH")) and \
-           "LIMIT" not in sql_upper and "TOP" not in sql_upper:
-            sql = sql.rstrip(";")
-            sql += f" LIMIT {max_rows}"
-        
-        return sql
+    def add_safety_limits(sql: str, max_rows: int = 1000, dialect: Optional[str] = None) -> str:
+        """Add an outer row limit to read-only queries that don't have one"""
+        return analyze_sql(sql, dialect).with_limit(max_rows)
+
+
+# Singleton instance
+running_queries = RunningQueries()
@@ -0,0 +1,312 @@
+from collections import Counter
+from datetime import date, datetime, timedelta
+from sqlalchemy import bindparam, func, update
+from typing import Any, Dict, Optional, Tuple
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.models import QueryTemplate
+from app.services.query_service import QueryValidator
+from app.services.sql_analysis import analyze_sql
+import asyncio
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?.!;]+$")
+_DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%d %B %Y", "%B %d %Y", "%B %d, %Y")
+
+# Regex for each parameter type. An unquoted "string" is a single word (an entity
+# name); free text must be quoted, so trailing words can't be swallowed into a value
+_TYPE_PATTERNS = {
+    "integer": r"-?\d+",
+    "number": r"-?\d+(?:\.\d+)?",
+    "date": r"today|yesterday|\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{4}|\d{1,2} [a-z]+ \d{4}|[a-z]+ \d{1,2},? \d{4}",
+    "string": r""""[^"]+"|'[^']+'|[^\s"']+""",
+}
+
+
+class TemplateError(ValueError):
+    """A template that can't be compiled"""
+
+
+def _clean_question(question: str) -> str:
+    return _TRAILING_PUNCTUATION.sub("", _WHITESPACE.sub(" ", question.strip()))
+
+
+def _parse_date(value: str) -> date:
+    lowered = value.lower()
+    if lowered == "today":
+        return date.today()
+    if lowered == "yesterday":
+        return date.today() - timedelta(days=1)
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized date: {value}")
+
+
+def _literal(value: Any) -> str:
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+class _CompiledTemplate:
+    """One template's question pattern, parameter types and bound SQL"""
+
+    def __init__(self, template_id: int, name: str, question_template: str, sql_template: str,
+                 parameters: Optional[Dict[str, Any]]):
+        self.id = template_id
+        self.name = name
+
+        specs = {}
+        for param, spec in (parameters or {}).items():
+            spec = {"type": spec} if isinstance(spec, str) else dict(spec or {})
+            spec.setdefault("type", "string")
+            if spec["type"] not in _TYPE_PATTERNS:
+                raise TemplateError(f"Parameter '{param}' has unknown type '{spec['type']}'")
+            specs[param] = spec
+
+        question_params = _PLACEHOLDER.findall(question_template)
+        if len(set(question_params)) != len(question_params):
+            raise TemplateError("Each parameter can appear only once in the question template")
+        missing = set(_PLACEHOLDER.findall(sql_template)) - set(question_params)
+        if missing:
+            raise TemplateError(f"SQL parameters not in the question template: {', '.join(sorted(missing))}")
+        self.parameters = {param: specs.get(param, {"type": "string"}) for param in question_params}
+
+        # The question pattern; literal text is matched case- and whitespace-insensitively
+        parts = []
+        literal_length = 0
+        for i, piece in enumerate(_PLACEHOLDER.split(_clean_question(question_template))):
+            if i % 2:
+                parts.append(f"(?P<{self.group(piece)}>{self._value_pattern(piece)})")
+            else:
+                literal_length += len(piece.strip())
+                parts.append(r"\s+".join(re.escape(word) for word in piece.split(" ")))
+        self.pattern = "".join(parts)
+        self.literal_length = literal_length
+
+        # Placeholders become bind parameters, so values never reach the SQL text
+        sql_template = sql_template.strip().rstrip(";")
+        self.sql = _PLACEHOLDER.sub(lambda m: f":{m.group(1)}", sql_template)
+        # sqlglot can't parse every bind position (e.g. LIMIT :n); check a copy with sample values
+        probe = _PLACEHOLDER.sub(
+            lambda m: "1" if self.parameters[m.group(1)]["type"] in ("integer", "number") else "''",
+            sql_template
+        )
+        analysis = analyze_sql(probe)
+        if not analysis.is_read_only:
+            raise TemplateError("Only read-only SQL can be used as a template")
+        self.tables = analysis.tables
+        self._limited: Dict[Optional[str], str] = {}
+
+    def group(self, param: str) -> str:
+        return f"t{self.id}__{param}"
+
+    def _value_pattern(self, param: str) -> str:
+        choices = self.parameters[param].get("choices")
+        if choices:
+            return "|".join(re.escape(str(choice)) for choice in sorted(choices, key=len, reverse=True))
+        return _TYPE_PATTERNS[self.parameters[param]["type"]]
+
+    def bound_sql(self, dialect: Optional[str]) -> str:
+        """The SQL with the safety row limit for a dialect, computed once"""
+        if dialect not in self._limited:
+            self._limited[dialect] = QueryValidator.add_safety_limits(self.sql, dialect=dialect)
+        return self._limited[dialect]
+
+    def convert(self, param: str, raw: str) -> Any:
+        spec = self.parameters[param]
+        kind = spec["type"]
+        if kind == "integer":
+            return int(raw)
+        if kind == "number":
+            return float(raw)
+        if kind == "date":
+            return _parse_date(raw)
+        value = raw[1:-1] if raw[0] in "\"'" else raw
+        for choice in spec.get("choices") or []:
+            if str(choice).lower() == value.lower():
+                return choice
+        return value
+
+
+class TemplateMatch:
+    """A question answered by a template: bound SQL and converted parameter values"""
+
+    def __init__(self, template_id: int, name: str, sql: str, params: Dict[str, Any]):
+        self.template_id = template_id
+        self.name = name
+        self.sql = sql
+        self.params = params
+
+    @property
+    def display_sql(self) -> str:
+        """The SQL with its values inlined, for the response and history only"""
+        return re.sub(
+            r"(?<!:):(\w+)\b",
+            lambda m: _literal(self.params[m.group(1)]) if m.group(1) in self.params else m.group(0),
+            self.sql
+        )
+
+
+class TemplateEngine:
+    """Answer recurring questions from saved query templates without the LLM
+
+    A template pairs a question with {placeholders}, e.g. "top {limit} customers
+    in {country}", with SQL using the same placeholders. All templates are
+    compiled into one regular expression, so matching a question costs a
+    single regex match however many templates exist; more specific templates
+    (more literal text) are tried first. Parameter values are typed (integer,
+    number, date, string, optionally restricted to "choices") and executed as
+    bind parameters. An unquoted string value is one word; longer values must
+    be quoted or listed in "choices". A question with words left over after
+    the template's text doesn't match and goes to SQL generation. Usage counts are accumulated in memory and written in one
+    batch every TEMPLATE_USAGE_FLUSH_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, ttl_seconds: int = None, flush_interval_seconds: float = None):
+        self.ttl_seconds = ttl_seconds or settings.TEMPLATE_CACHE_TTL_SECONDS
+        self.flush_interval_seconds = flush_interval_seconds or settings.TEMPLATE_USAGE_FLUSH_INTERVAL_SECONDS
+        self._matcher: Optional[Tuple[float, Optional[re.Pattern], Dict[int, _CompiledTemplate]]] = None
+        self._usage: Counter = Counter()
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def compile(template: QueryTemplate) -> _CompiledTemplate:
+        """Compile one template; raises TemplateError if it is unusable"""
+        return _CompiledTemplate(
+            template.id or 0,
+            template.name,
+            template.natural_language_template,
+            template.sql_template,
+            template.parameters
+        )
+
+    async def match(self, question: str, schema_info: Dict[str, Any]) -> Optional[TemplateMatch]:
+        """The template answering a question, if one matches and its tables exist"""
+        try:
+            pattern, templates = await self._compiled()
+        except Exception as e:
+            logger.warning(f"Could not load query templates: {e}")
+            return None
+        if pattern is None:
+            return None
+
+        found = pattern.fullmatch(_clean_question(question))
+        if not found:
+            return None
+        template = templates[int(found.lastgroup[1:])]
+
+        known_tables = {name.lower().split(".")[-1] for name in schema_info.get("tables", {})}
+        if not all(table.lower() in known_tables for table in template.tables):
+            return None
+        try:
+            params = {
+                param: template.convert(param, found.group(template.group(param)))
+                for param in template.parameters
+            }
+        except ValueError as e:
+            logger.info(f"Template '{template.name}' matched but a value did not convert: {e}")
+            return None
+        return TemplateMatch(template.id, template.name, template.bound_sql(schema_info.get("database_type")), params)
+
+    def record_use(self, template_id: int):
+        with self._lock:
+            self._usage[template_id] += 1
+
+    def invalidate(self):
+        """Recompile on the next match (after templates are created or deleted)"""
+        self._matcher = None
+
+    async def _compiled(self) -> Tuple[Optional[re.Pattern], Dict[int, _CompiledTemplate]]:
+        cached = self._matcher
+        if cached and time.monotonic() - cached[0] <= self.ttl_seconds:
+            return cached[1], cached[2]
+
+        loop = asyncio.get_running_loop()
+        pattern, templates = await loop.run_in_executor(None, self._load)
+        self._matcher = (time.monotonic(), pattern, templates)
+        return pattern, templates
+
+    def _load(self) -> Tuple[Optional[re.Pattern], Dict[int, _CompiledTemplate]]:
+        db = SessionLocal()
+        try:
+            rows = db.query(QueryTemplate).all()
+        finally:
+            db.close()
+
+        templates = {}
+        for row in rows:
+            try:
+                templates[row.id] = self.compile(row)
+            except TemplateError as e:
+                logger.warning(f"Skipping query template {row.id} ('{row.name}'): {e}")
+        if not templates:
+            return None, templates
+
+        ordered = sorted(templates.values(), key=lambda t: t.literal_length, reverse=True)
+        pattern = re.compile(
+            "|".join(f"(?P<t{t.id}>{t.pattern})" for t in ordered),
+            re.IGNORECASE
+        )
+        return pattern, templates
+
+    async def start(self):
+        """Start the periodic usage-count flush"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write the remaining counts"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await asyncio.get_running_loop().run_in_executor(None, self.flush_usage)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            await loop.run_in_executor(None, self.flush_usage)
+
+    def flush_usage(self) -> int:
+        """Add the accumulated usage counts to query_templates in one batch"""
+        with self._lock:
+            usage, self._usage = self._usage, Counter()
+        if not usage:
+            return 0
+
+        db = SessionLocal()
+        try:
+            # One executemany UPDATE for every template used since the last flush
+            table = QueryTemplate.__table__
+            db.execute(
+                update(table)
+                .where(table.c.id == bindparam("template_id"))
+                .values(usage_count=func.coalesce(table.c.usage_count, 0) + bindparam("uses")),
+                [{"template_id": template_id, "uses": uses} for template_id, uses in usage.items()]
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to write template usage counts: {e}")
+            with self._lock:
+                self._usage.update(usage)
+            return 0
+        finally:
+            db.close()
+        return len(usage)
+
+
+# Singleton instance
+template_engine = TemplateEngine()
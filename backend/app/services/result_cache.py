@@ -0,0 +1,375 @@
+from collections import OrderedDict
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+from app.core.config import settings
+from app.db.database import get_redis
+from app.services.columnar import ColumnarResult
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Values JSON can't carry are tagged so they come back as the same types
+_DECODERS = {
+    "__decimal__": Decimal,
+    "__datetime__": datetime.fromisoformat,
+    "__date__": date.fromisoformat,
+    "__time__": dt_time.fromisoformat,
+    "__uuid__": uuid.UUID,
+    "__bytes__": base64.b64decode,
+}
+
+
+class _Uncacheable(TypeError):
+    pass
+
+
+def _encode_value(value: Any) -> Dict[str, str]:
+    if isinstance(value, Decimal):
+        return {"__decimal__": str(value)}
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, dt_time):
+        return {"__time__": value.isoformat()}
+    if isinstance(value, uuid.UUID):
+        return {"__uuid__": str(value)}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"__bytes__": base64.b64encode(bytes(value)).decode("ascii")}
+    raise _Uncacheable(f"Can't cache values of type {type(value).__name__}")
+
+
+def _decode_value(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        tag, value = next(iter(obj.items()))
+        if tag in _DECODERS:
+            return _DECODERS[tag](value)
+    return obj
+
+
+def normalize_sql(sql: str) -> str:
+    """Canonical form of a statement used in cache keys (string literals are kept as-is)"""
+    return _WHITESPACE.sub(" ", sql.strip()).rstrip("; ")
+
+
+def encode_result(result: ColumnarResult) -> bytes:
+    """zlib-compressed columnar JSON: the column names once, then one value list per column"""
+    payload = json.dumps(
+        {"columns": result.columns, "data": [column.tolist() for column in result.data]},
+        default=_encode_value,
+        separators=(",", ":")
+    )
+    return zlib.compress(payload.encode("utf-8"))
+
+
+def decode_result(blob: bytes) -> ColumnarResult:
+    payload = json.loads(zlib.decompress(blob), object_hook=_decode_value)
+    return ColumnarResult.from_columns(payload["columns"], payload["data"])
+
+
+class ResultCache:
+    """Cache read-only query results keyed by connection fingerprint and normalized SQL
+
+    Results are stored as compressed columnar JSON for RESULT_CACHE_TTL_SECONDS
+    in Redis (bounded by Redis' own eviction policy). Without Redis nothing is
+    cached, since an invalidation in one worker couldn't reach the others,
+    unless RESULT_CACHE_LOCAL_FALLBACK is set for a single-process deployment:
+    results then go to files under RESULT_CACHE_DIR, evicted least recently
+    used once RESULT_CACHE_MAX_DISK_BYTES is exceeded. Results larger than
+    RESULT_CACHE_MAX_ENTRY_BYTES compressed are not cached. Every entry is
+    tagged with the tables it reads, so a write to a table or a change to its
+    definition drops exactly the results that depend on it; each connection
+    also keeps a set of its keys, so dropping all of them needs no SCAN.
+    """
+
+    KEY_PREFIX = "qres"
+
+    def __init__(
+        self,
+        ttl_seconds: int = None,
+        max_entry_bytes: int = None,
+        max_disk_bytes: int = None,
+        directory: str = None,
+        local_fallback: bool = None
+    ):
+        self.ttl_seconds = ttl_seconds or settings.RESULT_CACHE_TTL_SECONDS
+        self.max_entry_bytes = max_entry_bytes or settings.RESULT_CACHE_MAX_ENTRY_BYTES
+        self.max_disk_bytes = max_disk_bytes or settings.RESULT_CACHE_MAX_DISK_BYTES
+        self.local_fallback = settings.RESULT_CACHE_LOCAL_FALLBACK if local_fallback is None else local_fallback
+        base = directory or settings.RESULT_CACHE_DIR or os.path.join(tempfile.gettempdir(), "schemamind-results")
+        # One directory per process; the in-memory index only knows its own files
+        self.directory = os.path.join(base, str(os.getpid()))
+        self._entries: "OrderedDict[str, Tuple[float, int, Tuple[str, ...]]]" = OrderedDict()
+        self._tables: Dict[str, Set[str]] = {}
+        self._disk_bytes = 0
+        self._directory_ready = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @staticmethod
+    def fingerprint(connection_string: str) -> str:
+        return hashlib.sha256(connection_string.encode("utf-8")).hexdigest()[:16]
+
+    def _key(self, connection_string: str, sql: str, params: Optional[Dict[str, Any]], max_rows: int) -> str:
+        statement = json.dumps(
+            [normalize_sql(sql), params or {}, max_rows],
+            sort_keys=True,
+            default=str
+        )
+        digest = hashlib.sha256(statement.encode("utf-8")).hexdigest()
+        return f"{self.KEY_PREFIX}:{self.fingerprint(connection_string)}:{digest}"
+
+    def _table_key(self, connection_string: str, table: str) -> str:
+        return f"{self.KEY_PREFIX}:tables:{self.fingerprint(connection_string)}:{table.lower()}"
+
+    def _connection_key(self, connection_string: str) -> str:
+        """Redis set of every result and table key of a connection"""
+        return f"{self.KEY_PREFIX}:keys:{self.fingerprint(connection_string)}"
+
+    @staticmethod
+    def _redis():
+        return get_redis()
+
+    def get(
+        self,
+        connection_string: str,
+        sql: str,
+        params: Optional[Dict[str, Any]] = None,
+        max_rows: int = 1000
+    ) -> Optional[ColumnarResult]:
+        """The cached result of a statement, or None"""
+        key = self._key(connection_string, sql, params, max_rows)
+        blob = self._redis_get(key)
+        if blob is None and self.local_fallback:
+            blob = self._local_get(key)
+
+        if blob is None:
+            self.misses += 1
+            return None
+        try:
+            result = decode_result(blob)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Discarding unreadable cached result: {e}")
+            return None
+        self.hits += 1
+        return result
+
+    def set(
+        self,
+        connection_string: str,
+        sql: str,
+        result: ColumnarResult,
+        tables: Iterable[str],
+        params: Optional[Dict[str, Any]] = None,
+        max_rows: int = 1000
+    ) -> bool:
+        """Store the result of a read-only statement that reads the given tables"""
+        try:
+            blob = encode_result(result)
+        except _Uncacheable as e:
+            logger.debug(f"Result not cached: {e}")
+            return False
+        if len(blob) > self.max_entry_bytes:
+            return False
+
+        key = self._key(connection_string, sql, params, max_rows)
+        table_keys = tuple(self._table_key(connection_string, table) for table in tables)
+        if self._redis_set(key, blob, table_keys, self._connection_key(connection_string)):
+            return True
+        if self.local_fallback:
+            self._local_set(key, blob, table_keys)
+            return True
+        return False
+
+    def invalidate_tables(self, connection_string: str, tables: Iterable[str]) -> int:
+        """Drop every cached result that reads any of the tables"""
+        table_keys = [self._table_key(connection_string, table) for table in tables]
+        if not table_keys:
+            return 0
+        removed = 0
+
+        redis_client = self._redis()
+        if redis_client is not None:
+            try:
+                keys = set().union(*(redis_client.smembers(table_key) for table_key in table_keys))
+                if keys:
+                    removed += redis_client.delete(*keys)
+                redis_client.delete(*table_keys)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Failed to invalidate cached results in Redis: {e}")
+
+        with self._lock:
+            keys = set().union(*(self._tables.pop(table_key, set()) for table_key in table_keys))
+            for key in keys:
+                removed += self._local_delete(key)
+        return removed
+
+    def invalidate(self, connection_string: str) -> int:
+        """Drop every cached result for a connection"""
+        fingerprint = self.fingerprint(connection_string)
+        prefixes = (f"{self.KEY_PREFIX}:{fingerprint}:", f"{self.KEY_PREFIX}:tables:{fingerprint}:")
+        removed = 0
+
+        redis_client = self._redis()
+        if redis_client is not None:
+            try:
+                connection_key = self._connection_key(connection_string)
+                keys = redis_client.smembers(connection_key)
+                result_keys = [key for key in keys if key.startswith(prefixes[0])]
+                if result_keys:
+                    removed += redis_client.delete(*result_keys)
+                redis_client.delete(connection_key, *(keys - set(result_keys)))
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Failed to invalidate cached results in Redis: {e}")
+
+        with self._lock:
+            for table_key in [k for k in self._tables if k.startswith(prefixes[1])]:
+                del self._tables[table_key]
+            for key in [k for k in self._entries if k.startswith(prefixes[0])]:
+                removed += self._local_delete(key)
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and local disk usage for monitoring"""
+        lookups = self.hits + self.misses
+        if self._redis() is not None:
+            backend = "redis"
+        else:
+            backend = "disk" if self.local_fallback else "disabled"
+        return {
+            "backend": backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "local_entries": len(self._entries),
+            "local_bytes": self._disk_bytes
+        }
+
+    def _redis_get(self, key: str) -> Optional[bytes]:
+        redis_client = self._redis()
+        if redis_client is None:
+            return None
+        try:
+            payload = redis_client.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Result cache read from Redis failed: {e}")
+            return None
+        # The shared client decodes responses, so blobs are stored base64-encoded
+        return base64.b64decode(payload) if payload is not None else None
+
+    def _redis_set(self, key: str, blob: bytes, table_keys: Tuple[str, ...], connection_key: str) -> bool:
+        redis_client = self._redis()
+        if redis_client is None:
+            return False
+        try:
+            pipe = redis_client.pipeline()
+            pipe.setex(key, self.ttl_seconds, base64.b64encode(blob).decode("ascii"))
+            for table_key in table_keys:
+                pipe.sadd(table_key, key)
+                pipe.expire(table_key, self.ttl_seconds)
+            pipe.sadd(connection_key, key, *table_keys)
+            pipe.expire(connection_key, self.ttl_seconds)
+            pipe.execute()
+            return True
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Result cache write to Redis failed: {e}")
+            return False
+
+    def _path(self, key: str) -> str:
+        # Connection fingerprint and statement digest: the same SQL on two databases is two files
+        _, fingerprint, digest = key.split(":")
+        return os.path.join(self.directory, f"{fingerprint}-{digest}")
+
+    def _local_get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._local_delete(key)
+                return None
+            self._entries.move_to_end(key)
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            with self._lock:
+                self._local_delete(key)
+            return None
+
+    def _local_set(self, key: str, blob: bytes, table_keys: Tuple[str, ...]):
+        path = self._path(key)
+        try:
+            self._ensure_directory()
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(blob)
+            os.replace(temp_path, path)
+        except OSError as e:
+            self.errors += 1
+            logger.warning(f"Result cache write to disk failed: {e}")
+            return
+
+        with self._lock:
+            self._local_delete(key, remove_file=False)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, len(blob), table_keys)
+            self._disk_bytes += len(blob)
+            for table_key in table_keys:
+                self._tables.setdefault(table_key, set()).add(key)
+            while self._disk_bytes > self.max_disk_bytes and self._entries:
+                self._local_delete(next(iter(self._entries)))
+
+    def _local_delete(self, key: str, remove_file: bool = True) -> int:
+        """Forget a local entry (caller holds the lock); returns 1 if it existed"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return 0
+        self._disk_bytes -= entry[1]
+        for table_key in entry[2]:
+            keys = self._tables.get(table_key)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tables[table_key]
+        if remove_file:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+        return 1
+
+    def _ensure_directory(self):
+        if self._directory_ready:
+            return
+        with self._lock:
+            if not self._directory_ready:
+                # Files left by an earlier process with the same pid aren't indexed
+                shutil.rmtree(self.directory, ignore_errors=True)
+                os.makedirs(self.directory, exist_ok=True)
+                self._directory_ready = True
+
+
+# Singleton instance
+result_cache = ResultCache()
@@ -0,0 +1,242 @@
+from numbers import Number
+from typing import Any, Dict, List, Optional, Sequence
+from app.core.config import settings
+from app.schemas.schemas import DataInsight
+from app.services.columnar import ColumnarResult
+import numpy as np
+import pandas as pd
+
+# Relative change across the time range below which a series counts as flat
+TREND_FLAT_THRESHOLD = 0.05
+# Linear fits explaining less of the variance than this are not reported as trends
+TREND_MIN_R_SQUARED = 0.5
+TREND_MIN_PERIODS = 3
+# Minimum number of values for outlier detection
+MIN_OUTLIER_POINTS = 8
+
+
+def _is_identifier(name: str) -> bool:
+    lowered = name.lower()
+    return lowered == "id" or lowered.endswith("_id")
+
+
+def _fmt(value: Any) -> str:
+    if isinstance(value, float):
+        if value.is_integer() and abs(value) < 1e15:
+            return f"{int(value):,}"
+        return f"{value:,.2f}"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return str(value)
+
+
+def _to_frame(results: Sequence[Dict[str, Any]]) -> pd.DataFrame:
+    if isinstance(results, ColumnarResult):
+        return results.to_dataframe()
+    return pd.DataFrame(list(results))
+
+
+def _coerce(series: pd.Series) -> pd.Series:
+    """Turn object columns of numbers (e.g. Decimal) or timestamps into typed series"""
+    if series.dtype != object:
+        return series
+    sample = series.dropna().head(50).tolist()
+    if not sample:
+        return series
+    if all(isinstance(v, Number) and not isinstance(v, bool) for v in sample):
+        return pd.to_numeric(series, errors="coerce")
+    if all(isinstance(v, str) for v in sample):
+        try:
+            parsed = pd.to_datetime(pd.Series(sample), errors="coerce", format="mixed")
+        except (ValueError, TypeError):
+            return series
+        if parsed.notna().all() and all(any(c in v for c in "-/:") for v in sample):
+            return pd.to_datetime(series, errors="coerce", format="mixed")
+    elif all(hasattr(v, "year") and hasattr(v, "month") for v in sample):
+        return pd.to_datetime(series, errors="coerce")
+    return series
+
+
+def _numeric_summary(series: pd.Series) -> Dict[str, Any]:
+    values = series.dropna().astype(float)
+    summary = {"kind": "numeric", "count": int(values.size)}
+    if values.empty:
+        return summary
+
+    q1, median, q3 = np.percentile(values.to_numpy(), [25, 50, 75])
+    summary.update({
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "mean": float(values.mean()),
+        "median": float(median),
+        "std": float(values.std(ddof=0)),
+        "sum": float(values.sum()),
+    })
+
+    if values.size >= MIN_OUTLIER_POINTS and q3 > q1:
+        low, high = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+        outliers = values[(values < low) | (values > high)]
+        if not outliers.empty:
+            extreme = outliers.reindex((outliers - median).abs().sort_values(ascending=False).index)
+            summary["outliers"] = {
+                "count": int(outliers.size),
+                "bounds": [float(low), float(high)],
+                "examples": [float(v) for v in extreme.head(3)],
+            }
+    return summary
+
+
+def _categorical_summary(series: pd.Series, top_k: int) -> Dict[str, Any]:
+    values = series.dropna()
+    try:
+        counts = values.value_counts()
+    except TypeError:
+        # Unhashable values such as nested MongoDB documents
+        counts = values.astype(str).value_counts()
+    total = int(values.size)
+    return {
+        "kind": "categorical",
+        "distinct": int(counts.size),
+        "top": [
+            {"value": value if isinstance(value, (str, bool, int, float)) else str(value),
+             "count": int(count),
+             "share": round(count / total, 4)}
+            for value, count in counts.head(top_k).items()
+        ],
+    }
+
+
+def _trend(time_values: pd.Series, values: pd.Series) -> Optional[Dict[str, Any]]:
+    frame = pd.DataFrame({"t": time_values, "y": pd.to_numeric(values, errors="coerce")}).dropna()
+    # One point per timestamp (rows of a grouped result often share one)
+    series = frame.groupby("t")["y"].mean()
+    if len(series) < TREND_MIN_PERIODS:
+        return None
+
+    seconds = (series.index - series.index[0]).total_seconds().to_numpy()
+    x = seconds / seconds[-1]
+    y = series.to_numpy(dtype=float)
+    slope, intercept = np.polyfit(x, y, 1)
+    fitted = slope * x + intercept
+    total = ((y - y.mean()) ** 2).sum()
+    r_squared = 1 - ((y - fitted) ** 2).sum() / total if total else 0.0
+
+    scale = abs(y.mean()) or 1.0
+    change = slope / scale  # fitted change over the whole range, relative to the mean
+    direction = "flat"
+    if r_squared >= TREND_MIN_R_SQUARED and change > TREND_FLAT_THRESHOLD:
+        direction = "increasing"
+    elif r_squared >= TREND_MIN_R_SQUARED and change < -TREND_FLAT_THRESHOLD:
+        direction = "decreasing"
+
+    return {
+        "direction": direction,
+        "relative_change": round(float(change), 4),
+        "r_squared": round(float(r_squared), 4),
+        "start": {"at": str(series.index[0]), "value": float(y[0])},
+        "end": {"at": str(series.index[-1]), "value": float(y[-1])},
+    }
+
+
+def profile_results(results: Sequence[Dict[str, Any]], top_k: int = None) -> Dict[str, Any]:
+    """Vectorized summary of a full result set
+
+    Numeric columns get min/max/mean/median/std/sum and IQR outlier flags,
+    other columns get their distinct count and top-k values, and numeric
+    columns are checked for a trend against the first date/time column.
+    """
+    top_k = top_k or settings.INSIGHTS_PROFILE_TOP_K
+    frame = _to_frame(results)
+    profile = {"row_count": int(len(frame)), "columns": {}, "time_column": None, "trends": {}}
+
+    columns = {}
+    for name in frame.columns:
+        series = _coerce(frame[name])
+        columns[name] = series
+        if profile["time_column"] is None and pd.api.types.is_datetime64_any_dtype(series):
+            profile["time_column"] = str(name)
+
+    for name, series in columns.items():
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = series.dropna()
+            summary = {"kind": "datetime", "min": str(values.min()) if not values.empty else None,
+                       "max": str(values.max()) if not values.empty else None}
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            summary = _numeric_summary(series)
+            if profile["time_column"] and not _is_identifier(str(name)):
+                trend = _trend(columns[profile["time_column"]], series)
+                if trend:
+                    profile["trends"][str(name)] = trend
+        else:
+            summary = _categorical_summary(series, top_k)
+        summary["nulls"] = int(series.isna().sum())
+        profile["columns"][str(name)] = summary
+
+    return profile
+
+
+def local_insights(profile: Dict[str, Any], max_columns: int = 3) -> List[DataInsight]:
+    """Insights that follow directly from the profile, without an LLM call"""
+    insights = []
+    row_count = profile["row_count"]
+    columns = profile["columns"]
+
+    insights.append(DataInsight(
+        type="summary",
+        title=f"{_fmt(row_count)} rows returned",
+        description=f"The result has {_fmt(row_count)} rows across {len(columns)} column{'s' if len(columns) != 1 else ''}.",
+        confidence=1.0
+    ))
+
+    measures = [
+        (name, summary) for name, summary in columns.items()
+        if summary["kind"] == "numeric" and summary.get("count") and not _is_identifier(name)
+    ][:max_columns]
+
+    for name, summary in measures:
+        insights.append(DataInsight(
+            type="pattern",
+            title=f"{name} ranges from {_fmt(summary['min'])} to {_fmt(summary['max'])}",
+            description=f"Average {_fmt(summary['mean'])}, median {_fmt(summary['median'])}, total {_fmt(summary['sum'])}.",
+            confidence=1.0,
+            data_points=[summary["min"], summary["max"]]
+        ))
+
+    for name, trend in profile["trends"].items():
+        if trend["direction"] == "flat":
+            continue
+        insights.append(DataInsight(
+            type="trend",
+            title=f"{name} is {trend['direction']} over time",
+            description=(
+                f"From {_fmt(trend['start']['value'])} ({trend['start']['at']}) to "
+                f"{_fmt(trend['end']['value'])} ({trend['end']['at']}), about "
+                f"{trend['relative_change']:+.0%} relative to the average over the period."
+            ),
+            confidence=round(max(min(trend["r_squared"], 1.0), 0.0), 2),
+            data_points=[trend["start"]["value"], trend["end"]["value"]]
+        ))
+
+    for name, summary in measures:
+        outliers = summary.get("outliers")
+        if outliers:
+            low, high = outliers["bounds"]
+            insights.append(DataInsight(
+                type="anomaly",
+                title=f"{outliers['count']} unusual value{'s' if outliers['count'] != 1 else ''} in {name}",
+                description=f"Values outside the typical range of {_fmt(low)} to {_fmt(high)}, e.g. {', '.join(_fmt(v) for v in outliers['examples'])}.",
+                confidence=0.8,
+                data_points=outliers["examples"]
+            ))
+
+    for name, summary in columns.items():
+        top = summary.get("top")
+        if summary["kind"] == "categorical" and top and summary["distinct"] > 1 and top[0]["share"] > 0.5:
+            insights.append(DataInsight(
+                type="pattern",
+                title=f"{top[0]['value']} dominates {name}",
+                description=f"{top[0]['share']:.0%} of rows have {name} = {top[0]['value']} ({summary['distinct']} distinct values).",
+                confidence=1.0
+            ))
+
+    return insights
@@ -0,0 +1,124 @@
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+import io
+import json
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+Batch = Tuple[Optional[List[str]], List[Any]]
+
+
+def arrow_available() -> bool:
+    """True if pyarrow is installed (it is an optional dependency)"""
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def encode_sse(event: str, data: Any) -> str:
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def encode_ndjson(batches: Iterable[Batch]) -> Iterator[bytes]:
+    """Encode row batches as newline-delimited JSON objects, one chunk per batch"""
+    for columns, rows in batches:
+        if columns is None:
+            lines = [json.dumps(doc, default=str) for doc in rows]
+        else:
+            lines = [json.dumps(dict(zip(columns, row)), default=str) for row in rows]
+        if lines:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def encode_arrow(batches: Iterable[Batch], infer_types: bool = True) -> Iterator[bytes]:
+    """Encode row batches as an Arrow IPC stream
+
+    The schema is written before any rows, so an empty result is still a valid
+    stream. Column types are inferred from the first batch, which only holds for
+    databases that return one Python type per column; set infer_types=False for
+    dynamically typed ones (SQLite) to send every column as a string. Types that
+    can vary between rows of the same column (decimals, nested values) and
+    columns with no inferable type (e.g. all NULL) are always sent as strings.
+    """
+    import pyarrow as pa
+
+    sink = io.BytesIO()
+    schema = None
+    writer = None
+
+    for columns, rows in batches:
+        if columns is None:
+            raise ValueError("Arrow output requires tabular (SQL) results")
+
+        values = list(zip(*rows)) if rows else [() for _ in columns]
+
+        if schema is None:
+            schema = pa.schema([
+                pa.field(name, _infer_arrow_type(column_values) if infer_types else pa.string())
+                for name, column_values in zip(columns, values)
+            ])
+            writer = pa.ipc.new_stream(sink, schema)
+
+        if rows:
+            arrays = [_to_arrow_array(column_values, field) for field, column_values in zip(schema, values)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+
+        yield _drain(sink)
+
+    if writer is None:
+        writer = pa.ipc.new_stream(sink, pa.schema([]))
+    writer.close()
+    yield _drain(sink)
+
+
+def _infer_arrow_type(column_values: Iterable[Any]):
+    """Arrow type for a column, or string if it may not hold for later batches"""
+    import pyarrow as pa
+
+    try:
+        arrow_type = pa.array(column_values).type
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        return pa.string()
+    stable = (
+        pa.types.is_boolean(arrow_type) or pa.types.is_integer(arrow_type)
+        or pa.types.is_floating(arrow_type) or pa.types.is_string(arrow_type)
+        or pa.types.is_binary(arrow_type) or pa.types.is_temporal(arrow_type)
+    )
+    return arrow_type if stable else pa.string()
+
+
+def _to_arrow_array(column_values: Iterable[Any], field):
+    """Build a column array of the field's type, widening values that need it"""
+    import pyarrow as pa
+
+    if pa.types.is_string(field.type):
+        return pa.array([_to_text(v) for v in column_values], type=field.type)
+    try:
+        return pa.array(column_values, type=field.type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        # e.g. an integer column whose later rows are floats; a lossy cast still raises
+        try:
+            return pa.array(column_values).cast(field.type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, OverflowError) as e:
+            raise ValueError(f"Column {field.name!r} does not fit its Arrow type {field.type}: {e}") from e
+
+
+def _to_text(value: Any) -> Optional[str]:
+    """String form of a value for a string column (JSON for nested values)"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    """Return and reset the bytes buffered so far"""
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate(0)
+    return data
@@ -0,0 +1,183 @@
+from sqlalchemy.orm import Session
+from typing import Dict, Any, Optional, Set
+from datetime import datetime
+from app.core.config import settings
+from app.db.database import DatabaseInspector, SessionLocal
+from app.db.engine_registry import engine_registry
+from app.models.models import DatabaseConnection
+from app.services.example_retrieval import example_retriever
+from app.services.generation_cache import generation_cache
+from app.services.result_cache import result_cache
+import asyncio
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def schema_fingerprint(schema_info: Dict[str, Any]) -> str:
+    """Short content hash identifying a schema version
+
+    Reflected schemas carry it precomputed under "schema_hash"; older cache
+    entries without one are hashed on demand.
+    """
+    if schema_info.get("schema_hash"):
+        return schema_info["schema_hash"]
+    content = {k: v for k, v in schema_info.items() if k != "schema_hash"}
+    return hashlib.sha256(
+        json.dumps(content, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()[:16]
+
+
+class SchemaCache:
+    """Serve schema information from DatabaseConnection.schema_cache
+
+    Policy, based on the age of ``last_sync``:
+    - fresh (age <= SCHEMA_CACHE_TTL_SECONDS): served from the cache
+    - stale (age <= SCHEMA_CACHE_MAX_STALE_SECONDS): served from the cache while a
+      background re-sync refreshes it
+    - expired or missing: reflected synchronously and written back
+
+    Concurrent reflections of the same database share a single in-flight task.
+    """
+
+    def __init__(self, ttl_seconds: int = None, max_stale_seconds: int = None):
+        self.ttl_seconds = settings.SCHEMA_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.max_stale_seconds = settings.SCHEMA_CACHE_MAX_STALE_SECONDS if max_stale_seconds is None else max_stale_seconds
+        self._inflight: Dict[int, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+
+    async def get_schema(
+        self,
+        db: Session,
+        db_conn: DatabaseConnection,
+        force_refresh: bool = False
+    ) -> Dict[str, Any]:
+        """Return schema info (including relationships) for a database connection"""
+        age = self._age_seconds(db_conn)
+
+        if not force_refresh and db_conn.schema_cache and age is not None:
+            if age <= self.ttl_seconds:
+                self.hits += 1
+                return db_conn.schema_cache
+            if age <= self.max_stale_seconds:
+                logger.info(f"Schema cache for database {db_conn.id} is stale ({int(age)}s), re-syncing in background")
+                self.schedule_refresh(db_conn.id, db_conn.connection_string)
+                self.hits += 1
+                return db_conn.schema_cache
+
+        self.misses += 1
+        return await self.refresh(db, db_conn)
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    async def refresh(self, db: Session, db_conn: DatabaseConnection) -> Dict[str, Any]:
+        """Reflect the schema now and persist it on the connection record"""
+        schema_info = await self._reflect_shared(db_conn.id, db_conn.connection_string)
+        await asyncio.get_event_loop().run_in_executor(
+            None, self._invalidate_if_changed,
+            db_conn.id, db_conn.connection_string, db_conn.schema_cache, schema_info
+        )
+
+        db_conn.schema_cache = schema_info
+        db_conn.last_sync = datetime.utcnow()
+        db.commit()
+        return schema_info
+
+    def schedule_refresh(self, database_id: int, connection_string: str):
+        """Re-sync a schema in the background without blocking the caller"""
+        if database_id in self._inflight:
+            return
+
+        task = asyncio.create_task(self._background_refresh(database_id, connection_string))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _background_refresh(self, database_id: int, connection_string: str):
+        try:
+            schema_info = await self._reflect_shared(database_id, connection_string)
+        except Exception as e:
+            logger.error(f"Background schema sync failed for database {database_id}: {e}")
+            return
+
+        db = SessionLocal()
+        try:
+            previous = db.query(DatabaseConnection.schema_cache).filter(
+                DatabaseConnection.id == database_id
+            ).scalar()
+            await asyncio.get_event_loop().run_in_executor(
+                None, self._invalidate_if_changed, database_id, connection_string, previous, schema_info
+            )
+
+            db.query(DatabaseConnection).filter(
+                DatabaseConnection.id == database_id
+            ).update({
+                DatabaseConnection.schema_cache: schema_info,
+                DatabaseConnection.last_sync: datetime.utcnow()
+            })
+            db.commit()
+            logger.info(f"Background schema sync completed for database {database_id}")
+        finally:
+            db.close()
+
+    async def _reflect_shared(self, database_id: int, connection_string: str) -> Dict[str, Any]:
+        task = self._inflight.get(database_id)
+        if task is None:
+            task = asyncio.ensure_future(self._reflect(connection_string))
+            self._inflight[database_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(database_id, None))
+        # Shield so one cancelled request doesn't abort the reflection others are waiting on
+        return await asyncio.shield(task)
+
+    @staticmethod
+    async def _reflect(connection_string: str) -> Dict[str, Any]:
+        def _inspect() -> Dict[str, Any]:
+            inspector = DatabaseInspector(connection_string)
+            schema_info = {
+                **inspector.get_schema_info(),
+                "relationships": inspector.get_table_relationships()
+            }
+            schema_info["schema_hash"] = schema_fingerprint(schema_info)
+            return schema_info
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(engine_registry.executor, _inspect)
+
+    @staticmethod
+    def _invalidate_if_changed(
+        database_id: int,
+        connection_string: str,
+        previous: Optional[Dict[str, Any]],
+        current: Dict[str, Any]
+    ):
+        """Drop cached generations, examples and results made stale by a schema change (blocking)"""
+        if previous and schema_fingerprint(previous) == schema_fingerprint(current):
+            return
+        removed = generation_cache.invalidate(database_id)
+        example_retriever.invalidate(database_id)
+        if removed:
+            logger.info(f"Schema of database {database_id} changed, dropped {removed} cached generations")
+        
+        # Cached results only depend on their own tables; sample data counts as a change
+        if previous:
+            before, after = previous.get("tables", {}), current.get("tables", {})
+            changed = [name for name in before if before[name] != after.get(name)]
+            result_cache.invalidate_tables(connection_string, changed)
+        else:
+            result_cache.invalidate(connection_string)
+
+    @staticmethod
+    def _age_seconds(db_conn: DatabaseConnection) -> Optional[float]:
+        if not db_conn.last_sync:
+            return None
+        return (datetime.utcnow() - db_conn.last_sync).total_seconds()
+
+
+# Singleton instance
+schema_cache = SchemaCache()
@@ -0,0 +1,209 @@
+from collections import Counter, OrderedDict
+from typing import Dict, Any, List, Optional, Set
+from app.core.config import settings
+import hashlib
+import json
+import math
+import re
+import threading
+
+_CAMEL_BOUNDARY = re.compile(r"([a-z0-9])([A-Z])")
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+# Rough characters-per-token ratio used to keep prompts under budget without a tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def tokenize(text: str) -> List[str]:
+    """Split identifiers and prose into comparable lowercase terms
+
+    snake_case and camelCase identifiers are split into words and simple
+    plurals are folded, so "OrderItems" and "order item" share terms.
+    """
+    words = _NON_WORD.split(_CAMEL_BOUNDARY.sub(r"\1 \2", text).lower())
+    terms = []
+    for word in words:
+        if not word:
+            continue
+        if len(word) > 3 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def format_table(table_name: str, columns: List[Dict[str, Any]]) -> str:
+    """Render one table the way AIService._build_schema_context does"""
+    columns_str = ", ".join([f"{col['name']} ({col['type']})" for col in columns])
+    return f"Table: {table_name}\nColumns: {columns_str}\n"
+
+
+class _SchemaIndex:
+    """TF-IDF vectors for every table of one schema version"""
+
+    def __init__(self, schema_info: Dict[str, Any]):
+        self.tables: Dict[str, Dict[str, Any]] = schema_info.get("tables", {})
+        self.neighbours: Dict[str, Set[str]] = {name: set() for name in self.tables}
+        self.vectors: Dict[str, Dict[str, float]] = {}
+        self.catalog: Optional[str] = None
+
+        documents: Dict[str, Counter] = {}
+        for name, table in self.tables.items():
+            terms = Counter()
+            # Table names say more about relevance than any single column
+            for term in tokenize(name):
+                terms[term] += 3
+            for column in table.get("columns", []):
+                terms.update(tokenize(column["name"]))
+            for fk in table.get("foreign_keys", []):
+                referred = fk.get("referred_table")
+                if referred in self.tables:
+                    self.neighbours[name].add(referred)
+                    self.neighbours[referred].add(name)
+            documents[name] = terms
+
+        document_count = len(documents) or 1
+        document_frequency = Counter(term for terms in documents.values() for term in terms)
+        self.idf = {
+            term: math.log((1 + document_count) / (1 + df)) + 1
+            for term, df in document_frequency.items()
+        }
+
+        for name, terms in documents.items():
+            vector = {term: count * self.idf[term] for term, count in terms.items()}
+            norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+            self.vectors[name] = {term: weight / norm for term, weight in vector.items()}
+
+    def score(self, question: str) -> Dict[str, float]:
+        query_terms = Counter(term for term in tokenize(question) if term in self.idf)
+        if not query_terms:
+            return {name: 0.0 for name in self.tables}
+        return {
+            name: sum(vector.get(term, 0.0) * self.idf[term] * count for term, count in query_terms.items())
+            for name, vector in self.vectors.items()
+        }
+
+
+class SchemaRetriever:
+    """Select the tables and columns of a schema that are relevant to a question
+
+    Tables are ranked by TF-IDF similarity between the question and their
+    table/column names. The top-k tables plus their foreign-key neighbours are
+    rendered in rank order until the token budget is used up; a table that does
+    not fit whole keeps its key columns and the columns matching the question.
+    Works fully offline.
+    """
+
+    def __init__(
+        self,
+        top_k: int = None,
+        token_budget: int = None,
+        catalog_token_budget: int = None,
+        max_indexes: int = 32
+    ):
+        self.top_k = top_k or settings.SCHEMA_PRUNING_TOP_K
+        self.token_budget = token_budget or settings.SCHEMA_CONTEXT_TOKEN_BUDGET
+        self.catalog_token_budget = catalog_token_budget or settings.SCHEMA_CATALOG_TOKEN_BUDGET
+        self.max_indexes = max_indexes
+        self._indexes: "OrderedDict[str, _SchemaIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _index(self, schema_info: Dict[str, Any]) -> _SchemaIndex:
+        key = schema_info.get("schema_hash") or hashlib.sha256(
+            json.dumps(schema_info.get("tables", {}), sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                return index
+
+        index = _SchemaIndex(schema_info)
+        with self._lock:
+            self._indexes[key] = index
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+        return index
+
+    def rank_tables(self, schema_info: Dict[str, Any], question: str) -> List[str]:
+        """Relevant tables in priority order: top-k matches, then their FK neighbours"""
+        index = self._index(schema_info)
+        scores = index.score(question)
+        ranked = sorted(index.tables, key=lambda name: (-scores[name], name))
+
+        seeds = [name for name in ranked if scores[name] > 0][:self.top_k]
+        if not seeds:
+            # Nothing matched lexically: fall back to the most connected tables
+            seeds = sorted(index.tables, key=lambda name: (-len(index.neighbours[name]), name))[:self.top_k]
+
+        selected = list(seeds)
+        seen = set(seeds)
+        for name in seeds:
+            for neighbour in sorted(index.neighbours[name], key=lambda n: (-scores[n], n)):
+                if neighbour not in seen:
+                    selected.append(neighbour)
+                    seen.add(neighbour)
+        return selected
+
+    def build_context(self, schema_info: Dict[str, Any], question: str) -> str:
+        """Schema context restricted to relevant tables and kept under the token budget"""
+        tables = schema_info.get("tables", {})
+        query_terms = set(tokenize(question))
+        remaining = self.token_budget
+        context = []
+
+        for table_name in self.rank_tables(schema_info, question):
+            table = tables[table_name]
+            columns = table.get("columns", [])
+            block = format_table(table_name, columns)
+
+            if estimate_tokens(block) > remaining:
+                columns = self._essential_columns(table, query_terms)
+                block = format_table(table_name, columns)
+                if estimate_tokens(block) > remaining:
+                    break
+
+            context.append(block)
+            remaining -= estimate_tokens(block)
+
+        return "\n".join(context)
+
+    def build_catalog(self, schema_info: Dict[str, Any]) -> str:
+        """Every table with its column names only, the same for every question
+
+        Falls back to the table names alone when that exceeds the catalog token
+        budget. Computed once per schema version.
+        """
+        index = self._index(schema_info)
+        if index.catalog is None:
+            catalog = "\n".join(
+                f"{name}({', '.join(column['name'] for column in table.get('columns', []))})"
+                for name, table in index.tables.items()
+            )
+            if estimate_tokens(catalog) > self.catalog_token_budget:
+                catalog = ", ".join(index.tables)
+            index.catalog = catalog
+        return index.catalog
+
+    @staticmethod
+    def _essential_columns(table: Dict[str, Any], query_terms: Set[str]) -> List[Dict[str, Any]]:
+        key_columns = set(table.get("primary_key", {}).get("constrained_columns") or [])
+        for fk in table.get("foreign_keys", []):
+            key_columns.update(fk.get("constrained_columns") or [])
+
+        return [
+            column for column in table.get("columns", [])
+            if column["name"] in key_columns
+            or column.get("primary_key")
+            or query_terms.intersection(tokenize(column["name"]))
+        ]
+
+
+# Singleton instance
+schema_retriever = SchemaRetriever()
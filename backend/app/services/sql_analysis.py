@@ -0,0 +1,245 @@
+from functools import lru_cache
+from typing import Dict, List, Optional
+from sqlglot import exp
+from sqlglot.tokens import TokenType
+from app.core.config import settings
+import logging
+import sqlglot
+
+logger = logging.getLogger(__name__)
+
+# DatabaseConnection.db_type / SQLAlchemy dialect name -> sqlglot dialect
+SQLGLOT_DIALECTS = {
+    "postgresql": "postgres",
+    "postgres": "postgres",
+    "sqlite": "sqlite",
+    "mysql": "mysql",
+    "mariadb": "mysql",
+    "mssql": "tsql",
+    "sqlserver": "tsql",
+    "oracle": "oracle",
+    "snowflake": "snowflake",
+    "bigquery": "bigquery",
+}
+
+# Node types that make a statement write, lock or change the schema
+_WRITE_NODES = (
+    exp.Insert, exp.Update, exp.Delete, exp.Merge, exp.Create, exp.Drop,
+    exp.AlterTable, exp.TruncateTable, exp.Command, exp.Into, exp.Lock,
+)
+
+# Dialects whose row limit is a trailing LIMIT clause, which can be edited in place
+_LIMIT_CLAUSE_DIALECTS = {None, "postgres", "sqlite", "mysql", "snowflake", "bigquery"}
+
+# Functions whose result changes between executions of the same statement
+_VOLATILE_NODES = (
+    exp.CurrentDate, exp.CurrentTime, exp.CurrentTimestamp, exp.CurrentDatetime,
+    exp.CurrentUser, exp.Rand, exp.Randn,
+)
+_VOLATILE_FUNCTIONS = {
+    "NOW", "CURDATE", "CURTIME", "SYSDATE", "SYSDATETIME", "SYSTIMESTAMP", "GETDATE",
+    "GETUTCDATE", "UTC_TIMESTAMP", "UTC_DATE", "UNIX_TIMESTAMP", "CLOCK_TIMESTAMP",
+    "STATEMENT_TIMESTAMP", "TRANSACTION_TIMESTAMP", "TIMEOFDAY", "RANDOM", "RANDOMBLOB",
+    "UUID", "GEN_RANDOM_UUID", "NEWID", "NEXTVAL", "LAST_INSERT_ID", "CONNECTION_ID",
+}
+# Bare keywords sqlglot reads as column names
+_VOLATILE_KEYWORDS = {"localtime", "localtimestamp", "sysdate", "systimestamp"}
+# Literals that date functions and casts resolve against the clock, e.g. date('now')
+_VOLATILE_LITERALS = {"now", "today", "tomorrow", "yesterday"}
+
+
+def _is_volatile(node: exp.Expression) -> bool:
+    if isinstance(node, _VOLATILE_NODES):
+        return True
+    if isinstance(node, exp.Anonymous):
+        return node.name.upper() in _VOLATILE_FUNCTIONS
+    if isinstance(node, exp.Column):
+        return not node.table and node.name.lower() in _VOLATILE_KEYWORDS
+    if isinstance(node, exp.Literal) and node.is_string:
+        return node.this.lower() in _VOLATILE_LITERALS and isinstance(node.parent, (exp.Func, exp.Cast))
+    return False
+
+
+class SQLAnalysis:
+    """Everything QueryValidator needs from one parse of a SQL string
+
+    Instances are shared through the memo cache, so treat them as read-only.
+    """
+
+    def __init__(self, sql: str, dialect: Optional[str]):
+        self.sql = sql
+        self.dialect = dialect
+        self.parse_error: Optional[str] = None
+        self.statement_types: List[str] = []
+        self.tables: List[str] = []
+        self.table_aliases: Dict[str, str] = {}
+        self.is_read_only = False
+        self.is_deterministic = False
+        self.has_limit = False
+        self.outer_limit: Optional[int] = None
+        self.join_count = 0
+        self.subquery_count = 0
+        self.has_group_by = False
+        self.has_having = False
+        self.has_union = False
+        self.has_distinct = False
+        self.has_aggregate = False
+        self.has_where = False
+        self.has_or = False
+        self.selects_star = False
+        self.leading_wildcard_like = False
+        self._tree: Optional[exp.Expression] = None
+        self._limited: Dict[int, str] = {}
+
+    @property
+    def complexity_score(self) -> int:
+        return (
+            self.join_count * 2
+            + self.subquery_count * 3
+            + int(self.has_group_by)
+            + int(self.has_having)
+            + int(self.has_union) * 2
+            + int(self.has_distinct)
+        )
+
+    def with_limit(self, max_rows: int, tighten: bool = False) -> str:
+        """The SQL with an outer row limit, if it is a single read-only query without one
+
+        With tighten=True an existing outer limit above max_rows is lowered too.
+        Only the outer LIMIT is inserted or replaced in the original text, so the
+        rest of the statement reaches the database exactly as written; the
+        statement is re-rendered only for dialects without a LIMIT clause (TOP,
+        FETCH FIRST).
+        """
+        if self._tree is None or not self.is_read_only:
+            return self.sql
+        if self.has_limit and not (tighten and self.outer_limit is not None and self.outer_limit > max_rows):
+            return self.sql
+        if max_rows not in self._limited:
+            limited = self._edit_limit(max_rows) if self.dialect in _LIMIT_CLAUSE_DIALECTS else None
+            self._limited[max_rows] = limited or self._tree.copy().limit(max_rows).sql(dialect=self.dialect)
+        return self._limited[max_rows]
+
+    def _edit_limit(self, max_rows: int) -> Optional[str]:
+        """The original text with its outer LIMIT set to max_rows, or None if it can't be located"""
+        if self._tree.args.get("fetch") is not None:
+            return None
+        try:
+            tokens = sqlglot.Dialect.get_or_raise(self.dialect).tokenize(self.sql)
+        except sqlglot.errors.SqlglotError:
+            return None
+
+        # Tokens outside parentheses belong to the outer query
+        outer = []
+        depth = 0
+        for i, token in enumerate(tokens):
+            if token.token_type == TokenType.L_PAREN:
+                depth += 1
+            elif token.token_type == TokenType.R_PAREN:
+                depth -= 1
+            elif depth == 0:
+                outer.append(i)
+
+        if self.has_limit:
+            limits = [i for i in outer if tokens[i].token_type == TokenType.LIMIT]
+            if not limits:
+                return None
+            count_index = limits[-1] + 1
+            # MySQL's LIMIT offset, count
+            if count_index + 2 < len(tokens) and tokens[count_index + 1].token_type == TokenType.COMMA:
+                count_index += 2
+            if count_index >= len(tokens) or tokens[count_index].token_type != TokenType.NUMBER:
+                return None
+            count = tokens[count_index]
+            return f"{self.sql[:count.start]}{max_rows}{self.sql[count.end + 1:]}"
+
+        # LIMIT goes before an outer OFFSET, otherwise after the last token (ahead
+        # of a trailing semicolon or comment)
+        offsets = [i for i in outer if tokens[i].token_type == TokenType.OFFSET]
+        if offsets:
+            position = tokens[offsets[-1]].start
+            return f"{self.sql[:position]}LIMIT {max_rows} {self.sql[position:]}"
+        statement_tokens = [token for token in tokens if token.token_type != TokenType.SEMICOLON]
+        if not statement_tokens:
+            return None
+        position = statement_tokens[-1].end + 1
+        return f"{self.sql[:position]} LIMIT {max_rows}{self.sql[position:]}"
+
+
+def analyze_sql(sql: str, dialect: Optional[str] = None) -> SQLAnalysis:
+    """Parse SQL once and derive complexity, safety, tables and limit information
+
+    Results are memoized per (SQL, dialect). SQL that can't be parsed (or a
+    non-SQL dialect such as MongoDB) yields an analysis that is not read-only
+    and never gets a limit injected.
+    """
+    dialect = (dialect or "").lower()
+    if dialect == "mongodb":
+        analysis = SQLAnalysis(sql, None)
+        analysis.parse_error = "MongoDB operations are not SQL"
+        return analysis
+    return _analyze(sql.strip(), SQLGLOT_DIALECTS.get(dialect))
+
+
+@lru_cache(maxsize=settings.SQL_ANALYSIS_CACHE_SIZE)
+def _analyze(sql: str, dialect: Optional[str]) -> SQLAnalysis:
+    analysis = SQLAnalysis(sql, dialect)
+
+    try:
+        statements = [s for s in sqlglot.parse(sql, read=dialect) if s is not None]
+    except sqlglot.errors.SqlglotError as e:
+        logger.debug(f"Could not parse SQL ({dialect or 'generic'}): {e}")
+        analysis.parse_error = str(e)
+        return analysis
+
+    if not statements:
+        analysis.parse_error = "Empty statement"
+        return analysis
+
+    analysis.statement_types = [type(s).__name__.lower() for s in statements]
+    cte_names = {cte.alias_or_name for s in statements for cte in s.find_all(exp.CTE)}
+    tables = []
+    for statement in statements:
+        for table in statement.find_all(exp.Table):
+            if table.name and table.name not in cte_names:
+                analysis.table_aliases[table.alias_or_name] = table.name
+                if table.name not in tables:
+                    tables.append(table.name)
+    analysis.tables = tables
+
+    for statement in statements:
+        analysis.join_count += sum(1 for _ in statement.find_all(exp.Join))
+        analysis.subquery_count += sum(1 for _ in statement.find_all(exp.Select))
+        analysis.has_group_by |= statement.find(exp.Group) is not None
+        analysis.has_having |= statement.find(exp.Having) is not None
+        analysis.has_union |= statement.find(exp.Union) is not None
+        analysis.has_distinct |= statement.find(exp.Distinct) is not None
+        analysis.has_aggregate |= statement.find(exp.AggFunc) is not None
+        analysis.has_where |= statement.find(exp.Where) is not None
+        analysis.has_or |= statement.find(exp.Or) is not None
+        analysis.selects_star |= any(
+            isinstance(projection, exp.Star) or (isinstance(projection, exp.Column) and projection.is_star)
+            for select in statement.find_all(exp.Select)
+            for projection in select.expressions
+        )
+        analysis.leading_wildcard_like |= any(
+            isinstance(like.expression, exp.Literal) and like.expression.is_string
+            and like.expression.this.startswith("%")
+            for like in statement.find_all(exp.Like, exp.ILike)
+        )
+    # The outermost SELECT isn't a subquery
+    analysis.subquery_count = max(analysis.subquery_count - len(statements), 0)
+
+    if len(statements) == 1:
+        tree = statements[0]
+        limit = tree.args.get("limit")
+        analysis.has_limit = limit is not None
+        if limit is not None:
+            count = limit.args.get("expression") or limit.args.get("count")
+            if isinstance(count, exp.Literal) and count.is_int:
+                analysis.outer_limit = int(count.this)
+        analysis.is_read_only = isinstance(tree, exp.Query) and tree.find(*_WRITE_NODES) is None
+        analysis.is_deterministic = not any(_is_volatile(node) for node in tree.walk())
+        analysis._tree = tree
+
+    return analysis
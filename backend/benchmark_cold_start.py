@@ -0,0 +1,75 @@
+"""
+Benchmark cold start with Redis and MongoDB unreachable.
+
+Each scenario runs in a fresh interpreter:
+- eager: import the app, then probe the metadata database, Redis and MongoDB
+  one after another (what importing app.db.database used to do)
+- lazy: import the app and run its startup phase, timing when /health
+  (liveness) and /ready (readiness) first answer
+
+Usage: python benchmark_cold_start.py [runs]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+EAGER = """
+import time
+start = time.perf_counter()
+import main
+from app.db.database import get_engine, get_redis, get_mongo_client
+get_engine(); get_redis(); get_mongo_client()
+print(f"{(time.perf_counter() - start) * 1000:.1f} -")
+"""
+
+LAZY = """
+import time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    assert client.get("/health").status_code == 200
+    live = time.perf_counter()
+    assert client.get("/ready").status_code == 200
+print(f"{(live - start) * 1000:.1f} {(imported - start) * 1000:.1f}")
+"""
+
+
+def run(script: str, env: dict) -> tuple:
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        env=env,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout.split()[-2:]
+    return float(output[0]), None if output[1] == "-" else float(output[1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'querymind.db')}",
+            REDIS_URL="redis://127.0.0.1:1",
+            MONGODB_URL="mongodb://127.0.0.1:1",
+            ANTHROPIC_API_KEY="benchmark",
+            SECRET_KEY="benchmark",
+            LOG_LEVEL="WARNING"
+        )
+
+        eager = [run(EAGER, env)[0] for _ in range(runs)]
+        lazy = [run(LAZY, env) for _ in range(runs)]
+
+        print(f"{'startup':<10}{'import (ms)':>14}{'ready to serve (ms)':>22}")
+        print(f"{'eager':<10}{'':>14}{min(eager):>22.1f}")
+        print(f"{'lazy':<10}{min(i for _, i in lazy):>14.1f}{min(l for l, _ in lazy):>22.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark result memory: list of row dicts vs ColumnarResult.
+
+Creates a SQLite table with mixed column types, fetches the same result both
+ways and reports the memory retained by the result (tracemalloc) and the
+time to build it and to convert it to JSON rows.
+
+Usage: python benchmark_columnar_results.py [row_count]
+"""
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from sqlalchemy import create_engine, text
+from app.services.columnar import ColumnarResult
+
+QUERY = "SELECT id, customer_id, amount, quantity, is_paid, region, created_at FROM orders"
+
+
+def build_table(engine, row_count: int):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER, amount REAL, "
+            "quantity INTEGER, is_paid BOOLEAN, region TEXT, created_at TEXT)"
+        ))
+        regions = ["north", "south", "east", "west"]
+        conn.execute(
+            text("INSERT INTO orders VALUES (:id, :customer_id, :amount, :quantity, :is_paid, :region, :created_at)"),
+            [
+                {
+                    "id": i,
+                    "customer_id": i % 5000,
+                    "amount": (i % 997) * 1.25,
+                    "quantity": i % 12,
+                    "is_paid": i % 3 == 0,
+                    "region": regions[i % 4],
+                    "created_at": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}T10:00:00",
+                }
+                for i in range(row_count)
+            ]
+        )
+
+
+def measure(engine, build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        result = build(conn.execute(text(QUERY)))
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained, elapsed
+
+
+def main():
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'orders.db')}")
+        build_table(engine, row_count)
+
+        dict_rows, dict_bytes, dict_seconds = measure(
+            engine, lambda result: [dict(row._mapping) for row in result]
+        )
+        columnar, columnar_bytes, columnar_seconds = measure(
+            engine, lambda result: ColumnarResult.from_rows(result.keys(), result.fetchall())
+        )
+
+        start = time.perf_counter()
+        assert columnar.to_rows() == dict_rows, "row conversion differs"
+        to_rows_seconds = time.perf_counter() - start
+
+        print(f"{row_count:,} rows x {len(columnar.columns)} columns")
+        print(f"{'representation':<18}{'retained (MB)':>15}{'build (ms)':>12}")
+        print(f"{'list of dicts':<18}{dict_bytes / 1e6:>15.1f}{dict_seconds * 1000:>12.1f}")
+        print(f"{'columnar':<18}{columnar_bytes / 1e6:>15.1f}{columnar_seconds * 1000:>12.1f}")
+        print(f"Memory reduction: {dict_bytes / columnar_bytes:.1f}x; to_rows() + compare: {to_rows_seconds * 1000:.1f} ms")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
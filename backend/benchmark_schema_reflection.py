@@ -0,0 +1,118 @@
+"""
+Benchmark catalog round-trips for schema reflection.
+
+Generates a SQLite database with 1,000 tables (foreign keys and indexes
+included) and compares the old per-table Inspector loop against the bulk
+DatabaseInspector path.
+
+Usage: python benchmark_schema_reflection.py [table_count]
+"""
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from sqlalchemy import create_engine, event, inspect, text
+from app.db.database import DatabaseInspector
+
+
+def build_schema(db_url: str, table_count: int):
+    engine = create_engine(db_url)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t0000 (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL)"))
+        for i in range(1, table_count):
+            parent = f"t{(i - 1) // 2:04d}"
+            conn.execute(text(
+                f"CREATE TABLE t{i:04d} ("
+                f"id INTEGER PRIMARY KEY, "
+                f"{parent}_id INTEGER REFERENCES {parent}(id), "
+                f"code VARCHAR(32) UNIQUE, "
+                f"amount NUMERIC(10, 2) DEFAULT 0, "
+                f"created_at TIMESTAMP)"
+            ))
+            conn.execute(text(f"CREATE INDEX ix_t{i:04d}_created ON t{i:04d} (created_at, amount)"))
+    engine.dispose()
+
+
+def count_round_trips(engine):
+    counter = {"count": 0}
+
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        counter["count"] += 1
+
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    return counter, lambda: event.remove(engine, "before_cursor_execute", _before_execute)
+
+
+def reflect_per_table(engine):
+    """The original get_schema_info + get_table_relationships loop"""
+    inspector = inspect(engine)
+    tables = {}
+    for table_name in inspector.get_table_names():
+        tables[table_name] = {
+            "columns": inspector.get_columns(table_name),
+            "foreign_keys": inspector.get_foreign_keys(table_name),
+            "indexes": inspector.get_indexes(table_name),
+            "primary_key": inspector.get_pk_constraint(table_name)
+        }
+    # get_table_relationships ran a second inspector pass in the routes
+    relationships_inspector = inspect(engine)
+    relationships = [
+        fk
+        for table_name in relationships_inspector.get_table_names()
+        for fk in relationships_inspector.get_foreign_keys(table_name)
+    ]
+    return tables, relationships
+
+
+def reflect_bulk(db_url: str):
+    inspector = DatabaseInspector(db_url)
+    schema_info = inspector.get_schema_info()
+    return schema_info["tables"], inspector.get_table_relationships()
+
+
+def main():
+    table_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite:///{os.path.join(tmp, 'wide_schema.db')}"
+        print(f"Generating {table_count} tables...")
+        build_schema(db_url, table_count)
+
+        engine = create_engine(db_url)
+        counter, stop = count_round_trips(engine)
+        start = time.perf_counter()
+        legacy_tables, legacy_relationships = reflect_per_table(engine)
+        legacy_ms = (time.perf_counter() - start) * 1000
+        legacy_trips = counter["count"]
+        stop()
+        engine.dispose()
+
+        bulk_inspector = DatabaseInspector(db_url)
+        counter, stop = count_round_trips(bulk_inspector.engine)
+        start = time.perf_counter()
+        bulk_tables = bulk_inspector.get_schema_info()["tables"]
+        bulk_relationships = bulk_inspector.get_table_relationships()
+        bulk_ms = (time.perf_counter() - start) * 1000
+        bulk_trips = counter["count"]
+        stop()
+
+        assert set(bulk_tables) == set(legacy_tables), "table sets differ"
+        assert len(bulk_relationships) == len(legacy_relationships), "relationship counts differ"
+        for name, table in legacy_tables.items():
+            assert [c["name"] for c in table["columns"]] == [c["name"] for c in bulk_tables[name]["columns"]]
+            assert len(table["indexes"]) == len(bulk_tables[name]["indexes"])
+            assert table["primary_key"]["constrained_columns"] == bulk_tables[name]["primary_key"]["constrained_columns"]
+
+        print(f"{'path':<12}{'round-trips':>14}{'time (ms)':>12}")
+        print(f"{'per-table':<12}{legacy_trips:>14}{legacy_ms:>12.1f}")
+        print(f"{'bulk':<12}{bulk_trips:>14}{bulk_ms:>12.1f}")
+        print(f"Relationships: {len(bulk_relationships)} (same pass)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark SQL validation: legacy substring/regex checks vs the parse-once AST analysis.
+
+Generates a labelled corpus of LLM-style queries, including the cases the
+regex version gets wrong (ORDER BY read as OR, LIMIT inside a string literal,
+keywords in literals, limits inside subqueries, data-modifying CTEs), and
+reports throughput and agreement with the labels for read-only detection,
+OR detection and LIMIT injection.
+
+Usage: python benchmark_sql_validation.py [query_count]
+"""
+import os
+import random
+import re
+import sys
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.services.sql_analysis import analyze_sql, _analyze
+
+TABLES = ["customers", "orders", "order_items", "products", "payments", "shipments", "reviews"]
+COLUMNS = ["id", "name", "status", "amount", "created_at", "region", "category"]
+
+
+# --- Legacy implementation (QueryValidator / QueryExecutor before the parser) ---
+
+def legacy_is_safe_query(sql):
+    sql_upper = sql.upper().strip()
+    forbidden = [
+        "INSERT", "UPDATE", "DELETE", "DROP", "CREATE",
+        "ALTER", "TRUNCATE", "GRANT", "REVOKE", "EXEC",
+        "REPLACE", "MERGE"
+    ]
+    if not (sql_upper.startswith("SELECT") or sql_upper.startswith("WITH")):
+        return False
+    for keyword in forbidden:
+        if re.search(rf"\b{keyword}\b", sql_upper):
+            return False
+    return True
+
+
+def legacy_validate_complexity(sql):
+    sql_upper = sql.upper()
+    score = sql_upper.count("JOIN") * 2 + (sql_upper.count("SELECT") - 1) * 3
+    score += ("GROUP BY" in sql_upper) + ("HAVING" in sql_upper) + ("UNION" in sql_upper) * 2 + ("DISTINCT" in sql_upper)
+    return {"complexity_score": score, "has_or": "OR" in sql_upper}
+
+
+def legacy_add_safety_limits(sql, max_rows=1000):
+    sql_upper = sql.upper().strip()
+    if (sql_upper.startswith("SELECT") or sql_upper.startswith("WITH")) and \
+       "LIMIT" not in sql_upper and "TOP" not in sql_upper:
+        sql = sql.rstrip(";")
+        sql += f" LIMIT {max_rows}"
+    return sql
+
+
+def legacy(sql):
+    complexity = legacy_validate_complexity(sql)
+    limited = legacy_add_safety_limits(sql)
+    return legacy_is_safe_query(sql), complexity["has_or"], limited != sql
+
+
+def parsed(sql):
+    analysis = analyze_sql(sql, "postgresql")
+    analysis.complexity_score
+    limited = analysis.with_limit(1000)
+    return analysis.is_read_only, analysis.has_or, limited != sql
+
+
+# --- Corpus: (sql, read_only, has_or, needs_limit) ---
+
+def generate_query(rng):
+    t1, t2 = rng.sample(TABLES, 2)
+    c1, c2 = rng.sample(COLUMNS, 2)
+    n = rng.randint(1, 500)
+    templates = [
+        (f"SELECT {c1}, {c2} FROM {t1} WHERE {c1} = {n} ORDER BY {c2} DESC", True, False, True),
+        (f"SELECT {c1}, COUNT(*) FROM {t1} GROUP BY {c1} HAVING COUNT(*) > {n} ORDER BY 2", True, False, True),
+        (f"SELECT a.{c1}, b.{c2} FROM {t1} a JOIN {t2} b ON a.id = b.id WHERE a.{c1} = {n} OR b.{c2} = {n}", True, True, True),
+        (f"SELECT {c1} FROM {t1} WHERE note = 'LIMIT {n}' ORDER BY {c1}", True, False, True),
+        (f"SELECT {c1} FROM {t1} WHERE {c2} = 'please update the record'", True, False, True),
+        (f"SELECT {c1} FROM {t1} WHERE id IN (SELECT id FROM {t2} ORDER BY {c2} LIMIT 10)", True, False, True),
+        (f"WITH recent AS (SELECT * FROM {t1} WHERE created_at > NOW() - INTERVAL '7 days') SELECT {c1} FROM recent", True, False, True),
+        (f"SELECT DISTINCT {c1} FROM {t1} LIMIT {n}", True, False, False),
+        (f"SELECT {c1} FROM {t1} UNION SELECT {c1} FROM {t2}", True, False, True),
+        (f"SELECT {c1} FROM {t1} WHERE {c1} LIKE '%{n}' OR {c2} IS NULL LIMIT 50", True, True, False),
+        (f"SELECT replace({c1}, 'a', 'b') FROM {t1}", True, False, True),
+        (f"SELECT created_at FROM {t1} ORDER BY created_at -- newest first", True, False, True),
+        (f"UPDATE {t1} SET {c1} = {n} WHERE id = {n}", False, False, False),
+        (f"DELETE FROM {t1} WHERE id = {n}", False, False, False),
+        (f"INSERT INTO {t1} ({c1}) VALUES ({n})", False, False, False),
+        (f"WITH gone AS (DELETE FROM {t1} WHERE id = {n} RETURNING *) SELECT * FROM gone", False, False, False),
+        (f"SELECT * INTO {t2}_backup FROM {t2}", False, False, False),
+        (f"SELECT {c1} FROM {t1} WHERE id = {n} FOR UPDATE", False, False, False),
+    ]
+    return rng.choice(templates)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rng = random.Random(42)
+    corpus = [generate_query(rng) for _ in range(count)]
+
+    results = []
+    for name, check in (("regex", legacy), ("ast (cold)", parsed), ("ast (memoized)", parsed)):
+        if name == "ast (cold)":
+            _analyze.cache_clear()
+        start = time.perf_counter()
+        outcomes = [check(sql) for sql, _, _, _ in corpus]
+        elapsed = time.perf_counter() - start
+
+        correct = [0, 0, 0]
+        for outcome, (_, *expected) in zip(outcomes, corpus):
+            for i in range(3):
+                correct[i] += outcome[i] == expected[i]
+        results.append((name, count / elapsed, [c / count * 100 for c in correct]))
+
+    distinct = len({sql for sql, _, _, _ in corpus})
+    print(f"{count} queries ({distinct} distinct)")
+    print(f"{'validator':<16}{'queries/s':>12}{'read-only %':>14}{'OR %':>8}{'LIMIT %':>10}")
+    for name, throughput, accuracy in results:
+        print(f"{name:<16}{throughput:>12.0f}{accuracy[0]:>14.1f}{accuracy[1]:>8.1f}{accuracy[2]:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""Settings for running the test suite without external services
+
+Values from the environment or .env take precedence. Redis and MongoDB point
+at closed ports, so caches fall back to their in-process behaviour.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'schemamind-test.db')}")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test")
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("REDIS_URL", "redis://127.0.0.1:1")
+os.environ.setdefault("MONGODB_URL", "mongodb://127.0.0.1:1/test")
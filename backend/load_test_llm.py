@@ -0,0 +1,121 @@
+"""
+Load test for the async LLM provider layer against a local fake provider.
+
+Starts an OpenAI-compatible HTTP server that sleeps before answering, then
+fires concurrent completions through OpenAIProvider. It compares the result
+with the old pattern of a synchronous SDK call inside a coroutine, and it
+measures event-loop lag to show whether other requests (e.g. /health) would
+still be served.
+
+Usage: python load_test_llm.py [requests] [latency_seconds]
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("ANTHROPIC_API_KEY", "load-test")
+os.environ.setdefault("SECRET_KEY", "load-test")
+
+from openai import OpenAI
+from app.services.llm_providers import OpenAIProvider
+
+LATENCY_SECONDS = 0.5
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Answers /v1/chat/completions after a fixed delay"""
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        time.sleep(LATENCY_SECONDS)
+
+        body = json.dumps({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "fake-model",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": '{"sql": "SELECT 1"}'},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeProviderServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 would make the fake provider itself the bottleneck
+    request_queue_size = 256
+    daemon_threads = True
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Largest delay observed between scheduled ticks of the event loop"""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run(label: str, call, count: int):
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(count)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    worst_lag = await lag_task
+    print(f"{label:<26}{elapsed:>10.2f}s{worst_lag * 1000:>14.0f}ms")
+    return elapsed
+
+
+async def main():
+    global LATENCY_SECONDS
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    LATENCY_SECONDS = float(sys.argv[2]) if len(sys.argv) > 2 else LATENCY_SECONDS
+
+    server = FakeProviderServer(("127.0.0.1", 0), FakeOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    sync_client = OpenAI(api_key="fake", base_url=base_url)
+    provider = OpenAIProvider(api_key="fake", model="fake-model", base_url=base_url, max_concurrency=count)
+
+    async def blocking_call():
+        # What AIService._call_ai used to do: a sync SDK call inside a coroutine
+        sync_client.chat.completions.create(
+            model="fake-model",
+            messages=[{"role": "user", "content": "hi"}],
+            max_tokens=10
+        )
+
+    async def async_call():
+        await provider.complete("hi", max_tokens=10)
+
+    print(f"{count} requests, {LATENCY_SECONDS}s simulated provider latency")
+    print(f"{'mode':<26}{'wall time':>11}{'max loop lag':>15}")
+    serial = await run("sync client (before)", blocking_call, count)
+    overlapped = await run("async provider (after)", async_call, count)
+    print(f"Speed-up: {serial / overlapped:.1f}x (ideal {count}x)")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,9 +1,14 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from app.core.config import settings
+from app.core.health import readiness_probe
+from app.core.metrics import render_metrics
 from app.api import query_routes
-from app.db.database import init_db
+from app.db.database import init_connections, connection_status, close_db_connections
+from app.services.history_sink import history_sink
+from app.services.query_templates import template_engine
 import app.core.logging_config # Configure logging
 import logging
 
@@ -26,6 +31,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Query-Id"],
 )
 
 # Add GZip compression
@@ -55,18 +61,34 @@ async def startup_event():
     """Initialize application on startup"""
     logger.info(f"Starting {settings.APP_NAME} v{settings.APP_VERSION}")
     
-    # Initialize database
+    # Connect to the metadata database, Redis and MongoDB concurrently; the
+    # optional Redis/MongoDB probes finish in the background
+    app.state.ready = False
     try:
-        init_db()
+        app.state.optional_connections = await init_connections()
+        app.state.ready = True
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
+    
+    # Start batched, write-behind persistence of query history
+    await history_sink.start()
+    
+    # Start batched writes of query template usage counts
+    await template_engine.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("Shutting down application")
+    
+    # Flush queued query history before the metadata engine goes away
+    await history_sink.stop()
+    await template_engine.stop()
+    
+    # Dispose pooled target-database engines, Mongo clients and worker threads
+    close_db_connections()
 
 
 @app.get("/")
@@ -82,13 +104,37 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Liveness check: the process is up and serving requests"""
     return {
         "status": "healthy",
         "version": settings.APP_VERSION
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check: metadata database reachable and no exhausted target-database pool"""
+    if not getattr(app.state, "ready", False):
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "starting", "dependencies": connection_status()}
+        )
+    
+    report = await readiness_probe.check()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if report["status"] == "ready" else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=report
+    )
+
+
+if settings.ENABLE_METRICS:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus scrape endpoint"""
+        content, content_type = render_metrics()
+        return Response(content=content, media_type=content_type)
+
+
 if __name__ == "__main__":
     import uvicorn
     
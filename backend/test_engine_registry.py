@@ -0,0 +1,59 @@
+"""Evicted Mongo clients stay open until the requests using them finish"""
+import gc
+
+from app.db.engine_registry import EngineRegistry
+
+
+class _FakeClient:
+    def __init__(self, connection_string):
+        self.connection_string = connection_string
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class _Owner:
+    pass
+
+
+def _registry(**kwargs) -> EngineRegistry:
+    registry = EngineRegistry(**kwargs)
+    registry._create_mongo_client = _FakeClient
+    return registry
+
+
+def test_lru_eviction_waits_for_release():
+    registry = _registry(max_engines=1)
+    owner = _Owner()
+    first = registry.get_mongo_client("mongodb://a/db", owner=owner)
+    registry.get_mongo_client("mongodb://b/db")
+    assert not first.closed
+
+    registry.release(owner)
+    assert first.closed
+
+
+def test_idle_eviction_skips_leased_clients():
+    registry = _registry(idle_timeout_seconds=1)
+    owner = _Owner()
+    client = registry.get_mongo_client("mongodb://a/db", owner=owner)
+    registry._entries[next(iter(registry._entries))].last_used -= 10
+    assert registry.evict_idle() == 0
+
+    registry.release(owner)
+    registry._entries[next(iter(registry._entries))].last_used -= 10
+    assert registry.evict_idle() == 1
+    assert client.closed
+
+
+def test_lease_ends_when_owner_is_collected():
+    registry = _registry(max_engines=1)
+    owner = _Owner()
+    client = registry.get_mongo_client("mongodb://a/db", owner=owner)
+    registry.dispose("mongodb://a/db")
+    assert not client.closed
+
+    del owner
+    gc.collect()
+    assert client.closed
@@ -0,0 +1,43 @@
+"""Past SQL is reused directly only for the same question text"""
+import asyncio
+
+import pytest
+
+from app.services.example_retrieval import ExampleRetriever, _ExampleIndex
+
+SCHEMA = {"database_type": "sqlite", "tables": {"orders": {}, "accounts": {}}}
+
+
+def _find(past, question):
+    retriever = ExampleRetriever(k=3, min_score=0.1, direct_match=True)
+    retriever._load = lambda database_id: _ExampleIndex(past)
+    return asyncio.run(retriever.find(1, question, SCHEMA))
+
+
+@pytest.mark.parametrize("past_question, question", [
+    ("orders with total > 100", "orders with total < 100"),
+    ("orders with total >= 100", "orders with total = 100"),
+    ("balance below -5", "balance below 5"),
+    ("accounts from London to Paris", "accounts from Paris to London"),
+])
+def test_symbol_sign_and_order_variants_are_not_reused(past_question, question):
+    match, examples = _find([(past_question, "SELECT * FROM orders")], question)
+    assert match is None
+    # Still useful as a few-shot example
+    assert [example["question"] for example in examples] == [past_question]
+
+
+def test_same_question_is_reused():
+    match, _ = _find([("Orders with total > 100", "SELECT * FROM orders WHERE total > 100")],
+                     "orders with  total > 100?")
+    assert match is not None
+    assert match["sql"] == "SELECT * FROM orders WHERE total > 100"
+
+
+def test_variants_are_indexed_separately():
+    past = [
+        ("orders with total > 100", "SELECT * FROM orders WHERE total > 100"),
+        ("orders with total < 100", "SELECT * FROM orders WHERE total < 100"),
+    ]
+    match, _ = _find(past, "orders with total < 100")
+    assert match["sql"] == "SELECT * FROM orders WHERE total < 100"
@@ -0,0 +1,86 @@
+"""Streaming endpoints must work when the schema has to be re-read first
+
+A schema refresh commits the request session, which expires the connection
+record, and the stream body runs after FastAPI has closed that session.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+
+from fastapi.testclient import TestClient
+
+import main
+from app.schemas.schemas import SQLGenerationResponse
+from app.services.ai_service import ai_service
+from app.services.schema_cache import schema_cache
+
+
+def _register_database(client: TestClient) -> int:
+    path = os.path.join(tempfile.mkdtemp(), "target.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (id INTEGER, price INTEGER)")
+    conn.executemany("INSERT INTO items VALUES (?, ?)", [(i, i * 10) for i in range(5)])
+    conn.commit()
+    conn.close()
+    response = client.post("/api/v1/databases", json={
+        "name": f"fresh-{os.path.basename(os.path.dirname(path))}",
+        "db_type": "sqlite",
+        "connection_string": f"sqlite:///{path}"
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _fake_generation(monkeypatch):
+    async def generate_sql(natural_language, schema_info, **kwargs):
+        return SQLGenerationResponse(
+            sql="SELECT id, price FROM items", explanation="All items",
+            confidence=0.9, tables_used=["items"], complexity_score=1
+        )
+
+    async def stream_sql(natural_language, schema_info, **kwargs):
+        yield json.dumps({"sql": "SELECT id, price FROM items", "explanation": "All items",
+                          "confidence": 0.9, "tables_used": ["items"], "complexity_score": 1})
+
+    monkeypatch.setattr(ai_service, "generate_sql", generate_sql)
+    monkeypatch.setattr(ai_service, "stream_sql", stream_sql)
+
+
+def _cold_schema_cache(monkeypatch):
+    # Every lookup re-reads the schema, as for a connection whose schema expired
+    monkeypatch.setattr(schema_cache, "ttl_seconds", -1)
+    monkeypatch.setattr(schema_cache, "max_stale_seconds", -1)
+
+
+def test_batch_on_fresh_connection(monkeypatch):
+    _fake_generation(monkeypatch)
+    with TestClient(main.app) as client:
+        database_id = _register_database(client)
+        _cold_schema_cache(monkeypatch)
+        response = client.post("/api/v1/query/batch", json={
+            "database_id": database_id,
+            "queries": [{"natural_language_query": "all items"}, {"natural_language_query": "every item"}]
+        })
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 2
+    for line in lines:
+        assert line["status_code"] == 200, line
+        assert line["result"]["result_count"] == 5
+
+
+def test_events_on_fresh_connection(monkeypatch):
+    _fake_generation(monkeypatch)
+    with TestClient(main.app) as client:
+        database_id = _register_database(client)
+        _cold_schema_cache(monkeypatch)
+        response = client.post("/api/v1/query/events", json={
+            "natural_language_query": "all items",
+            "database_id": database_id
+        })
+    assert response.status_code == 200
+    events = [block.split("\n", 1)[0][len("event: "):] for block in response.text.strip().split("\n\n")]
+    assert "error" not in events, response.text
+    assert events[0] == "schema"
+    assert events[-1] == "done"
@@ -0,0 +1,61 @@
+"""Answered queries show up in history before their record is written"""
+import os
+import sqlite3
+import tempfile
+
+from fastapi.testclient import TestClient
+
+import main
+from app.schemas.schemas import SQLGenerationResponse
+from app.services.ai_service import ai_service
+from app.services.history_sink import history_sink
+
+
+def _register_database(client: TestClient) -> int:
+    path = os.path.join(tempfile.mkdtemp(), "target.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (id INTEGER)")
+    conn.commit()
+    conn.close()
+    response = client.post("/api/v1/databases", json={
+        "name": f"history-{os.path.basename(os.path.dirname(path))}",
+        "db_type": "sqlite",
+        "connection_string": f"sqlite:///{path}"
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def test_queued_record_is_listed_then_written(monkeypatch):
+    async def generate_sql(natural_language, schema_info, **kwargs):
+        return SQLGenerationResponse(sql="SELECT id FROM items", explanation="Items",
+                                     confidence=0.9, tables_used=["items"], complexity_score=1)
+    monkeypatch.setattr(ai_service, "generate_sql", generate_sql)
+    # Nothing is flushed until shutdown
+    monkeypatch.setattr(history_sink, "flush_interval_seconds", 3600)
+
+    with TestClient(main.app) as client:
+        database_id = _register_database(client)
+        answer = client.post("/api/v1/query", json={
+            "natural_language_query": "list items",
+            "database_id": database_id,
+            "include_insights": False,
+            "query_id": "history-test-1"
+        }).json()
+        assert answer["id"] is None
+
+        history = client.get("/api/v1/queries/history", params={"database_id": database_id}).json()
+        assert [(item["id"], item["query_id"]) for item in history] == [(None, "history-test-1")]
+
+    with TestClient(main.app) as client:
+        history = client.get("/api/v1/queries/history", params={"database_id": database_id}).json()
+        assert len(history) == 1
+        assert history[0]["id"] is not None
+        assert history[0]["query_id"] == "history-test-1"
+
+
+def test_limit_out_of_range_is_rejected():
+    with TestClient(main.app) as client:
+        for limit in (0, -1, 101):
+            response = client.get("/api/v1/queries/history", params={"limit": limit})
+            assert response.status_code == 422, limit
@@ -0,0 +1,33 @@
+"""Local result cache entries must stay separate per connection"""
+from app.services.columnar import ColumnarResult
+from app.services.result_cache import ResultCache
+
+
+def _local_cache(tmp_path) -> ResultCache:
+    cache = ResultCache(directory=str(tmp_path), local_fallback=True)
+    cache._redis = staticmethod(lambda: None)
+    return cache
+
+
+def test_same_sql_on_two_connections(tmp_path):
+    cache = _local_cache(tmp_path)
+    sql = "SELECT n FROM t"
+    cache.set("sqlite:///a.db", sql, ColumnarResult.from_rows(["n"], [(1,)]), ["t"])
+    cache.set("sqlite:///b.db", sql, ColumnarResult.from_rows(["n"], [(2,)]), ["t"])
+
+    assert cache.get("sqlite:///a.db", sql).to_rows() == [{"n": 1}]
+    assert cache.get("sqlite:///b.db", sql).to_rows() == [{"n": 2}]
+
+
+def test_invalidating_one_connection_keeps_the_other(tmp_path):
+    cache = _local_cache(tmp_path)
+    sql = "SELECT n FROM t"
+    cache.set("sqlite:///a.db", sql, ColumnarResult.from_rows(["n"], [(1,)]), ["t"])
+    cache.set("sqlite:///b.db", sql, ColumnarResult.from_rows(["n"], [(2,)]), ["t"])
+
+    assert cache.invalidate("sqlite:///b.db") == 1
+    assert cache.get("sqlite:///b.db", sql) is None
+    assert cache.get("sqlite:///a.db", sql).to_rows() == [{"n": 1}]
+
+    assert cache.invalidate_tables("sqlite:///a.db", ["t"]) == 1
+    assert cache.get("sqlite:///a.db", sql) is None
@@ -0,0 +1,36 @@
+"""Arrow stream encoding must not break on later batches or empty results"""
+from decimal import Decimal
+
+import pyarrow as pa
+
+from app.services.result_stream import encode_arrow
+
+
+def _read(batches, **kwargs) -> pa.Table:
+    return pa.ipc.open_stream(b"".join(encode_arrow(batches, **kwargs))).read_all()
+
+
+def test_mixed_types_without_inference():
+    table = _read([(["v"], [(1,), (2,)]), (["v"], [(1.5,), ("x",)])], infer_types=False)
+    assert table.schema.field("v").type == pa.string()
+    assert table.column("v").to_pylist() == ["1", "2", "1.5", "x"]
+
+
+def test_integer_column_widened_for_later_batches():
+    table = _read([(["n"], [(1.0,)]), (["n"], [(2,)])])
+    assert table.column("n").to_pylist() == [1.0, 2.0]
+
+
+def test_decimals_sent_as_strings():
+    table = _read([(["d"], [(Decimal("1.5"),)]), (["d"], [(Decimal("10.25"),)])])
+    assert table.column("d").to_pylist() == ["1.5", "10.25"]
+
+
+def test_empty_result_still_has_schema():
+    table = _read([(["a", "b"], [])])
+    assert table.num_rows == 0
+    assert table.schema.names == ["a", "b"]
+
+
+def test_no_batches_is_a_valid_stream():
+    assert _read([]).num_rows == 0
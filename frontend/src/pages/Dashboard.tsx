@@ -252,7 +252,7 @@ export default function Dashboard() {
                 <div className="space-y-2">
                   {queryHistory?.slice(0, 5).map((query) => (
                     <div
-                      key={query.id}
+                      key={query.query_id ?? query.id}
                       className="p-3 glass-effect rounded-lg text-xs hover:bg-white/5 transition-all cursor-pointer border border-transparent hover:border-white/5"
                     >
                       <div className="text-gray-400 line-clamp-2 leading-relaxed">
@@ -1,5 +1,6 @@
 export interface Query {
-  id: number;
+  id: number | null;  // null while the history record is still queued for writing
+  query_id?: string;
   natural_language_query: string;
   generated_sql: string;
   execution_time_ms?: number;